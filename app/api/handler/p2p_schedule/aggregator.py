@@ -0,0 +1,333 @@
+import asyncio
+import logging
+import re
+import time
+import zlib
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from fastapi import BackgroundTasks, Response
+
+from app.api.handler.p2p_schedule.carrier_api import cma, hlag, iqax, maersk, msc, zim, one
+from app.api.handler.p2p_schedule.lane_store import lane_store
+from app.api.handler.p2p_schedule.pagination import PAGE_INDEX_NAMESPACE, decode_cursor, indexed_page, product_page
+from app.api.handler.p2p_schedule.schedule_filter import ScheduleFilter
+from app.api.schemas.schema_request import QueryParams, CarrierCode, SortBy, StartDateType
+from app.api.schemas.schema_serializer import serialize_schedule
+from app.internal.http.http_client_manager import HTTPClientWrapper, AsyncTaskManager, start_revalidation
+from app.internal.http.rate_limiter import use_carrier
+from app.internal.offload import offloader
+from app.internal.setting import Settings, load_yaml
+from app.internal.single_flight import SingleFlight
+from app.storage import db
+from app.storage.compression import accepts_encoding, compressed_body, content_encoding, decompress, leading_bytes
+
+carriers_schedule_handler: dict = {
+    'CMDU': cma.get_cma_p2p,
+    'ANNU': cma.get_cma_p2p,
+    'CHNL': cma.get_cma_p2p,
+    'APLU': cma.get_cma_p2p,
+    'ONEY': one.get_one_p2p,
+    'ZIMU': zim.get_zim_p2p,
+    'MAEU': maersk.get_maersk_p2p,
+    'MAEI': maersk.get_maersk_p2p,
+    'MSCU': msc.get_msc_p2p,
+    'OOLU': iqax.get_iqax_p2p,
+    'COSU': iqax.get_iqax_p2p,
+    'HLCU': hlag.get_hlag_p2p,
+}
+
+SINGLE_FLIGHT_SETTING: dict = load_yaml()['data']['singleFlight']
+
+PAGINATION_SETTING: dict = load_yaml()['data']['pagination']
+
+schedule_flight = SingleFlight(name='schedule product')
+
+revalidation_tasks: Dict[str, asyncio.Task] = {}
+
+# noofSchedule comes before the schedules,a few hundred bytes of the product are enough to find it
+PRODUCT_COUNT: re.Pattern = re.compile(rb'"noofSchedule":(\d+)')
+
+PRODUCT_HEAD_BYTES: int = 512
+
+
+async def call_carrier(scac: str, direct_only: Optional[bool] = None, tsp: Optional[str] = None,
+                       vessel_imo: Optional[str] = None, service: Optional[Any] = None, **kwargs) -> Any:
+    """Every request the handler sends on behalf of the scac spends the budget of the scac.The carriers are searched
+    without the optional filters which are applied to the mapped schedules afterwards"""
+    use_carrier(scac)
+    if lane_store.enabled:
+        result = await lane_store.search(handler=carriers_schedule_handler.get(scac), scac=scac, **kwargs)
+    else:
+        result = await carriers_schedule_handler.get(scac)(scac=scac, **kwargs)
+    schedule_filter = ScheduleFilter(direct_only=direct_only, tsp=tsp, vessel_imo=vessel_imo, service=service)
+    if result is None or not schedule_filter.active:
+        return result
+    return await offloader.run_in_thread(schedule_filter.apply, result)
+
+
+def requested_carriers(query_params: QueryParams) -> List[CarrierCode]:
+    return query_params.scac if query_params.scac else list(
+        CarrierCode.exclude("ANNU", "CHNL"))  # ANNU and CHNL are under CMDU group
+
+
+def create_carrier_tasks(task_group: AsyncTaskManager, client: HTTPClientWrapper, background_tasks: BackgroundTasks,
+                         settings: Settings, query_params: QueryParams) -> List[str]:
+    """Forward the search to every requested carrier and return the scac in the order the tasks were created"""
+    scac_loop: List[CarrierCode] = requested_carriers(query_params)
+
+    for scac in scac_loop:
+        task_group.create_task(name=f'{scac.value}_task', coro=lambda c=scac.value: call_carrier(
+            client=client,
+            background_task=background_tasks,
+            api_settings=settings,
+            scac=c,
+            pol=query_params.point_from,
+            pod=query_params.point_to,
+            start_date_type=query_params.start_date_type,
+            departure_date=query_params.start_date if query_params.start_date_type == StartDateType.departure else None,
+            arrival_date=query_params.start_date if query_params.start_date_type == StartDateType.arrival else None,
+            search_range=query_params.search_range,
+            direct_only=query_params.direct_only,
+            vessel_imo=query_params.vessel_imo,
+            tsp=query_params.tsp,
+            service=query_params.service))
+    return [scac.value for scac in scac_loop]
+
+
+async def fetch_all_schedules(client: HTTPClientWrapper, background_tasks: BackgroundTasks, settings: Settings,
+                              query_params: QueryParams, cache_key: str, product_id: str) -> Response:
+    """Fan the search out to every requested carrier and merge all the schedules into one product"""
+    async with AsyncTaskManager() as task_group:
+        start_time = time.time()
+        create_carrier_tasks(task_group=task_group, client=client, background_tasks=background_tasks,
+                             settings=settings, query_params=query_params)
+
+    final_schedules = await client.gen_all_valid_schedules(
+        cache_key=cache_key,
+        matrix=task_group.results,
+        product_id=product_id,
+        point_from=query_params.point_from,
+        point_to=query_params.point_to,
+        background_tasks=background_tasks,
+        task_exception=task_group.error,
+        failed_scac=task_group.failed_scac,
+        dedup=bool(query_params.dedup)
+    )
+
+    process_time = time.time() - start_time
+    logging.info(
+        f'total_processing_time={process_time:.2f}s total_results={final_schedules.headers.get("KN-Count-Schedules", 0)}')
+    return final_schedules
+
+
+async def fetch_with_lease(client: HTTPClientWrapper, background_tasks: BackgroundTasks, settings: Settings,
+                           query_params: QueryParams, cache_key: str, product_id: str) -> Response:
+    """In cross worker mode only the pod holding the redis lease fetches the lane.The others poll the cache until
+    the result shows up or the lease is gone, in which case they fetch it by themselves"""
+    if not SINGLE_FLIGHT_SETTING['crossWorker']:
+        return await fetch_all_schedules(client=client, background_tasks=background_tasks, settings=settings,
+                                         query_params=query_params, cache_key=cache_key, product_id=product_id)
+    lease: str | None = await db.acquire_lock(key=cache_key, namespace='schedule product',
+                                              expire=SINGLE_FLIGHT_SETTING['leaseSeconds'])
+    if lease is None:
+        schedule_flight.peer_waits += 1
+        deadline: float = time.monotonic() + SINGLE_FLIGHT_SETTING['leaseSeconds']
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SINGLE_FLIGHT_SETTING['pollInterval'])
+            cache_result, _ = await db.get_entry(namespace='schedule product', key=cache_key)
+            if cache_result:
+                # The response is shared by the callers of the flight which all read its body,so it is not passed on
+                # compressed
+                return await cached_product_response(cache_result=cache_result, accept_encoding='')
+            if not await db.is_locked(key=cache_key, namespace='schedule product'):
+                break
+        logging.warning(f'No cached result after waiting for another worker,fetching it by ourselves - {cache_key}')
+    final_schedules = await fetch_all_schedules(client=client, background_tasks=background_tasks, settings=settings,
+                                                query_params=query_params, cache_key=cache_key, product_id=product_id)
+    if lease:
+        background_tasks.add_task(release_lease, cache_key=cache_key, lease=lease)
+    return final_schedules
+
+
+async def release_lease(cache_key: str, lease: str) -> None:
+    """The workers waiting on the lease read the cache as soon as it is gone,so the product queued by the write behind
+    is written first"""
+    await db.write_behind.written(namespace='schedule product', key=cache_key,
+                                  timeout=SINGLE_FLIGHT_SETTING['leaseSeconds'])
+    await db.release_lock(key=cache_key, token=lease, namespace='schedule product')
+
+
+async def get_all_schedules(client: HTTPClientWrapper, background_tasks: BackgroundTasks, settings: Settings,
+                            query_params: QueryParams, cache_key: str, product_id: str) -> Response:
+    """Identical concurrent searches share one aggregation.Every caller gets its own copy of the response because
+    FastAPI attaches the background tasks of the request to the response object"""
+    shared_result: Response = await schedule_flight.do(
+        key=cache_key, coro=lambda: fetch_with_lease(client=client, background_tasks=background_tasks,
+                                                     settings=settings, query_params=query_params,
+                                                     cache_key=cache_key, product_id=product_id))
+    return Response(content=shared_result.body, status_code=shared_result.status_code,
+                    headers=dict(shared_result.headers))
+
+
+async def get_schedule_page(client: HTTPClientWrapper, background_tasks: BackgroundTasks, settings: Settings,
+                            query_params: QueryParams, cache_key: str, product_id: str,
+                            cache_result: Optional[bytes]) -> Response:
+    """The full product is fetched and cached like any other search so the following pages are read from the cache,
+    only the requested page is sent"""
+    sort_by: SortBy = query_params.sort_by or SortBy.etd
+    # An InvalidCursor is a ValueError which the client dependency turns into a 422
+    offset: int = decode_cursor(cursor=query_params.cursor, cache_key=cache_key, sort_by=sort_by)
+    limit: int = query_params.limit or PAGINATION_SETTING['defaultLimit']
+    if cache_result:
+        full_product = Response(content=await offloader.run_in_thread(decompress, cache_result),
+                                media_type='application/json')
+        index: Optional[bytes] = await db.get_bytes(key=cache_key, namespace=PAGE_INDEX_NAMESPACE)
+    else:
+        full_product = await get_all_schedules(client=client, background_tasks=background_tasks, settings=settings,
+                                               query_params=query_params, cache_key=cache_key, product_id=product_id)
+        index = None
+    # The index slices the page out of the cached product,the full decode is only left for a product without one
+    page: Optional[bytes] = await offloader.run_in_thread(indexed_page, full_product.body, index, cache_key, sort_by,
+                                                          offset, limit) if index else None
+    if page is None:
+        page = await offloader.run_in_thread(product_page, full_product.body, cache_key, sort_by, offset, limit)
+    if page is None:
+        return full_product
+    headers: dict = {key: value for key, value in full_product.headers.items() if
+                     key not in ('content-length', 'content-type')}
+    return Response(content=page, media_type='application/json', headers=headers)
+
+
+async def revalidate_schedules(client: HTTPClientWrapper, settings: Settings, query_params: QueryParams,
+                               cache_key: str, product_id: str) -> None:
+    """Refresh a stale product through the carrier handlers.It joins any in-flight search of the same lane and
+    runs its own background tasks because there is no request left to run them"""
+    start_revalidation()
+    background_tasks = BackgroundTasks()
+    try:
+        await schedule_flight.do(
+            key=cache_key, coro=lambda: fetch_all_schedules(client=client, background_tasks=background_tasks,
+                                                            settings=settings, query_params=query_params,
+                                                            cache_key=cache_key, product_id=product_id))
+        await background_tasks()
+        logging.info(f'Revalidated stale schedule product - {cache_key}')
+    except Exception as revalidate_error:
+        logging.error(f'Unable to revalidate stale schedule product {cache_key} - {revalidate_error}')
+
+
+def schedule_revalidation(client: HTTPClientWrapper, settings: Settings, query_params: QueryParams, cache_key: str,
+                          product_id: str) -> None:
+    """Start at most one background refresh per lane,every other stale hit keeps being served the stale product"""
+    if cache_key in revalidation_tasks:
+        return
+    task = asyncio.create_task(revalidate_schedules(client=client, settings=settings, query_params=query_params,
+                                                    cache_key=cache_key, product_id=product_id))
+    revalidation_tasks[cache_key] = task
+    task.add_done_callback(lambda _: revalidation_tasks.pop(cache_key, None))
+
+
+def cached_product_headers(cache_result: bytes) -> Dict[str, str]:
+    """The count of schedules is read from the head of the product,only a product with every carrier is cached so
+    there is never a retry-failed header to send back"""
+    count_schedules: Optional[re.Match] = PRODUCT_COUNT.search(leading_bytes(cache_result, PRODUCT_HEAD_BYTES))
+    return {'KN-Count-Schedules': count_schedules.group(1).decode()} if count_schedules else {}
+
+
+async def cached_product_response(cache_result: bytes, accept_encoding: str) -> Response:
+    """A compressed product is sent as it is to a client accepting its encoding,GZipMiddleware leaves a response
+    which already has a Content-Encoding alone.Any other client gets it decompressed in the offload thread"""
+    encoding: Optional[str] = content_encoding(cache_result)
+    headers: Dict[str, str] = cached_product_headers(cache_result)
+    if encoding and accepts_encoding(accept_encoding, encoding):
+        return Response(content=compressed_body(cache_result), media_type='application/json',
+                        headers={**headers, 'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+    return Response(content=await offloader.run_in_thread(decompress, cache_result),
+                    media_type='application/json', headers=headers)
+
+
+def map_carrier_schedules(scac: str, result: Optional[Iterable]) -> Tuple[list, List[bytes]]:
+    """Map the response of one carrier and serialize every valid schedule into an NDJSON line"""
+    valid_schedules: list = []
+    lines: List[bytes] = []
+    for schedule in result or ():
+        try:
+            line: bytes = serialize_schedule(schedule)
+        except ValueError as invalid_schedule:
+            logging.error(f'Skip invalid {scac} schedule - {invalid_schedule}')
+            continue
+        valid_schedules.append(schedule)
+        lines.append(line + b'\n')
+    return valid_schedules, lines
+
+
+def stream_summary(product_id: str, query_params: QueryParams, count_schedules: int, failed_scac: List[str]) -> bytes:
+    return orjson.dumps({'productid': product_id, 'origin': query_params.point_from,
+                         'destination': query_params.point_to, 'noofSchedule': count_schedules,
+                         'failedScac': failed_scac}) + b'\n'
+
+
+async def stream_all_schedules(client: HTTPClientWrapper, background_tasks: BackgroundTasks, settings: Settings,
+                               query_params: QueryParams, cache_key: str, product_id: str) -> AsyncGenerator[bytes, None]:
+    """Emit every schedule as one NDJSON line as soon as its carrier responds and a trailing summary line.
+    Once every carrier has responded the full product is cached like a regular search.The streamed lines are sent
+    before the partners of a vessel sharing agreement respond so only the cached product is deduplicated"""
+    carrier_schedules: Dict[str, list] = {}
+    failed_scac: List[str] = []
+    start_time = time.time()
+    async with AsyncTaskManager() as task_group:
+        scac_order: List[str] = create_carrier_tasks(task_group=task_group, client=client,
+                                                     background_tasks=background_tasks, settings=settings,
+                                                     query_params=query_params)
+        async for scac, result in task_group.as_completed():
+            if isinstance(result, BaseException):
+                logging.error(f'{scac} failed - {result.__class__.__name__}:{result}')
+                failed_scac.append(scac)
+                continue
+            try:
+                valid_schedules, lines = await offloader.run_in_thread(map_carrier_schedules, scac, result)
+            except Exception as mapping_error:
+                logging.error(f'Unable to map {scac} schedules - {mapping_error.__class__.__name__}:{mapping_error}')
+                failed_scac.append(scac)
+                continue
+            carrier_schedules[scac] = valid_schedules
+            if lines:
+                yield b''.join(lines)
+            logging.info(f'time_to_{scac}={time.time() - start_time:.2f}s streamed {len(valid_schedules)} schedules')
+    count_schedules: int = sum(len(schedules) for schedules in carrier_schedules.values())
+    if count_schedules:
+        await client.gen_all_valid_schedules(cache_key=cache_key, product_id=product_id,
+                                             matrix=(carrier_schedules.get(scac) for scac in scac_order),
+                                             point_from=query_params.point_from, point_to=query_params.point_to,
+                                             background_tasks=background_tasks,
+                                             task_exception=task_group.error or bool(failed_scac),
+                                             failed_scac=failed_scac + task_group.failed_scac,
+                                             dedup=bool(query_params.dedup))
+    yield stream_summary(product_id=product_id, query_params=query_params, count_schedules=count_schedules,
+                         failed_scac=list(dict.fromkeys(failed_scac + task_group.failed_scac)))
+
+
+def cached_schedule_lines(cache_result: bytes) -> Tuple[bytes, int]:
+    """Decode a cached product into its NDJSON lines and its number of schedules"""
+    cached_product: dict = orjson.loads(decompress(cache_result))
+    lines: bytes = b''.join(orjson.dumps(schedule) + b'\n' for schedule in cached_product.get('schedules', []))
+    return lines, cached_product.get('noofSchedule', 0)
+
+
+async def stream_cached_schedules(cache_result: bytes, product_id: str,
+                                  query_params: QueryParams) -> AsyncGenerator[bytes, None]:
+    """The cached product is decoded and turned into lines in the offload thread like the carrier responses"""
+    lines, count_schedules = await offloader.run_in_thread(cached_schedule_lines, cache_result)
+    if lines:
+        yield lines
+    yield stream_summary(product_id=product_id, query_params=query_params, count_schedules=count_schedules,
+                         failed_scac=[])
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+    """GZipMiddleware buffers a streaming body until it has enough to compress,so the stream is compressed here
+    and flushed after every line to keep each schedule reaching the client as soon as it is ready"""
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,182 @@
+"""
+A batch searches many lanes in one request.The cached products of all the lanes are read in one redis round trip and
+the missing lanes are fetched under two caps shared by every batch of the worker:the lanes fetched at once and the
+searches of the same carrier at once,so a large batch queues instead of exhausting the budget of a carrier and
+having it skipped.
+Every lane is written as one NDJSON line as soon as its product is ready,in the order they complete.
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+import orjson
+from fastapi import BackgroundTasks, Response, status
+
+from app.api.handler.p2p_schedule.aggregator import get_all_schedules, schedule_revalidation
+from app.api.schemas.schema_request import BatchQuery, QueryParams
+from app.internal.http.http_client_manager import HTTPClientWrapper, use_carrier_slots
+from app.internal.offload import offloader
+from app.internal.setting import Settings, load_yaml
+from app.storage import db
+from app.storage.compression import decompress
+
+BATCH_SETTING: dict = load_yaml()['data']['batch']
+
+STALE_WHILE_REVALIDATE: int = load_yaml()['data']['scheduleProduct']['staleWhileRevalidate']
+
+LaneResult = Tuple[str, int, bytes, Optional[BackgroundTasks], Dict[str, Any]]
+
+
+class BatchLimits:
+    """Caps of the lanes fetched by all the batches of the worker"""
+
+    def __init__(self, max_lanes: int, max_per_carrier: int) -> None:
+        self.max_per_carrier: int = max_per_carrier
+        self.__lanes: asyncio.Semaphore = asyncio.Semaphore(max_lanes)
+        self.__carriers: Dict[str, asyncio.Semaphore] = {}
+        self.lanes_in_flight: int = 0
+        self.carriers_in_flight: Counter = Counter()
+        self.batches: int = 0
+        self.searches: Counter = Counter()
+
+    def __carrier(self, scac: str) -> asyncio.Semaphore:
+        if (semaphore := self.__carriers.get(scac)) is None:
+            semaphore = self.__carriers[scac] = asyncio.Semaphore(self.max_per_carrier)
+        return semaphore
+
+    @asynccontextmanager
+    async def lane(self) -> AsyncIterator[None]:
+        async with self.__lanes:
+            self.lanes_in_flight += 1
+            try:
+                yield
+            finally:
+                self.lanes_in_flight -= 1
+
+    @asynccontextmanager
+    async def carrier(self, scac: str) -> AsyncIterator[None]:
+        """Held by one carrier task of a lane only while it searches the carrier,a lane never holds a carrier while
+        it waits for another one"""
+        async with self.__carrier(scac):
+            self.carriers_in_flight[scac] += 1
+            try:
+                yield
+            finally:
+                self.carriers_in_flight[scac] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {'batches': self.batches, 'searches': dict(self.searches), 'lanesInFlight': self.lanes_in_flight,
+                'carriersInFlight': {scac: count for scac, count in self.carriers_in_flight.items() if count}}
+
+
+batch_limits = BatchLimits(max_lanes=BATCH_SETTING['maxConcurrentLanes'],
+                           max_per_carrier=BATCH_SETTING['maxConcurrentPerCarrier'])
+
+
+lane_writes: Set[asyncio.Task] = set()
+
+
+def lane_written(task: asyncio.Task) -> None:
+    lane_writes.discard(task)
+    if not task.cancelled() and task.exception():
+        logging.error(f'Unable to cache the lane - {task.exception().__class__.__name__}:{task.exception()}')
+
+
+def write_lane(background_tasks: BackgroundTasks) -> None:
+    """Cache the product of a lane in a task of its own so the next line is not held up by the write"""
+    task = asyncio.create_task(background_tasks())
+    lane_writes.add(task)
+    task.add_done_callback(lane_written)
+
+
+def lane_lines(lanes: List[int], status_code: int, body: bytes, **extra: Any) -> bytes:
+    """The product is embedded as it was serialized,the same lane requested twice gets one line per index"""
+    return b''.join(orjson.dumps({'lane': lane, 'status': status_code, **extra})[:-1] + b',"result":' + body + b'}\n'
+                    for lane in lanes)
+
+
+def lane_error(error: Exception) -> Tuple[int, bytes]:
+    """Same status as the single search endpoint would answer"""
+    if isinstance(error, aiohttp.ClientConnectionError):
+        status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE
+    elif isinstance(error, ValueError):
+        status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    else:
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    return status_code, orjson.dumps({'detail': f'{error.__class__.__name__}:{error}'})
+
+
+async def fetch_lane(client: HTTPClientWrapper, settings: Settings, query_params: QueryParams, cache_key: str,
+                     product_id: str) -> LaneResult:
+    """A lane has its own background tasks so its product is cached as soon as it is written rather than once the
+    whole batch is over"""
+    background_tasks = BackgroundTasks()
+    use_carrier_slots(batch_limits.carrier)
+    try:
+        async with batch_limits.lane():
+            response: Response = await get_all_schedules(client=client, background_tasks=background_tasks,
+                                                         settings=settings, query_params=query_params,
+                                                         cache_key=cache_key, product_id=product_id)
+    except Exception as lane_failure:
+        logging.error(f'Unable to search the lane {cache_key} - {lane_failure.__class__.__name__}:{lane_failure}')
+        status_code, body = lane_error(lane_failure)
+        return cache_key, status_code, body, None, {}
+    failed_scac: Optional[str] = response.headers.get('retry-failed')
+    return cache_key, response.status_code, response.body, background_tasks, {
+        'failedScac': failed_scac.split(', ')} if failed_scac else {}
+
+
+async def stream_batch(client: HTTPClientWrapper, settings: Settings,
+                       batch: BatchQuery) -> AsyncGenerator[bytes, None]:
+    """Lanes with the same search are fetched once.The cached lanes are written first while the missing ones are
+    being fetched,the trailing summary line lists the lanes which failed"""
+    start_time = time.time()
+    batch_limits.batches += 1
+    lanes: Dict[str, List[int]] = {}
+    queries: Dict[str, QueryParams] = {}
+    for index, query_params in enumerate(batch.lanes):
+        cache_key: str = query_params.normalized_key()
+        lanes.setdefault(cache_key, []).append(index)
+        queries.setdefault(cache_key, query_params)
+    entries: List[Tuple[Optional[bytes], bool]] = await db.get_entries(
+        keys=list(lanes), namespace='schedule product', stale_ttl=STALE_WHILE_REVALIDATE)
+    product_ids: Dict[str, str] = {cache_key: db.generate_uuid_from_string(namespace='schedule product', key=cache_key)
+                                   for cache_key in lanes}
+    cached: List[Tuple[str, bytes]] = []
+    fetches: List[asyncio.Task] = []
+    for cache_key, (cache_result, is_stale) in zip(lanes, entries):
+        if not cache_result:
+            fetches.append(asyncio.create_task(fetch_lane(client=client, settings=settings,
+                                                          query_params=queries[cache_key], cache_key=cache_key,
+                                                          product_id=product_ids[cache_key])))
+            continue
+        if is_stale:
+            schedule_revalidation(client=client, settings=settings, query_params=queries[cache_key],
+                                  cache_key=cache_key, product_id=product_ids[cache_key])
+        cached.append((cache_key, cache_result))
+    batch_limits.searches.update(cached=len(cached), fetched=len(fetches))
+    failed_lanes: List[int] = []
+    try:
+        for cache_key, cache_result in cached:
+            yield lane_lines(lanes[cache_key], status.HTTP_200_OK, await offloader.run_in_thread(decompress,
+                                                                                                 cache_result))
+        for next_lane in asyncio.as_completed(fetches):
+            cache_key, status_code, body, background_tasks, extra = await next_lane
+            if status_code != status.HTTP_200_OK:
+                batch_limits.searches['failed'] += 1
+                failed_lanes.extend(lanes[cache_key])
+            yield lane_lines(lanes[cache_key], status_code, body, **extra)
+            if background_tasks:
+                write_lane(background_tasks)
+    finally:
+        # The client went away,the lanes still being fetched are dropped
+        for fetch in fetches:
+            fetch.cancel()
+    logging.info(f'batch_time={time.time() - start_time:.2f}s lanes={len(batch.lanes)} searches={len(lanes)} '
+                 f'cached={len(cached)} fetched={len(fetches)} failed={len(failed_lanes)}')
+    yield orjson.dumps({'noofLane': len(batch.lanes), 'failedLane': sorted(failed_lanes)}) + b'\n'
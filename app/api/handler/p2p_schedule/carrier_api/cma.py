@@ -1,12 +1,12 @@
 from datetime import datetime, date
-from typing import Generator, Iterator, Optional
+from typing import AsyncIterator, Iterator, List, Optional
 
 from fastapi import BackgroundTasks
 
 from app.api.handler.p2p_schedule.carrier_api.helpers import deepget
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
-from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.http_client_manager import HTTPClientWrapper, map_items
 from app.internal.setting import Settings
 
 DEFAULT_ETD_ETA: str = datetime.now().astimezone().replace(microsecond=0).isoformat()
@@ -58,8 +58,7 @@ def process_leg_data(leg_task: list) -> list:
     return leg_list
 
 
-def process_schedule_data(task: dict, direct_only: bool | None, service_filter: str | None,
-                          vessel_imo_filter: str | None) -> Iterator:
+def process_schedule_data(task: dict) -> Iterator:
     """Map the schedule and leg body"""
     transit_time: int = task['transitTime']
     first_point_from: str = task['routingDetails'][0]['pointFrom']['location'].get('internalCode') or \
@@ -73,23 +72,17 @@ def process_schedule_data(task: dict, direct_only: bool | None, service_filter:
         (ea['pointTo']['arrivalDateGmt'] for ea in task['routingDetails'][::-1] if ea['pointTo'].get('arrivalDateGmt')),
         DEFAULT_ETD_ETA)
     check_transshipment: bool = len(task['routingDetails']) > 1
-    check_service_code: bool = any(leg for leg in task['routingDetails'] if
-                                   deepget(leg['transportation'], 'voyage', 'service',
-                                           'code') == service_filter) if service_filter else True
-    check_vessel_imo: bool = any(leg for leg in task['routingDetails'] if deepget(leg['transportation'], 'vehicule',
-                                                                                  'reference') == vessel_imo_filter) if vessel_imo_filter else True
-    if (direct_only is None or direct_only != check_transshipment) and check_vessel_imo and check_service_code:
-        schedule_body = Schedule.model_construct(scac=CMA_GROUP.get(task['shippingCompany']),
-                                                 pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=first_etd, eta=last_eta,
-                                                 transitTime=transit_time, transshipment=check_transshipment,
-                                                 legs=process_leg_data(leg_task=task['routingDetails']))
-        yield schedule_body
+    schedule_body = Schedule.model_construct(scac=CMA_GROUP.get(task['shippingCompany']),
+                                             pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=first_etd, eta=last_eta,
+                                             transitTime=transit_time, transshipment=check_transshipment,
+                                             legs=process_leg_data(leg_task=task['routingDetails']))
+    yield schedule_body
 
 
 async def fetch_schedules(client: HTTPClientWrapper, background_task: BackgroundTasks, cma_code: str, url: str,
-                          headers: dict, params: dict, extra_condition: bool) -> dict:
-    """Fetch the initial set of schedules from CMA."""
+                          headers: dict, params: dict, extra_condition: bool) -> AsyncIterator[dict]:
+    """Yield the routings of CMA one at a time as the response arrives."""
 
     def updated_params(cma_internal_code: str) -> dict:
         """Update request parameters based on CMA internal code and extra condition."""
@@ -101,46 +94,32 @@ async def fetch_schedules(client: HTTPClientWrapper, background_task: Background
         return updated
 
     # Use the updated parameters to fetch the schedules
-    response_json: dict = await anext(
-        client.parse(
+    async for routing in client.parse_items(
             background_tasks=background_task,
             method='GET',
             url=url,
             params=updated_params(cma_code),
             headers=headers,
             namespace=f'{CMA_GROUP.get(cma_code) if cma_code else "CMDU"} original response'
-        )
-    )
-
-    if response_json:
-        return response_json
+    ):
+        yield routing
 
 
 async def get_cma_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, api_settings: Settings, pol: str,
-                      pod: str, search_range: SearchRange, direct_only: Optional[bool] = None,
-                      tsp: Optional[str] = None,
-                      vessel_imo: Optional[str] = None,
+                      pod: str, search_range: SearchRange,
                       departure_date: Optional[date] = None, arrival_date: Optional[date] = None,
                       start_date_type: Optional[StartDateType] = None,
-                      scac: Optional[str] = None,
-                      service: Optional[str] = None) -> Generator:
+                      scac: Optional[str] = None) -> Optional[List[Schedule]]:
     api_carrier_code: str = next(k for k, v in CMA_GROUP.items() if v == scac.upper()) if scac else None
     headers: dict = {'keyID': api_settings.cma_token.get_secret_value()}
     carrier_params: dict = {'placeOfLoading': pol, 'placeOfDischarge': pod, 'departureDate': departure_date,
-                            'searchRange': search_range.duration, 'arrivalDate': arrival_date, 'tsPortCode': tsp}
+                            'searchRange': search_range.duration, 'arrivalDate': arrival_date}
     params: dict = {k: str(v) for k, v in carrier_params.items() if
                     v is not None}  # Remove the key if its value is None
     extra_condition: bool = pol.startswith('US') and pod.startswith('US')
-    response_json = await fetch_schedules(client=client, background_task=background_task, url=api_settings.cma_url,
-                                          headers=headers,
-                                          params=params, cma_code=api_carrier_code, extra_condition=extra_condition)
-    if response_json:
-        return (
-            schedule_result
-            for task in response_json
-            for schedule_result in process_schedule_data(
-                task=task,
-                direct_only=direct_only,
-                service_filter=service,
-                vessel_imo_filter=vessel_imo,
-            ))
+    # The routings are mapped in the offload thread batch by batch as they are decoded
+    schedules: List[Schedule] = await map_items(fetch_schedules(
+        client=client, background_task=background_task, url=api_settings.cma_url, headers=headers, params=params,
+        cma_code=api_carrier_code, extra_condition=extra_condition), mapper=process_schedule_data)
+    if schedules:
+        return schedules
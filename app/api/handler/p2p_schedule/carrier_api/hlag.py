@@ -1,11 +1,12 @@
 from datetime import datetime, timedelta
-from typing import Iterator, Optional
+from typing import Iterator, List, Optional
 
 from fastapi import BackgroundTasks
 
+from app.api.schemas.carrier_dates import calendar_days, transit_days
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Leg, PointBase, Schedule, Service, Transportation, Voyage
-from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.http_client_manager import HTTPClientWrapper, map_items
 from app.internal.setting import Settings
 
 
@@ -19,7 +20,7 @@ def process_leg_data(leg_task: list) -> list:
                                           terminalCode=leg['arrival']['location'].get('facilitySMDGCode')),
         etd=(etd := leg['departure']['dateTime']),
         eta=(eta := leg['arrival']['dateTime']),
-        transitTime=int((datetime.fromisoformat(eta) - datetime.fromisoformat(etd)).days),
+        transitTime=transit_days(etd=etd, eta=eta),
         transportations=Transportation.model_construct(transportType=str(leg.get('modeOfTransport', 'Vessel')).title(),
                                                        transportName=leg['vesselName'] if (
                                                            vessel_imo := leg.get('vesselIMONumber')) else None,
@@ -33,27 +34,19 @@ def process_leg_data(leg_task: list) -> list:
     return leg_list
 
 
-def process_schedule_data(task: dict, service: str, tsp: str, vessel_imo: str) -> Iterator:
+def process_schedule_data(task: dict) -> Iterator:
     first_point_from: str = task['placeOfReceipt']['location']['UNLocationCode']
     last_point_to: str = task['placeOfDelivery']['location']['UNLocationCode']
     first_etd: datetime = task['placeOfReceipt']['dateTime']
     last_eta: datetime = task['placeOfDelivery']['dateTime']
-    transit_time: int = task.get('transitTime',
-                                 (datetime.fromisoformat(last_eta[:10]) - datetime.fromisoformat(first_etd[:10])).days)
-    check_service_code: bool = any(
-        loop_code for loop_code in task['legs'] if loop_code.get('carrierServiceCode') == service) if service else True
+    transit_time: int = task['transitTime'] if 'transitTime' in task else calendar_days(etd=first_etd, eta=last_eta)
     check_transshipment: bool = len(task['legs']) > 1
-    check_vessel_imo: bool = any(
-        imo for imo in task['legs'] if imo.get('vesselIMONumber') == vessel_imo) if vessel_imo else True
-    transshipment_port: bool = any(tsport['departure']['location']['UNLocationCode'] == tsp for tsport in
-                                   task['legs']) if check_transshipment and tsp else False
-    if (transshipment_port or not tsp) and (check_service_code or not service) and check_vessel_imo:
-        schedule_body = Schedule.model_construct(scac='HLCU', pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=first_etd,
-                                                 eta=last_eta, transitTime=transit_time,
-                                                 transshipment=check_transshipment,
-                                                 legs=process_leg_data(leg_task=task['legs']))
-        yield schedule_body
+    schedule_body = Schedule.model_construct(scac='HLCU', pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=first_etd,
+                                             eta=last_eta, transitTime=transit_time,
+                                             transshipment=check_transshipment,
+                                             legs=process_leg_data(leg_task=task['legs']))
+    yield schedule_body
 
 
 async def get_hlag_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks,
@@ -63,11 +56,7 @@ async def get_hlag_p2p(client: HTTPClientWrapper, background_task: BackgroundTas
                        start_date_type: Optional[StartDateType] = None,
                        departure_date: Optional[datetime] = None,
                        arrival_date: Optional[datetime] = None,
-                       direct_only: Optional[bool] = None,
-                       scac: Optional[str] = None,
-                       service: Optional[str] = None,
-                       tsp: Optional[str] = None,
-                       vessel_imo: Optional[str] = None):
+                       scac: Optional[str] = None) -> Optional[List[Schedule]]:
     # Determine the start and end day based on ETD or ETA
     start_day: str = departure_date.strftime("%Y-%m-%dT%H:%M:%S.%SZ") if departure_date else arrival_date.strftime(
         "%Y-%m-%dT%H:%M:%S.%SZ")
@@ -84,15 +73,6 @@ async def get_hlag_p2p(client: HTTPClientWrapper, background_task: BackgroundTas
     else:
         params.update({'arrivalDateTime:gte': start_day, 'arrivalDateTime:lte': end_day})
 
-    if direct_only is not None:
-        params.update({'isTranshipment': not direct_only})
-
-    # Define a function to generate schedules from response data
-    def generate_schedule(data):
-        for task in data:
-            for result in process_schedule_data(task=task, service=service, tsp=tsp, vessel_imo=vessel_imo):
-                yield result
-
     # Construct the request headers
     headers: dict = {
         'X-IBM-Client-Id': api_settings.hlcu_client_id.get_secret_value(),
@@ -100,18 +80,15 @@ async def get_hlag_p2p(client: HTTPClientWrapper, background_task: BackgroundTas
         'Accept': 'application/json'
     }
 
-    # Fetch data from the API
-    response_json = await anext(
-        client.parse(
-            method='GET',
-            background_tasks=background_task,
-            url=api_settings.hlcu_url,
-            params=params,
-            headers=headers,
-            namespace='hlag original response'
-        )
-    )
+    # Fetch data from the API,the schedules are mapped in the offload thread batch by batch as they are decoded
+    schedules: List[Schedule] = await map_items(client.parse_items(
+        method='GET',
+        background_tasks=background_task,
+        url=api_settings.hlcu_url,
+        params=params,
+        headers=headers,
+        namespace='hlag original response'
+    ), mapper=process_schedule_data)
 
-    # If response data is available, generate the schedule
-    if response_json:
-        return generate_schedule(data=response_json)
+    if schedules:
+        return schedules
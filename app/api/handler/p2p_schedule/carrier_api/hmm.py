@@ -1,8 +1,9 @@
 import datetime
-from typing import Generator, Iterator, Optional
+from typing import Generator, Iterator
 
 from fastapi import BackgroundTasks
 
+from app.api.schemas.carrier_dates import transit_days
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
 from app.internal.http.http_client_manager import HTTPClientWrapper
 
@@ -28,8 +29,7 @@ def process_leg_data(schedule_task: dict, last_point_to: str, check_transshipmen
                                           terminalCode=first_pol_terminal_code),
         etd=(outbound_etd := schedule_task['outboundInland']['fromLocationDepatureDate']),
         eta=(outbound_eta := schedule_task['outboundInland']['toLocationArrivalDate']),
-        transitTime=int(
-            (datetime.datetime.fromisoformat(outbound_eta) - datetime.datetime.fromisoformat(outbound_etd)).days),
+        transitTime=transit_days(etd=outbound_etd, eta=outbound_eta),
         transportations=Transportation.model_construct(transportType=schedule_task['outboundInland']['transMode']),
         voyages=Voyage.model_construct(internalVoyage='001'))] if schedule_task.get('outboundInland') else []
     # main routing
@@ -49,8 +49,7 @@ def process_leg_data(schedule_task: dict, last_point_to: str, check_transshipmen
         cutoffs=Cutoff.model_construct(cyCutoffDate=first_cy_cutoff,
                                        docCutoffDate=first_doc_cutoff) if index == 0 and (
         first_cy_cutoff or first_doc_cutoff) else None,
-        transitTime=int((datetime.datetime.fromisoformat(
-            eta) - datetime.datetime.fromisoformat(etd)).days),
+        transitTime=transit_days(etd=etd, eta=eta),
         transportations=Transportation.model_construct(transportType='Vessel' if (
             vessel_name := legs.get('vesselName')) else 'Feeder',
         transportName=vessel_name,
@@ -75,43 +74,34 @@ def process_leg_data(schedule_task: dict, last_point_to: str, check_transshipmen
                                           terminalCode=schedule_task['deliveryFaciltyCode']),
         etd=(inbound_etd := schedule_task['inboundInland']['fromLocationDepatureDate']),
         eta=(inbound_eta := schedule_task['inboundInland']['toLocationArrivalDate']),
-        transitTime=int(
-            (datetime.datetime.fromisoformat(inbound_eta) - datetime.datetime.fromisoformat(inbound_etd)).days),
+        transitTime=transit_days(etd=inbound_etd, eta=inbound_eta),
         transportations=Transportation.model_construct(transportType=schedule_task['inboundInland']['transMode']),
         voyages=Voyage.model_construct(internalVoyage='001'))] if schedule_task.get('inboundInland') else []
     return leg_list
 
 
-def process_schedule_data(task: dict, vessel_imo: str, service: str, tsp: str) -> Iterator:
-    check_service_code: bool = any(services['vesselLoop'] == service for services in task['vessel'] if
-                                   services.get('vesselDepartureDate')) if service else True
-    check_vessel_imo: bool = any(
-        imo for imo in task['vessel'] if imo.get('lloydRegisterNo') == vessel_imo) if vessel_imo else True
+def process_schedule_data(task: dict) -> Iterator:
     check_transshipment: str | None = task.get('transshipPortCode')
-    transshipment_port_filter: bool = bool(check_transshipment == tsp) if check_transshipment and tsp else False
-    if (transshipment_port_filter or not tsp) and check_service_code and check_vessel_imo:
-        transit_time: int = task.get('totalTransitDay')
-        first_pol: str = task.get('loadingPortCode')
-        first_point_from: str = task['outboundInland']['fromUnLocationCode'] if task.get(
-            'outboundInland') else first_pol
-        last_point_to: str = task['inboundInland']['fromUnLocationCode'] if task.get('inboundInland') else task.get(
-            'dischargePortCode')
-        first_etd: str = task.get('departureDate')
-        last_eta: str = task.get('arrivalDate')
-        leg_list = process_leg_data(schedule_task=task, last_point_to=last_point_to,
-                                    check_transshipment=check_transshipment)
-        schedule_body = Schedule.model_construct(scac='HDMU', pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=first_etd,
-                                                 eta=last_eta, transitTime=transit_time,
-                                                 transshipment=bool(check_transshipment),
-                                                 legs=leg_list)
-        yield schedule_body
+    transit_time: int = task.get('totalTransitDay')
+    first_pol: str = task.get('loadingPortCode')
+    first_point_from: str = task['outboundInland']['fromUnLocationCode'] if task.get(
+        'outboundInland') else first_pol
+    last_point_to: str = task['inboundInland']['fromUnLocationCode'] if task.get('inboundInland') else task.get(
+        'dischargePortCode')
+    first_etd: str = task.get('departureDate')
+    last_eta: str = task.get('arrivalDate')
+    leg_list = process_leg_data(schedule_task=task, last_point_to=last_point_to,
+                                check_transshipment=check_transshipment)
+    schedule_body = Schedule.model_construct(scac='HDMU', pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=first_etd,
+                                             eta=last_eta, transitTime=transit_time,
+                                             transshipment=bool(check_transshipment),
+                                             legs=leg_list)
+    yield schedule_body
 
 
 async def get_hmm_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, url: str, pw: str, pol: str,
-                      pod: str, search_range: str, direct_only: Optional[bool],
-                      start_date: datetime, tsp: Optional[str] = None, vessel_imo: Optional[str] = None,
-                      service: Optional[str] = None) -> Generator:
+                      pod: str, search_range: str, start_date: datetime) -> Generator:
     # Construct request parameters
     params: dict = {
         'fromLocationCode': pol,
@@ -120,14 +110,14 @@ async def get_hmm_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
         'deliveryTermCode': 'CY',
         'periodDate': start_date.strftime("%Y%m%d"),
         'weekTerm': search_range,
-        'webSort': 'D' if direct_only is True else 'T' if direct_only is False else 'A',
-        'webPriority': 'D' if direct_only is True else 'T' if direct_only is False else 'A'
+        'webSort': 'A',
+        'webPriority': 'A'
     }
 
     # Define a function to generate schedule results
     def generate_schedule(data: dict) -> Generator:
         for task in data.get('resultData', []):
-            for schedule_result in process_schedule_data(task=task, vessel_imo=vessel_imo, service=service, tsp=tsp):
+            for schedule_result in process_schedule_data(task=task):
                 yield schedule_result
 
     # Construct request headers
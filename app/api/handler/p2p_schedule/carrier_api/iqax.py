@@ -1,34 +1,34 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Generator, Iterator, Optional
 
 from fastapi import BackgroundTasks
 
 from app.api.handler.p2p_schedule.carrier_api.helpers import deepget
+from app.api.schemas.carrier_dates import DAY, calendar_days, format_utc, utc_epoch
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
 from app.internal.http.http_client_manager import HTTPClientWrapper
 from app.internal.setting import Settings
 
+IQAX_DATE_FORMAT: str = '%Y-%m-%dT%H:%M:%S.000Z'
+
 
 def calculate_final_times(index: int, leg_etd: str, leg_tt: int, leg_transport: str, leg_from: dict, legs_to: dict,
                           last_eta: str):
-    """Calculate the correct etd eta for each leg """
-
-    def format_datetime(dt):
-        return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-
-    default_offset = timedelta(days=leg_tt if leg_tt else 0.5)
+    """Calculate the correct etd eta for each leg,a missing date is estimated from the other one and the leg transit
+    time only when it is missing"""
+    default_offset: int = round(DAY * leg_tt) if leg_tt else DAY // 2
     if index == 1:
         if leg_transport == 'TRUCK':
-            final_etd = format_datetime(datetime.strptime(leg_etd, "%Y-%m-%dT%H:%M:%S.000Z") - default_offset)
+            final_etd = format_utc(utc_epoch(leg_etd) - default_offset, IQAX_DATE_FORMAT)
         else:
             final_etd = leg_etd
-        final_eta = legs_to.get('eta', format_datetime(
-            datetime.strptime(final_etd, "%Y-%m-%dT%H:%M:%S.000Z") + default_offset))
+        final_eta = legs_to['eta'] if 'eta' in legs_to else format_utc(utc_epoch(final_etd) + default_offset,
+                                                                       IQAX_DATE_FORMAT)
     else:
         final_eta = legs_to.get('eta', last_eta)
-        final_etd = leg_from.get('etd', format_datetime(
-            datetime.strptime(final_eta, "%Y-%m-%dT%H:%M:%S.000Z") - default_offset))
+        final_etd = leg_from['etd'] if 'etd' in leg_from else format_utc(utc_epoch(final_eta) - default_offset,
+                                                                         IQAX_DATE_FORMAT)
     return final_etd, final_eta
 
 
@@ -49,8 +49,7 @@ def process_leg_data(schedule_task: dict, first_etd: str, last_eta: str) -> list
             final_etd, final_eta = calculate_final_times(index=index, leg_etd=leg_etd, leg_tt=leg_tt,
                                                          leg_transport=leg_transport, leg_from=legs['fromPoint'],
                                                          legs_to=legs['toPoint'], last_eta=last_eta)
-            leg_transit_time: int = leg_tt if leg_tt else (
-                datetime.fromisoformat(final_eta[:10]) - datetime.fromisoformat(final_etd[:10])).days
+            leg_transit_time: int = leg_tt if leg_tt else calendar_days(etd=final_etd, eta=final_eta)
             leg_list.append(Leg.model_construct(
                 pointFrom=PointBase.model_construct(locationName=legs['fromPoint']['location']['name'],
                                                     locationCode=leg_pol,
@@ -85,27 +84,19 @@ def process_leg_data(schedule_task: dict, first_etd: str, last_eta: str) -> list
     return leg_list
 
 
-def process_schedule_data(task: dict, direct_only: bool | None, vessel_imo: str, service: str, tsp: str) -> Iterator:
+def process_schedule_data(task: dict) -> Iterator:
     """Map the schedule and leg body"""
-    check_service_code: bool = any(service == service_leg['code'] for leg_service in task['leg'] if
-                                   (service_leg := leg_service.get('service'))) if service else True
     check_transshipment: bool = not task['direct']
-    transshipment_port: bool = any(tsport['fromPoint']['location']['unlocode'] == tsp for tsport in
-                                   task['leg'][1:]) if check_transshipment and tsp else False
-    check_vessel_imo: bool = any(
-        str(imo['vessel'].get('IMO')) == vessel_imo for imo in task['leg'] if imo.get('vessel')) if vessel_imo else True
-    if (transshipment_port or not tsp) and (
-            direct_only is None or check_transshipment != direct_only) and check_service_code and check_vessel_imo:
-        first_etd: str = task['por']['etd']
-        last_eta: str = task['fnd']['eta']
-        schedule_body = Schedule.model_construct(scac=task.get('carrierScac'),
-                                                 pointFrom=task['por']['location']['unlocode'],
-                                                 pointTo=task['fnd']['location']['unlocode'],
-                                                 etd=first_etd, eta=last_eta, transitTime=task.get('transitTime'),
-                                                 transshipment=check_transshipment,
-                                                 legs=process_leg_data(schedule_task=task, first_etd=first_etd,
-                                                                       last_eta=last_eta))
-        yield schedule_body
+    first_etd: str = task['por']['etd']
+    last_eta: str = task['fnd']['eta']
+    schedule_body = Schedule.model_construct(scac=task.get('carrierScac'),
+                                             pointFrom=task['por']['location']['unlocode'],
+                                             pointTo=task['fnd']['location']['unlocode'],
+                                             etd=first_etd, eta=last_eta, transitTime=task.get('transitTime'),
+                                             transshipment=check_transshipment,
+                                             legs=process_leg_data(schedule_task=task, first_etd=first_etd,
+                                                                   last_eta=last_eta))
+    yield schedule_body
 
 
 async def get_iqax_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, api_settings: Settings,
@@ -115,11 +106,7 @@ async def get_iqax_p2p(client: HTTPClientWrapper, background_task: BackgroundTas
                        departure_date: Optional[datetime.date] = None,
                        arrival_date: Optional[datetime.date] = None,
                        start_date_type: Optional[StartDateType] = None,
-                       direct_only: Optional[bool] = None,
-                       tsp: Optional[str] = None,
-                       vessel_imo: Optional[str] = None,
-                       scac: Optional[str] = None,
-                       service: Optional[str] = None) -> Generator:
+                       scac: Optional[str] = None) -> Generator:
     carrier_params: dict = {'appKey': api_settings.iqax_token.get_secret_value(),
                             'porID': pol, 'fndID': pod, 'departureFrom': departure_date,
                             'arrivalFrom': arrival_date, 'searchDuration': search_range.value}
@@ -130,6 +117,4 @@ async def get_iqax_p2p(client: HTTPClientWrapper, background_task: BackgroundTas
                      namespace=f'{scac} original response'))
     if schedule_data := response_json.get('routeGroupsList'):
         return (schedule_result for schedule_list in schedule_data for task in schedule_list['route'] for
-                schedule_result in
-                process_schedule_data(task=task, direct_only=direct_only, vessel_imo=vessel_imo, service=service,
-                                      tsp=tsp))
+                schedule_result in process_schedule_data(task=task))
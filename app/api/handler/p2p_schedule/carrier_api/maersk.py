@@ -1,14 +1,22 @@
 import asyncio
 from datetime import datetime, timedelta
-from typing import Generator, Iterator, Optional
+from functools import partial
+from typing import Iterator, List, Optional
 
 from fastapi import BackgroundTasks
 
 from app.api.handler.p2p_schedule.carrier_api.helpers import deepget
+from app.api.schemas.carrier_dates import transit_days
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
-from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.http_client_manager import HTTPClientWrapper, iter_batches, map_batch
+from app.internal.offload import offloader
 from app.internal.setting import Settings
+from app.internal.single_flight import SingleFlight
+
+# Concurrent searches from or to the same port e.g. the lanes of a batch share one lookup
+location_flight = SingleFlight(name='maersk location')
+cutoff_flight = SingleFlight(name='maersk cutoff')
 
 TRANSPORT_TYPE: dict = {'BAR': 'Barge', 'BCO': 'Barge', 'FEF': 'Feeder', 'FEO': 'Feeder', 'MVS': 'Vessel',
                         'RCO': 'Rail', 'RR': 'Rail', 'TRK': 'Truck', 'VSF': 'Feeder', 'VSL': 'Feeder', 'VSM': 'Vessel'}
@@ -24,7 +32,7 @@ def process_leg_data(leg_task: list, first_cut_off: dict):
                                           terminalName=leg['facilities']['endLocation']['locationName']),
         etd=(etd := leg['departureDateTime']),
         eta=(eta := leg['arrivalDateTime']),
-        transitTime=int((datetime.fromisoformat(eta) - datetime.fromisoformat(etd)).days),
+        transitTime=transit_days(etd=etd, eta=eta),
         transportations=Transportation.model_construct(
             transportType=TRANSPORT_TYPE.get(leg['transport']['transportMode']),
             transportName=deepget(leg['transport'], 'vessel', 'vesselName'),
@@ -44,50 +52,41 @@ def process_leg_data(leg_task: list, first_cut_off: dict):
     return leg_list
 
 
-def process_schedule_data(resp: dict, first_cut_off: dict, direct_only: bool | None, vessel_imo: str, service: str,
-                          tsp: str) -> Iterator:
+def process_schedule_data(resp: dict, first_cut_off: dict) -> Iterator:
     """Map the schedule and leg body"""
     carrier_code: str = resp['vesselOperatorCarrierCode']
     for task in resp['transportSchedules']:
-        check_service_code: bool = any(
-            services['transport']['carrierServiceCode'] == service for services in task['transportLegs'] if
-            services['transport'].get('carrierServiceCode')) if service else True
-        check_service_name: bool = any(
-            services['transport']['carrierServiceName'] == service for services in task['transportLegs'] if
-            services['transport'].get('carrierServiceName')) if service else True
         check_transshipment: bool = len(task['transportLegs']) > 1
-        transshipment_port: bool = any(tsport['facilities']['startLocation']['UNLocationCode'] == tsp for tsport in
-                                       task['transportLegs'][1:]) if check_transshipment and tsp else False
-        check_vessel_imo: bool = any(imo for imo in task['transportLegs'] if deepget(imo['transport'], 'vessel',
-                                                                                     'vesselIMONumber') == vessel_imo) if vessel_imo else True
-        if (transshipment_port or not tsp) and (direct_only is None or check_transshipment != direct_only) and (
-                check_service_code or check_service_name) and check_vessel_imo:
-            transit_time: int = round(int(task['transitTime']) / 1400)
-            first_point_from: str = task['facilities']['collectionOrigin'].get('cityUNLocationCode') or \
-                task['facilities']['collectionOrigin'].get('siteUNLocationCode')
-            last_point_to: str = task['facilities']['deliveryDestination'].get('cityUNLocationCode') or \
-                task['facilities']['deliveryDestination'].get('siteUNLocationCode')
-            first_etd: str = task['departureDateTime']
-            last_eta: str = task['arrivalDateTime']
-            leg_list = process_leg_data(leg_task=task['transportLegs'], first_cut_off=first_cut_off)
-            schedule_body = Schedule.model_construct(scac=carrier_code, pointFrom=first_point_from,
-                                                     pointTo=last_point_to, etd=first_etd, eta=last_eta,
-                                                     transitTime=transit_time, transshipment=check_transshipment,
-                                                     legs=sorted(leg_list, key=lambda
-                                                                 leg: leg.etd) if check_transshipment else leg_list)
-            yield schedule_body
+        transit_time: int = round(int(task['transitTime']) / 1400)
+        first_point_from: str = task['facilities']['collectionOrigin'].get('cityUNLocationCode') or \
+            task['facilities']['collectionOrigin'].get('siteUNLocationCode')
+        last_point_to: str = task['facilities']['deliveryDestination'].get('cityUNLocationCode') or \
+            task['facilities']['deliveryDestination'].get('siteUNLocationCode')
+        first_etd: str = task['departureDateTime']
+        last_eta: str = task['arrivalDateTime']
+        leg_list = process_leg_data(leg_task=task['transportLegs'], first_cut_off=first_cut_off)
+        schedule_body = Schedule.model_construct(scac=carrier_code, pointFrom=first_point_from,
+                                                 pointTo=last_point_to, etd=first_etd, eta=last_eta,
+                                                 transitTime=transit_time, transshipment=check_transshipment,
+                                                 legs=sorted(leg_list, key=lambda
+                                                             leg: leg.etd) if check_transshipment else leg_list)
+        yield schedule_body
 
 
 async def get_cutoff_first_leg(client: HTTPClientWrapper, cut_off_url: str, cut_off_pw: str,
-                               response_data: list) -> dict:
-    """According to the BU requirment, we have to get the first leg from Maersk P2P schedule and map the cutOffDate for the first leg only"""
+                               response_data: list, known: Optional[dict] = None) -> dict:
+    """According to the BU requirment, we have to get the first leg from Maersk P2P schedule and map the cutOffDate for the first leg only.
+    The first legs whose cutoff is already known e.g. from a previous batch of products are not looked up again"""
     get_all_first_leg: list[dict] = [{'country': leg['transportLegs'][0]['facilities']['startLocation']['countryCode'],
                                       'pol': leg['transportLegs'][0]['facilities']['startLocation']['cityName'],
                                       'imo': imo, 'voyage': leg['transportLegs'][0]['transport'].get('carrierDepartureVoyageNumber')} for schedule in response_data for leg in schedule['transportSchedules'] if (imo := deepget(leg['transportLegs'][0]['transport'], 'vessel', 'vesselIMONumber')) and imo != '9999999' and leg['transportLegs'][0]['transport'].get('carrierDepartureVoyageNumber')]
-    cut_off_leg: list = [asyncio.create_task(
-        get_maersk_cutoff(client=client, url=cut_off_url, headers={'Consumer-Key': cut_off_pw},
-                          country=leg.get('country'), pol=leg.get('pol'), imo=leg.get('imo'), voyage=leg.get('voyage')))
-                         for index, leg in enumerate(get_all_first_leg) if leg not in get_all_first_leg[:index]]
+    new_first_leg: list[dict] = [leg for index, leg in enumerate(get_all_first_leg) if leg not in get_all_first_leg[:index] and hash(f"{leg['country']}{leg['pol']}{leg['imo']}{leg['voyage']}") not in (known or {})]
+    cut_off_leg: list = [asyncio.create_task(cutoff_flight.do(
+        key=f"{leg['country']}|{leg['pol']}|{leg['imo']}|{leg['voyage']}",
+        coro=lambda leg=leg: get_maersk_cutoff(client=client, url=cut_off_url, headers={'Consumer-Key': cut_off_pw},
+                                               country=leg.get('country'), pol=leg.get('pol'), imo=leg.get('imo'),
+                                               voyage=leg.get('voyage'))))
+                         for leg in new_first_leg]
     get_cut_offs = await asyncio.gather(*cut_off_leg)
     first_cut_off: dict = {key: value for cutoff in get_cut_offs if cutoff is not None for key, value in cutoff.items()}
     return first_cut_off
@@ -120,11 +119,11 @@ async def get_maersk_cutoff(client: HTTPClientWrapper, url: str, headers: dict,
 
 async def retrieve_geo_locations(client: HTTPClientWrapper, background_task: BackgroundTasks, pol: str, pod: str,
                                  location_url: str, pw: str):
-    location_tasks = (asyncio.create_task(anext(
+    location_tasks = (asyncio.create_task(location_flight.do(key=port, coro=lambda port=port: anext(
         client.parse(stream=True, background_tasks=background_task, method='GET', url=location_url,
                      headers={'Consumer-Key': pw},
-                     params={'locationType': 'CITY', 'UNLocationCode': port}, namespace=f'maersk {port}',
-                     expire=timedelta(days=360)))) for port in [pol, pod] if port)
+                     params={'locationType': 'CITY', 'UNLocationCode': port}, namespace='maersk location',
+                     expire=timedelta(days=360))))) for port in [pol, pod] if port)
     origin_geo_location, destination_geo_location = await asyncio.gather(*location_tasks)
     return origin_geo_location, destination_geo_location
 
@@ -136,9 +135,7 @@ async def get_maersk_p2p(client: HTTPClientWrapper, background_task: BackgroundT
                          start_date_type: StartDateType,
                          departure_date: Optional[datetime.date] = None,
                          arrival_date: Optional[datetime.date] = None,
-                         direct_only: Optional[bool] = None, tsp: Optional[str] = None,
-                         scac: Optional[str] = None, service: Optional[str] = None,
-                         vessel_imo: Optional[str] = None) -> Generator:
+                         scac: Optional[str] = None) -> Optional[List[Schedule]]:
     origin_geo_location, des_geo_location = await retrieve_geo_locations(client=client, background_task=background_task,
                                                                          pol=pol, pod=pod,
                                                                          location_url=api_settings.maeu_location,
@@ -156,15 +153,18 @@ async def get_maersk_p2p(client: HTTPClientWrapper, background_task: BackgroundT
                             arrival_date)}
 
         headers: dict = {'Consumer-Key': api_settings.maeu_token2.get_secret_value()}
-        response_json: dict = await anext(
-            client.parse(stream=True, background_tasks=background_task, method='GET', url=api_settings.maeu_p2p,
-                         params=dict(params, **{'vesselOperatorCarrierCode': scac}), headers=headers,
-                         namespace=f'{scac} original response'))
-        check_ocean_products = response_json.get('oceanProducts') if response_json else None
-        if check_ocean_products:
-            first_cut_off: dict = await get_cutoff_first_leg(client=client, cut_off_url=api_settings.maeu_cutoff,
-                                                             cut_off_pw=api_settings.maeu_token.get_secret_value(),
-                                                             response_data=check_ocean_products)
-            return (schedule_result for schedule in check_ocean_products for schedule_result in
-                    process_schedule_data(resp=schedule, first_cut_off=first_cut_off, direct_only=direct_only,
-                                          vessel_imo=vessel_imo, service=service, tsp=tsp))
+        # Every batch of products is mapped in the offload thread once the cutoffs of its first legs are known,so the
+        # products are never all held at once
+        schedules: list = []
+        first_cut_off: dict = {}
+        async for products in iter_batches(client.parse_items(
+                path=('oceanProducts',), background_tasks=background_task, method='GET', url=api_settings.maeu_p2p,
+                params=dict(params, **{'vesselOperatorCarrierCode': scac}), headers=headers,
+                namespace=f'{scac} original response')):
+            first_cut_off.update(await get_cutoff_first_leg(client=client, cut_off_url=api_settings.maeu_cutoff,
+                                                            cut_off_pw=api_settings.maeu_token.get_secret_value(),
+                                                            response_data=products, known=first_cut_off))
+            schedules.extend(await offloader.run_in_thread(
+                map_batch, partial(process_schedule_data, first_cut_off=first_cut_off), products, size=len(products)))
+        if schedules:
+            return schedules
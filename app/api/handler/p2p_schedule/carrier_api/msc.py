@@ -2,16 +2,19 @@ from datetime import datetime, timedelta
 from typing import Generator, Optional
 from base64 import b64decode, b64encode
 from datetime import timezone
-from typing import AsyncIterator, Iterator
+from functools import cache
+from typing import Any, Iterator
 
 import jwt
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from fastapi import BackgroundTasks
 
+from app.api.schemas.carrier_dates import transit_days
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
 from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.token_manager import token_manager
 from app.internal.setting import Settings
 
 
@@ -27,7 +30,7 @@ def process_leg_data(leg_task: list) -> list:
             'ArrivalEHFSMDGCode'] != '' else None),
         etd=(etd := next(led['CallDateTime'] for led in leg['Calls'][0]['CallDates'] if led['Type'] == 'ETD')),
         eta=(eta := next(lea['CallDateTime'] for lea in leg['Calls'][-1]['CallDates'] if lea['Type'] == 'ETA')),
-        transitTime=int((datetime.fromisoformat(eta) - datetime.fromisoformat(etd)).days),
+        transitTime=transit_days(etd=etd, eta=eta),
         cutoffs=Cutoff.model_construct(docCutoffDate=si_cutoff, cyCutoffDate=next(
             (led['CallDateTime'] for led in leg['Calls'][0]['CallDates'] if
              led.get('CallDateTime') and led['Type'] == 'CYCUTOFF'), None),
@@ -47,49 +50,46 @@ def process_leg_data(leg_task: list) -> list:
     return leg_list
 
 
-def process_schedule_data(task: dict, direct_only: bool | None, vessel_imo: str, service: str, tsp: str) -> Iterator:
+def process_schedule_data(task: dict) -> Iterator:
     """Map the schedule and leg body"""
-    check_service_code: bool = any(
-        service_desc.get('Service') and service_desc['Service']['Description'] == service for service_desc in
-        task['Schedules']) if service else True
     check_transshipment: bool = len(task.get('Schedules')) > 1
-    transshipment_port = any(
-        tsport['Calls'][0]['Code'] == tsp for tsport in task['Schedules'][1:]) if check_transshipment and tsp else False
-    check_vessel_imo: bool = any(
-        imo for imo in task['Schedules'] if imo.get('IMONumber') == vessel_imo) if vessel_imo else True
-    if (transshipment_port or not tsp) and (
-            direct_only is None or check_transshipment != direct_only) and check_service_code and check_vessel_imo:
-        first_point_from: str = task['Schedules'][0]['Calls'][0]['Code']
-        last_point_to: str = task['Schedules'][-1]['Calls'][-1]['Code']
-        first_etd: str = next(
-            ed['CallDateTime'] for ed in task['Schedules'][0]['Calls'][0]['CallDates'] if ed['Type'] == 'ETD')
-        last_eta: str = next(
-            ed['CallDateTime'] for ed in task['Schedules'][-1]['Calls'][-1]['CallDates'] if ed['Type'] == 'ETA')
-        transit_time: int = int((datetime.fromisoformat(last_eta) - datetime.fromisoformat(first_etd)).days)
-        schedule_body = Schedule.model_construct(scac='MSCU', pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=first_etd, eta=last_eta, transitTime=transit_time,
-                                                 transshipment=check_transshipment,
-                                                 legs=process_leg_data(leg_task=task['Schedules']))
-        yield schedule_body
-
-
-async def get_msc_token(client: HTTPClientWrapper, background_task: BackgroundTasks, oauth: str, aud: str, rsa: str,
-                        msc_client: str, msc_scope: str, msc_thumbprint: str) -> AsyncIterator:
-    x5t: bytes = b64encode(bytearray.fromhex(msc_thumbprint))
+    first_point_from: str = task['Schedules'][0]['Calls'][0]['Code']
+    last_point_to: str = task['Schedules'][-1]['Calls'][-1]['Code']
+    first_etd: str = next(
+        ed['CallDateTime'] for ed in task['Schedules'][0]['Calls'][0]['CallDates'] if ed['Type'] == 'ETD')
+    last_eta: str = next(
+        ed['CallDateTime'] for ed in task['Schedules'][-1]['Calls'][-1]['CallDates'] if ed['Type'] == 'ETA')
+    transit_time: int = transit_days(etd=first_etd, eta=last_eta)
+    schedule_body = Schedule.model_construct(scac='MSCU', pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=first_etd, eta=last_eta, transitTime=transit_time,
+                                             transshipment=check_transshipment,
+                                             legs=process_leg_data(leg_task=task['Schedules']))
+    yield schedule_body
+
+
+@cache
+def load_private_key(rsa: str) -> Any:
+    return serialization.load_pem_private_key(b64decode(rsa), password=None, backend=default_backend())
+
+
+async def get_msc_token(client: HTTPClientWrapper, api_settings: Settings) -> Optional[dict]:
+    """The client assertion is only signed when the token manager refreshes the token"""
+    msc_client: str = api_settings.mscu_client.get_secret_value()
+    x5t: bytes = b64encode(bytearray.fromhex(api_settings.mscu_thumbprint.get_secret_value()))
     payload_header: dict = {'x5t': x5t.decode(), 'typ': 'JWT'}
-    payload_data: dict = {'aud': aud, 'iss': msc_client, 'sub': msc_client,
+    payload_data: dict = {'aud': api_settings.mscu_aud, 'iss': msc_client, 'sub': msc_client,
                           'exp': datetime.now(tz=timezone.utc) + timedelta(hours=2),
                           'nbf': datetime.now(tz=timezone.utc)}
-    private_rsa_key = serialization.load_pem_private_key(b64decode(rsa), password=None, backend=default_backend())
-    encoded: str = jwt.encode(headers=payload_header, payload=payload_data, key=private_rsa_key, algorithm='RS256')
-    params: dict = {'scope': msc_scope, 'client_id': msc_client,
+    encoded: str = jwt.encode(headers=payload_header, payload=payload_data,
+                              key=load_private_key(api_settings.mscu_rsa_key.get_secret_value()), algorithm='RS256')
+    params: dict = {'scope': api_settings.mscu_scope.get_secret_value(), 'client_id': msc_client,
                     'client_assertion_type': 'urn:ietf:params:oauth:client-assertion-type:jwt-bearer',
                     'grant_type': 'client_credentials', 'client_assertion': encoded}
     headers: dict = {'Content-Type': 'application/x-www-form-urlencoded'}
-    response_token: dict = await anext(
-        client.parse(method='POST', background_tasks=background_task, url=oauth, headers=headers, data=params,
-                     namespace='msc token', expire=timedelta(minutes=50)))
-    return response_token['access_token']
+    return await anext(client.parse(method='POST', url=api_settings.mscu_oauth, headers=headers, data=params))
+
+
+token_manager.register(scac='MSCU', fetch=get_msc_token)
 
 
 async def get_msc_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, api_settings: Settings,
@@ -99,11 +99,7 @@ async def get_msc_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
                       start_date_type: StartDateType,
                       scac: Optional[str] = None,
                       departure_date: Optional[datetime.date] = None,
-                      arrival_date: Optional[datetime.date] = None,
-                      direct_only: Optional[bool] = None,
-                      vessel_imo: Optional[str] = None,
-                      service: Optional[str] = None,
-                      tsp: Optional[str] = None) -> Generator:
+                      arrival_date: Optional[datetime.date] = None) -> Generator:
     # Construct request parameters
     params: dict = {
         'fromPortUNCode': pol,
@@ -118,21 +114,11 @@ async def get_msc_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
     # Define a function to generate schedule results
     def generate_schedule(data: dict) -> Generator:
         for task in data.get('MSCSchedule', {}).get('Transactions', []):
-            for schedule_result in process_schedule_data(task=task, direct_only=direct_only, vessel_imo=vessel_imo,
-                                                         service=service, tsp=tsp):
+            for schedule_result in process_schedule_data(task=task):
                 yield schedule_result
 
     # Fetch token
-    token = await get_msc_token(
-        client=client,
-        background_task=background_task,
-        oauth=api_settings.mscu_oauth,
-        aud=api_settings.mscu_aud,
-        rsa=api_settings.mscu_rsa_key.get_secret_value(),
-        msc_client=api_settings.mscu_client.get_secret_value(),
-        msc_scope=api_settings.mscu_scope.get_secret_value(),
-        msc_thumbprint=api_settings.mscu_thumbprint.get_secret_value()
-    )
+    token: str = await token_manager.get(scac='MSCU', client=client)
 
     # Construct request headers
     headers: dict = {'Authorization': f'Bearer {token}'}
@@ -1,4 +1,4 @@
-from datetime import timedelta, date
+from datetime import date
 from typing import Iterator, Optional, Generator
 
 from fastapi import BackgroundTasks
@@ -6,6 +6,7 @@ from fastapi import BackgroundTasks
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
 from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.token_manager import token_manager
 from app.internal.setting import Settings
 
 
@@ -57,52 +58,41 @@ def process_leg_data(check_transshipment: bool, first_point_from: str, last_poin
     return leg_list
 
 
-def process_response_data(task: dict, vessel_imo: str, service: str, tsp: str) -> Iterator:
+def process_response_data(task: dict) -> Iterator:
     """Map the schedule and leg body"""
-    service_code: str = task['serviceCode']
-    service_name: str = task['serviceName']
-    check_service: bool = service_code == service or service_name == service if service else True
     check_transshipment: bool = len(task['legs']) > 1
-    transshipment_port: bool = any(
-        tsport['departureUnloc'] == tsp for tsport in task['legs'][1:]) if check_transshipment and tsp else False
-    check_vessel_imo: bool = (task['imoNumber'] == vessel_imo or any(
-        imo for imo in task['legs'] if imo.get('transportID') == vessel_imo)) if vessel_imo else True
-    if (transshipment_port or not tsp) and check_service and check_vessel_imo:
-        carrier_code: str = task['scac']
-        transit_time: int = round(task['transitDurationHrsUtc'] / 24)
-        first_point_from: str = task['originUnloc']
-        last_point_to: str = task['destinationUnloc']
-        first_etd: str = task['originDepartureDateEstimated']
-        last_eta: str = task['destinationArrivalDateEstimated']
-        schedule_body = Schedule.model_construct(scac=carrier_code, pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=first_etd, eta=last_eta,
-                                                 transitTime=transit_time, transshipment=check_transshipment,
-                                                 legs=process_leg_data(check_transshipment=check_transshipment,
-                                                                       schedule_task=task,
-                                                                       first_point_from=first_point_from,
-                                                                       last_point_to=last_point_to,
-                                                                       first_etd=first_etd, last_eta=last_eta,
-                                                                       transit_time=transit_time))
-        yield schedule_body
-
-
-async def get_one_access_token(client: HTTPClientWrapper, background_task: BackgroundTasks, token_url: str, auth: str,
-                               api_key: str) -> str:
-    headers: dict = {'apikey': api_key, 'Authorization': auth, 'Accept': 'application/json'}
-    response_token: dict = await anext(
-        client.parse(method='POST', background_tasks=background_task, url=token_url, headers=headers,
-                     namespace='one token', expire=timedelta(minutes=55)))
-    return response_token['access_token']
+    carrier_code: str = task['scac']
+    transit_time: int = round(task['transitDurationHrsUtc'] / 24)
+    first_point_from: str = task['originUnloc']
+    last_point_to: str = task['destinationUnloc']
+    first_etd: str = task['originDepartureDateEstimated']
+    last_eta: str = task['destinationArrivalDateEstimated']
+    schedule_body = Schedule.model_construct(scac=carrier_code, pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=first_etd, eta=last_eta,
+                                             transitTime=transit_time, transshipment=check_transshipment,
+                                             legs=process_leg_data(check_transshipment=check_transshipment,
+                                                                   schedule_task=task,
+                                                                   first_point_from=first_point_from,
+                                                                   last_point_to=last_point_to,
+                                                                   first_etd=first_etd, last_eta=last_eta,
+                                                                   transit_time=transit_time))
+    yield schedule_body
+
+
+async def get_one_access_token(client: HTTPClientWrapper, api_settings: Settings) -> Optional[dict]:
+    headers: dict = {'apikey': api_settings.oney_token.get_secret_value(),
+                     'Authorization': api_settings.oney_auth.get_secret_value(), 'Accept': 'application/json'}
+    return await anext(client.parse(method='POST', url=api_settings.oney_turl, headers=headers))
+
+
+token_manager.register(scac='ONEY', fetch=get_one_access_token)
 
 
 async def get_one_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, api_settings: Settings,
-                      pol: str, pod: str, search_range: SearchRange,
-                      direct_only: Optional[bool], start_date_type: StartDateType,
+                      pol: str, pod: str, search_range: SearchRange, start_date_type: StartDateType,
                       scac: Optional[str] = None,
                       departure_date: Optional[date] = None,
-                      arrival_date: Optional[date] = None,
-                      service: Optional[str] = None, vessel_imo: Optional[str] = None,
-                      tsp: Optional[str] = None) -> Generator:
+                      arrival_date: Optional[date] = None) -> Generator:
     # Construct request parameters
     params: dict = {
         'originPort': pol,
@@ -110,23 +100,17 @@ async def get_one_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
         'searchDate': str(departure_date or arrival_date),
         'searchDateType': 'BY_DEPARTURE_DATE' if start_date_type == StartDateType.departure else 'BY_ARRIVAL_DATE',
         'weeksOut': search_range.value,
-        'directOnly': 'TRUE' if direct_only is True else 'FALSE'
+        'directOnly': 'FALSE'  # directOnly is applied by the filter stage so that one response serves both
     }
 
     # Define a function to generate schedule results
     def generate_schedule(data: dict) -> Generator:
         for schedule_type, tasks in data.items():
             for task in tasks:
-                yield from process_response_data(task=task, vessel_imo=vessel_imo, service=service, tsp=tsp)
+                yield from process_response_data(task=task)
 
     # Fetch access token
-    token: str = await get_one_access_token(
-        client=client,
-        background_task=background_task,
-        token_url=api_settings.oney_turl,
-        auth=api_settings.oney_auth.get_secret_value(),
-        api_key=api_settings.oney_token.get_secret_value()
-    )
+    token: str = await token_manager.get(scac='ONEY', client=client)
 
     # Construct request headers
     headers: dict = {
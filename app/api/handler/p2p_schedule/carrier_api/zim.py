@@ -1,11 +1,13 @@
 from datetime import datetime, timedelta
-from typing import Iterator, Optional, Generator
+from typing import Iterator, List, Optional
 
 from fastapi import BackgroundTasks
 
+from app.api.schemas.carrier_dates import transit_days
 from app.api.schemas.schema_request import SearchRange, StartDateType
 from app.api.schemas.schema_response import Cutoff, Leg, PointBase, Schedule, Service, Transportation, Voyage
-from app.internal.http.http_client_manager import HTTPClientWrapper
+from app.internal.http.http_client_manager import HTTPClientWrapper, map_items
+from app.internal.http.token_manager import token_manager
 from app.internal.setting import Settings
 
 TRANSPORT_TYPE: dict = {'Land Trans': 'Truck', 'Feeder': 'Feeder', 'TO BE NAMED': 'Vessel', 'BAR': 'Barge'}
@@ -29,7 +31,7 @@ def process_leg_data(leg_task: list, check_nearest_pol_etd: tuple) -> list:
         pointTo=PointBase.model_construct(locationName=leg['arrivalPortName'], locationCode=leg['arrivalPort']),
         etd=(etd := leg['departureDate']),
         eta=(eta := leg['arrivalDate']),
-        transitTime=int((datetime.fromisoformat(eta) - datetime.fromisoformat(etd)).days),
+        transitTime=transit_days(etd=etd, eta=eta),
         transportations=Transportation.model_construct(
             transportType=(transport := TRANSPORT_TYPE.get(leg['vesselName'], 'Vessel')),
             transportName=(vessel_name := leg['vesselName']), referenceType='IMO',
@@ -46,41 +48,32 @@ def process_leg_data(leg_task: list, check_nearest_pol_etd: tuple) -> list:
     return leg_list
 
 
-def process_schedule_data(task: dict, direct_only: bool | None, vessel_imo: str, service: str, tsp: str) -> Iterator:
+def process_schedule_data(task: dict) -> Iterator:
     """Map the schedule and leg body"""
-    check_service_code: bool = any(
-        service == services['line'] for services in task['routeLegs'] if services.get('voyage')) if service else True
     check_transshipment: bool = task['routeLegCount'] > 1
-    check_vessel_imo: bool = any(
-        imo for imo in task['routeLegs'] if imo.get('lloydsCode') == vessel_imo) if vessel_imo else True
-    transshipment_port: bool = any(
-        tsport['departurePort'] == tsp for tsport in task['routeLegs'][1:]) if check_transshipment and tsp else False
-    if (transshipment_port or not tsp) and (direct_only is None or direct_only != check_transshipment) and (
-            check_service_code or not service) and check_vessel_imo:
-        transit_time: int = task['transitTime']
-        first_point_from: str = task['departurePort']
-        check_nearest_pol_etd: tuple = next(
-            (leg['legOrder'], leg['departureDate']) for leg in task['routeLegs'][::-1] if
-            leg['departurePort'] == first_point_from)
-        last_point_to: str = task['arrivalPort']
-        last_eta: str = task['arrivalDate']
-        schedule_body = Schedule.model_construct(scac='ZIMU', pointFrom=first_point_from, pointTo=last_point_to,
-                                                 etd=check_nearest_pol_etd[1], eta=last_eta,
-                                                 transitTime=transit_time, transshipment=check_transshipment,
-                                                 legs=process_leg_data(leg_task=task['routeLegs'],
-                                                                       check_nearest_pol_etd=check_nearest_pol_etd))
-        yield schedule_body
-
-
-async def get_zim_access_token(client: HTTPClientWrapper, background_tasks: BackgroundTasks, token_url: str,
-                               api_key: str, client_id: str, secret: str) -> str:
-    headers: dict = {'Ocp-Apim-Subscription-Key': api_key}
-    params: dict = {'grant_type': 'client_credentials', 'client_id': client_id, 'client_secret': secret,
-                    'scope': 'Vessel Schedule'}
-    response_token: dict = await anext(
-        client.parse(background_tasks=background_tasks, method='POST', url=token_url, headers=headers, data=params,
-                     expire=timedelta(minutes=55), namespace='zim token'))
-    return response_token['access_token']
+    transit_time: int = task['transitTime']
+    first_point_from: str = task['departurePort']
+    check_nearest_pol_etd: tuple = next(
+        (leg['legOrder'], leg['departureDate']) for leg in task['routeLegs'][::-1] if
+        leg['departurePort'] == first_point_from)
+    last_point_to: str = task['arrivalPort']
+    last_eta: str = task['arrivalDate']
+    schedule_body = Schedule.model_construct(scac='ZIMU', pointFrom=first_point_from, pointTo=last_point_to,
+                                             etd=check_nearest_pol_etd[1], eta=last_eta,
+                                             transitTime=transit_time, transshipment=check_transshipment,
+                                             legs=process_leg_data(leg_task=task['routeLegs'],
+                                                                   check_nearest_pol_etd=check_nearest_pol_etd))
+    yield schedule_body
+
+
+async def get_zim_access_token(client: HTTPClientWrapper, api_settings: Settings) -> Optional[dict]:
+    headers: dict = {'Ocp-Apim-Subscription-Key': api_settings.zim_token.get_secret_value()}
+    params: dict = {'grant_type': 'client_credentials', 'client_id': api_settings.zim_client.get_secret_value(),
+                    'client_secret': api_settings.zim_secret.get_secret_value(), 'scope': 'Vessel Schedule'}
+    return await anext(client.parse(method='POST', url=api_settings.zim_turl, headers=headers, data=params))
+
+
+token_manager.register(scac='ZIMU', fetch=get_zim_access_token)
 
 
 async def get_zim_p2p(client: HTTPClientWrapper, background_task: BackgroundTasks, api_settings: Settings,
@@ -88,10 +81,8 @@ async def get_zim_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
                       pod: str,
                       search_range: SearchRange, start_date_type: StartDateType,
                       scac: Optional[str] = None,
-                      direct_only: Optional[bool] = None,
-                      departure_date: Optional[datetime.date] = None, arrival_date: Optional[datetime.date] = None,
-                      vessel_imo: Optional[str] = None, service: Optional[str] = None,
-                      tsp: Optional[str] = None) -> Generator:
+                      departure_date: Optional[datetime.date] = None,
+                      arrival_date: Optional[datetime.date] = None) -> Optional[List[Schedule]]:
     # Construct request parameters
     params: dict = {
         'originCode': pol,
@@ -103,22 +94,8 @@ async def get_zim_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
         'sortByDepartureOrArrival': start_date_type
     }
 
-    # Define a function to generate schedule results
-    def generate_schedule(data: dict) -> Generator:
-        for task in data.get('response', {}).get('routes', []):
-            for result in process_schedule_data(task=task, direct_only=direct_only, vessel_imo=vessel_imo,
-                                                service=service, tsp=tsp):
-                yield result
-
     # Fetch access token
-    token: str = await get_zim_access_token(
-        client=client,
-        background_tasks=background_task,
-        token_url=api_settings.zim_turl,
-        api_key=api_settings.zim_token.get_secret_value(),
-        client_id=api_settings.zim_client.get_secret_value(),
-        secret=api_settings.zim_secret.get_secret_value()
-    )
+    token: str = await token_manager.get(scac='ZIMU', client=client)
 
     headers: dict = {
         'Ocp-Apim-Subscription-Key': api_settings.zim_token.get_secret_value(),
@@ -126,18 +103,17 @@ async def get_zim_p2p(client: HTTPClientWrapper, background_task: BackgroundTask
         'Accept': 'application/json'
     }
 
-    # Fetch data from the API
-    response_json: dict = await anext(
-        client.parse(
-            background_tasks=background_task,
-            method='GET',
-            url=api_settings.zim_url,
-            params=params,
-            headers=headers,
-            namespace='zim original response'
-        )
-    )
-
-    # Validate response and return the schedule generator if data is available
-    if response_json:
-        return generate_schedule(data=response_json)
+    # Fetch data from the API,the routes are mapped in the offload thread batch by batch as they are decoded
+    schedules: List[Schedule] = await map_items(client.parse_items(
+        path=('response', 'routes'),
+        background_tasks=background_task,
+        method='GET',
+        url=api_settings.zim_url,
+        params=params,
+        headers=headers,
+        namespace='zim original response'
+    ), mapper=process_schedule_data)
+
+    # Return the schedules if data is available
+    if schedules:
+        return schedules
@@ -0,0 +1,116 @@
+import logging
+import math
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import BackgroundTasks
+
+from app.api.schemas.schema_request import SearchRange, StartDateType
+from app.api.schemas.schema_response import Schedule
+from app.api.schemas.schema_serializer import pack_schedules, unpack_schedules
+from app.internal.http.cache_key import mapper_version
+from app.internal.http.http_client_manager import is_revalidating
+from app.internal.offload import offloader
+from app.internal.setting import load_yaml
+from app.storage import db
+
+LANE_NAMESPACE: str = 'lane schedules'
+
+
+def schedule_day(schedule: Schedule, start_date_type: StartDateType) -> Optional[date]:
+    """The day a schedule is filed under,its departure or its arrival depending on what the carrier was searched by"""
+    try:
+        return date.fromisoformat(str(schedule.etd if start_date_type == StartDateType.departure else schedule.eta)[:10])
+    except ValueError:
+        return None
+
+
+def select_schedules(stored: List[bytes], fetched: List[Schedule]) -> List[Schedule]:
+    return [schedule for payload in stored for schedule in unpack_schedules(payload)] + fetched
+
+
+def pack_days(days: Dict[str, List[Schedule]]) -> Dict[str, bytes]:
+    return {key: pack_schedules(schedules) for key, schedules in days.items()}
+
+
+class LaneStore:
+    """Carrier schedules filed in redis per scac,lane,search type and day.A search reads the days of its window and
+    only asks the carrier for the span of days nobody has searched yet,so a one week search right after a four week
+    one of the same lane does not call the carrier at all.The optional filters are applied on top of what is returned
+    here so every filter combination of a lane shares the same days"""
+
+    def __init__(self, setting: dict) -> None:
+        self.enabled: bool = setting['enabled']
+        self.expire: int = setting['expire']
+        self.searches: Counter = Counter()
+        self.days_reused: int = 0
+        self.days_fetched: int = 0
+
+    @staticmethod
+    def day_key(scac: str, pol: str, pod: str, start_date_type: StartDateType, day: date) -> str:
+        return f'{scac}:v{mapper_version(scac)}:{pol}:{pod}:{start_date_type}:{day.isoformat()}'
+
+    async def search(self, handler: Callable[..., Awaitable[Any]], scac: str, pol: str, pod: str,
+                     start_date_type: StartDateType, search_range: SearchRange, background_task: BackgroundTasks,
+                     departure_date: Optional[date] = None, arrival_date: Optional[date] = None,
+                     **kwargs: Any) -> Optional[List[Schedule]]:
+        """Return the schedules of the window or None if the carrier had to be called and did not answer"""
+        start: date = departure_date or arrival_date
+        window: List[date] = [start + timedelta(days=offset) for offset in range(int(search_range.duration))]
+        # A revalidation must not be answered with the days it is meant to refresh
+        stored: List[Optional[bytes]] = [None] * len(window) if is_revalidating() else await db.mget(
+            keys=[self.day_key(scac, pol, pod, start_date_type, day) for day in window], namespace=LANE_NAMESPACE)
+        missing: List[date] = [day for day, payload in zip(window, stored) if payload is None]
+        fetched: List[Schedule] = []
+        self.days_reused += len(window) - len(missing)
+        self.searches['reused' if not missing else 'fetched' if len(missing) == len(window) else 'partial'] += 1
+        if missing:
+            days: Optional[Dict[date, List[Schedule]]] = await self.__fetch(
+                handler=handler, scac=scac, pol=pol, pod=pod, start_date_type=start_date_type, first=missing[0],
+                last=missing[-1], background_task=background_task, **kwargs)
+            if days is None and len(missing) == len(window):
+                return None
+            fetched = [schedule for day in missing for schedule in (days or {}).get(day, ())]
+        return await offloader.run_in_thread(select_schedules, [payload for payload in stored if payload], fetched)
+
+    async def __fetch(self, handler: Callable[..., Awaitable[Any]], scac: str, pol: str, pod: str,
+                      start_date_type: StartDateType, first: date, last: date, background_task: BackgroundTasks,
+                      **kwargs: Any) -> Optional[Dict[date, List[Schedule]]]:
+        """Search the carrier from the first missing day for as many weeks as it takes to reach the last one and file
+        every schedule under its day.The missing days are stored,a day without any schedule included,up to the last
+        day the carrier returned a schedule for so the days beyond its horizon are asked again later"""
+        weeks: int = min(math.ceil(((last - first).days + 1) / 7), len(SearchRange))
+        result = await handler(scac=scac, pol=pol, pod=pod, start_date_type=start_date_type,
+                               search_range=SearchRange(str(weeks)), background_task=background_task,
+                               departure_date=first if start_date_type == StartDateType.departure else None,
+                               arrival_date=first if start_date_type == StartDateType.arrival else None,
+                               **kwargs)
+        if result is None:
+            return None
+        days: Dict[date, List[Schedule]] = {first + timedelta(days=offset): [] for offset in range(weeks * 7)}
+        for schedule in await offloader.run_in_thread(list, result):
+            if (day := schedule_day(schedule, start_date_type)) in days:
+                days[day].append(schedule)
+        horizon: date = min(last, max((day for day, schedules in days.items() if schedules),
+                            default=first - timedelta(days=1)))
+        filed: Dict[str, List[Schedule]] = {self.day_key(scac, pol, pod, start_date_type, day): schedules
+                                            for day, schedules in days.items() if day <= horizon}
+        self.days_fetched += len(filed)
+        await self.store(values=filed)
+        return days
+
+    async def store(self, values: Dict[str, List[Schedule]]) -> None:
+        try:
+            payloads: Dict[str, bytes] = await offloader.run_in_thread(pack_days, values)
+        except TypeError as pack_error:
+            logging.warning(f'Unable to file the schedules into the lane store - {pack_error}')
+            return
+        for key, payload in payloads.items():
+            await db.set_later(key=key, value=payload, expire=self.expire, namespace=LANE_NAMESPACE, overwrite=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'searches': dict(self.searches), 'daysReused': self.days_reused, 'daysFetched': self.days_fetched}
+
+
+lane_store = LaneStore(load_yaml()['data']['laneStore'])
@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import heapq
+import zlib
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+
+import orjson
+
+from app.api.schemas.schedule_table import ScheduleTable
+from app.api.schemas.schema_request import SortBy
+
+PAGE_INDEX_NAMESPACE: str = 'schedule page index'
+
+SCHEDULES_FIELD: bytes = b',"schedules":['
+
+SORT_KEYS: Dict[SortBy, Callable[[dict], tuple]] = {
+    SortBy.etd: lambda schedule: (schedule['etd'], schedule['transitTime']),
+    SortBy.eta: lambda schedule: (schedule['eta'], schedule['transitTime']),
+    SortBy.transit_time: lambda schedule: (schedule['transitTime'], schedule['etd']),
+}
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued for this search and sort order"""
+
+
+def search_digest(cache_key: str, sort_by: SortBy) -> str:
+    return hashlib.blake2b(f'{cache_key}|{sort_by}'.encode(), digest_size=8).hexdigest()
+
+
+def encode_cursor(cache_key: str, sort_by: SortBy, offset: int) -> str:
+    """Opaque to the client,it only points at an offset of the cached product of the same search"""
+    cursor: bytes = orjson.dumps({'search': search_digest(cache_key, sort_by), 'offset': offset})
+    return base64.urlsafe_b64encode(cursor).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: Optional[str], cache_key: str, sort_by: SortBy) -> int:
+    if not cursor:
+        return 0
+    try:
+        decoded: dict = orjson.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset: int = decoded['offset']
+        search: str = decoded['search']
+    except (ValueError, TypeError, KeyError) as decode_error:
+        raise InvalidCursor(f'Malformed cursor - {decode_error}') from decode_error
+    if search != search_digest(cache_key, sort_by) or type(offset) is not int or offset < 0:
+        raise InvalidCursor('The cursor belongs to another search or sort order')
+    return offset
+
+
+def top_schedules(schedules: List[dict], sort_by: SortBy, count: int) -> List[dict]:
+    """The product is sorted by etd already,the other orders only need the first schedules up to the end of the page
+    so a heap selects them in O(n log k) instead of sorting the whole product"""
+    if sort_by == SortBy.etd:
+        return schedules[:count]
+    return heapq.nsmallest(count, schedules, key=SORT_KEYS[sort_by])
+
+
+def product_page(product: bytes, cache_key: str, sort_by: SortBy, offset: int, limit: int) -> Optional[bytes]:
+    """A page of the full product with the cursor of the next one,None when the product has no schedules"""
+    page: dict = orjson.loads(product)
+    if 'schedules' not in page:
+        return None
+    schedules: List[dict] = page.pop('schedules')
+    page['schedules'] = top_schedules(schedules, sort_by=sort_by, count=offset + limit)[offset:]
+    page['noofSchedule'] = len(page['schedules'])
+    if offset + limit < len(schedules):
+        page['nextCursor'] = encode_cursor(cache_key=cache_key, sort_by=sort_by, offset=offset + limit)
+    return orjson.dumps(page)
+
+
+def page_index(table: ScheduleTable, product: bytes) -> Optional[bytes]:
+    """Where every row of the product serialized from the table lies and the order of the rows by eta and by transit
+    time,so a page is sliced out of the product without decoding it.
+    Layout as unsigned ints:product length,crc32 of the product,count,count + 1 row bounds,eta order,transit time
+    order.None when the product was not joined from the rows e.g. by the pydantic fallback"""
+    count: int = len(table)
+    start: int = len(product) - 2 - sum(len(row) for row in table.rows) - max(count - 1, 0)
+    if not count or product[start - len(SCHEDULES_FIELD):start] != SCHEDULES_FIELD or not product.startswith(
+            table.rows[0], start) or product[-2:] != b']}':
+        return None
+    positions = array('I', (len(product), zlib.crc32(product), count))
+    for row in table.rows:
+        positions.append(start)
+        start += len(row) + 1
+    positions.append(start)
+    etd, eta, transit_time = table.etd, table.eta, table.transit_time
+    positions.extend(sorted(range(count), key=lambda index: (eta[index], transit_time[index])))
+    positions.extend(sorted(range(count), key=lambda index: (transit_time[index], etd[index])))
+    return positions.tobytes()
+
+
+def indexed_page(product: bytes, index: bytes, cache_key: str, sort_by: SortBy, offset: int,
+                 limit: int) -> Optional[bytes]:
+    """The same page as product_page sliced out of the product,only its header is decoded.None when the index was
+    written for another version of the product.The product and its index are separate keys and a revalidated product
+    often has the same length,so its checksum is compared as well"""
+    positions = array('I')
+    positions.frombytes(index)
+    if len(positions) < 3 or positions[0] != len(product) or positions[1] != zlib.crc32(product):
+        return None
+    count: int = positions[2]
+    bounds: Sequence[int] = positions[3:count + 4]
+    orders: Dict[SortBy, Sequence[int]] = {SortBy.etd: range(count), SortBy.eta: positions[count + 4:2 * count + 4],
+                                           SortBy.transit_time: positions[2 * count + 4:]}
+    rows: List[bytes] = [product[bounds[row]:bounds[row + 1] - 1] for row in orders[sort_by][offset:offset + limit]]
+    header: dict = orjson.loads(product[:bounds[0] - len(SCHEDULES_FIELD)] + b'}')
+    header['noofSchedule'] = len(rows)
+    page: bytes = orjson.dumps(header)[:-1] + SCHEDULES_FIELD + b','.join(rows) + b']'
+    if offset + limit < count:
+        page += b',"nextCursor":' + orjson.dumps(encode_cursor(cache_key=cache_key, sort_by=sort_by,
+                                                               offset=offset + limit))
+    return page + b'}'
@@ -0,0 +1,57 @@
+from itertools import compress
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from app.api.schemas.schema_response import Schedule
+
+
+def transshipment_ports(schedule: Schedule) -> FrozenSet[str]:
+    return frozenset(leg.pointFrom.locationCode for leg in schedule.legs[1:] if leg.pointFrom)
+
+
+def vessel_imos(schedule: Schedule) -> FrozenSet[str]:
+    return frozenset(str(leg.transportations.reference) for leg in schedule.legs if
+                     leg.transportations and leg.transportations.reference is not None)
+
+
+def service_codes(schedule: Schedule) -> FrozenSet[str]:
+    return frozenset(str(value) for leg in schedule.legs if leg.services for value in
+                     (leg.services.serviceCode, leg.services.serviceName) if value is not None)
+
+
+class ScheduleFilter:
+    """The optional search filters (directOnly,transhipmentPort,vesselIMO,service) applied to the mapped schedules
+    instead of being sent to the carriers,so one carrier response serves every combination of them.Only the columns
+    of the given filters are extracted and the masks are combined in one pass"""
+
+    def __init__(self, direct_only: Optional[bool] = None, tsp: Optional[str] = None,
+                 vessel_imo: Optional[str] = None, service: Optional[Any] = None) -> None:
+        self.direct_only: Optional[bool] = direct_only
+        self.tsp: Optional[str] = tsp
+        self.vessel_imo: Optional[str] = vessel_imo
+        self.service: Optional[str] = str(service) if service else None
+
+    @property
+    def active(self) -> bool:
+        return self.direct_only is not None or bool(self.tsp or self.vessel_imo or self.service)
+
+    def predicates(self) -> Dict[Callable[[Schedule], Any], Callable[[Any], bool]]:
+        """Column extractor and the test of its value for every given filter"""
+        predicates: Dict[Callable[[Schedule], Any], Callable[[Any], bool]] = {}
+        if self.direct_only is not None:
+            predicates[lambda schedule: schedule.transshipment] = lambda transshipment: (
+                transshipment != self.direct_only)
+        if self.tsp:
+            predicates[transshipment_ports] = lambda ports: self.tsp in ports
+        if self.vessel_imo:
+            predicates[vessel_imos] = lambda imos: self.vessel_imo in imos
+        if self.service:
+            predicates[service_codes] = lambda services: self.service in services
+        return predicates
+
+    def apply(self, schedules: Iterable[Schedule]) -> List[Schedule]:
+        schedules = list(schedules)
+        if not self.active:
+            return schedules
+        masks: List[List[bool]] = [[check(value) for value in map(column, schedules)] for column, check in
+                                   self.predicates().items()]
+        return list(compress(schedules, map(all, zip(*masks))))
@@ -0,0 +1,158 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from app.api.handler.p2p_schedule.aggregator import schedule_flight
+from app.api.handler.p2p_schedule.batch import batch_limits
+from app.api.handler.p2p_schedule.carrier_api.maersk import cutoff_flight, location_flight
+from app.api.handler.p2p_schedule.lane_store import lane_store
+from app.internal.http.circuit_breaker import circuit_breakers
+from app.internal.http.hedging import hedge_policies
+from app.internal.http.http_client_manager import http_client
+from app.internal.http.range_pages import range_paginators
+from app.internal.http.rate_limiter import carrier_limiters
+from app.internal.http.token_manager import token_manager
+from app.internal.http.warmup import host_latency
+from app.internal.security import basic_auth
+from app.storage import db
+
+router = APIRouter(prefix='/metrics', tags=["Metrics"], dependencies=[Depends(basic_auth)])
+
+
+@router.get("/cache", summary="Local cache statistics of this worker")
+async def get_cache_metrics() -> Dict[str, Any]:
+    """
+    - **hitRate** : hits / (hits + misses) of the in-process tier since the worker started
+    - **residentBytes** : size of all the serialized responses currently held by the in-process tier
+    - **evictions** : entries dropped to stay within maxBytes
+    """
+    return db.local_cache.stats()
+
+
+@router.get("/cache/namespaces", summary="Cache hit ratio of every namespace looked up by this worker")
+async def get_cache_namespace_metrics() -> Dict[str, Any]:
+    """
+    - **hitRate** : hits / (hits + misses) of the namespace e.g. one carrier original response,local and redis tiers together
+    """
+    return db.namespace_stats()
+
+
+@router.get("/write-behind", summary="Cache writes queued by this worker")
+async def get_write_behind_metrics() -> Dict[str, Any]:
+    """
+    - **queueDepth** : writes waiting for the flusher,the requests wait once it reaches maxPending
+    - **coalesced** : writes merged into a queued write of the same key
+    - **dropped** : writes given up after waiting maxWait for room in the queue
+    - **flushLatency** : seconds taken by the last,average and slowest of the recent pipelines
+    """
+    return db.write_behind.stats()
+
+
+@router.get("/single-flight", summary="Coalesced P2P searches of this worker")
+async def get_single_flight_metrics() -> Dict[str, Any]:
+    """
+    - **coalescedWaiters** : requests that awaited an identical in-flight search instead of starting their own
+    - **crossWorkerWaiters** : requests that waited for another worker holding the redis lease of the search
+    """
+    return schedule_flight.stats()
+
+
+@router.get("/batch", summary="Lanes searched by the batches of this worker")
+async def get_batch_metrics() -> Dict[str, Any]:
+    """
+    - **searches** : distinct searches of all the batches answered from the cache (cached),fetched or failed
+    - **lanesInFlight/carriersInFlight** : lanes being fetched now,capped by maxConcurrentLanes and maxConcurrentPerCarrier
+    - **sharedLookups** : maersk location and cutoff lookups which joined an identical in-flight one
+    """
+    return dict(batch_limits.stats(), sharedLookups={flight.name: flight.stats()['coalescedWaiters'] for flight in
+                                                     (location_flight, cutoff_flight)})
+
+
+@router.get("/lane-store", summary="Days of the carrier searches answered from the lane store by this worker")
+async def get_lane_store_metrics() -> Dict[str, Any]:
+    """
+    - **searches** : carrier searches fully answered from the store (reused),partly (partial) or not at all (fetched)
+    - **daysReused** : days read from the store instead of the carrier
+    - **daysFetched** : days requested from the carriers and filed into the store
+    """
+    return lane_store.stats()
+
+
+@router.get("/rate-limits", summary="Adaptive concurrency limits of the carriers on this worker")
+async def get_rate_limit_metrics() -> Dict[str, Any]:
+    """
+    - **limit** : concurrency limit currently allowed by AIMD
+    - **throttled** : 429/503 responses received from the carrier
+    - **rejected** : requests skipped because the carrier budget was exhausted for longer than maxWait
+    - **cooldown** : seconds left of the last Retry-After
+    """
+    return carrier_limiters.stats()
+
+
+@router.get("/range-pages", summary="Pages of the 206 carrier responses fetched by this worker")
+async def get_range_page_metrics() -> Dict[str, Any]:
+    """
+    - **window** : pages currently fetched ahead of the one being mapped,adjusted with AIMD between minWindow and maxWindow
+    - **responses** : 206 responses whose next pages were fetched
+    - **retried** : page attempts which failed,timed out or were throttled and were sent again
+    - **failed** : pages given up after all their attempts,each one failed the search of its carrier
+    - **pageLatency** : seconds taken by the recent successful pages
+    """
+    return range_paginators.stats()
+
+
+@router.get("/circuit-breakers", summary="Circuit breaker of every carrier called by this worker")
+async def get_circuit_breaker_metrics() -> Dict[str, Any]:
+    """
+    - **state** : closed,open (the carrier is skipped) or half-open (the next search probes the carrier)
+    - **shortCircuited** : searches which skipped the carrier because its circuit was open
+    - **retryIn** : seconds before an open circuit lets a probe through
+    - **transitions** : latest state changes with their reason
+    """
+    return circuit_breakers.stats()
+
+
+@router.get("/hedging", summary="Hedged carrier calls of this worker")
+async def get_hedging_metrics() -> Dict[str, Any]:
+    """
+    - **hedged** : calls sent a second time because they were slower than hedgeDelay
+    - **hedgeWins** : hedges that answered before the original call
+    - **skippedOutOfBudget** : hedges not sent because the carrier had no token left
+    - **hedgeDelay** : current percentile latency of the carrier,null until enough calls have been observed
+    """
+    return hedge_policies.stats()
+
+
+@router.get("/access-tokens", summary="Carrier access tokens held by this worker")
+async def get_access_token_metrics() -> Dict[str, Any]:
+    """
+    - **expiresIn** : seconds left before the token in memory expires,0 when the worker holds none
+    - **refreshes** : tokens granted by the carrier since the worker started
+    - **failures** : refreshes the carrier did not grant
+    - **refreshingAhead** : whether the token is being refreshed in the background before it expires
+    """
+    return token_manager.stats()
+
+
+@router.get("/connection-pools", summary="Connection pool of every carrier called by this worker")
+async def get_connection_pool_metrics() -> Dict[str, Any]:
+    """
+    - **limit** : connections the pool of the scac may hold,limitPerHost per host of the scac (0 = up to limit)
+    - **idle** : kept-alive connections waiting for the next request
+    - **active** : connections carrying a request or its response body
+    - **acquiring** : requests waiting for a connection because the pool is full
+    - **queued** : requests which had to wait for a connection since the worker started
+    """
+    return http_client.pools.stats() if http_client.pools else {}
+
+
+@router.get("/connections", summary="Latency of the carrier hosts on new and reused connections")
+async def get_connection_metrics() -> Dict[str, Any]:
+    """
+    - **transport** : HTTP version of the latest response,HTTP/2 for the hosts listed under http2
+    - **prewarmed** : connections opened to the host at startup
+    - **cold** : seconds up to the response headers of the requests which had to open their connection
+    - **warm** : seconds up to the response headers of the requests which reused a kept-alive connection
+    - **connect** : seconds taken by DNS,TCP and TLS when a connection was opened
+    """
+    return host_latency.stats()
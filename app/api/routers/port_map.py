@@ -22,10 +22,8 @@ async def upload_port_code_mapping(upload_file: UploadFile):
     - **kn_port_code** : Provide kn port code that you usually request from API hub and would like to convert it to carrier port code
     - **carrier_port_code** : Provide carrier port code.This code is what we endup using for API request.
     """
-    chunk_size: int = 1024
     try:
-        chunk = await upload_file.read(chunk_size)
-        content_str = chunk.decode("utf-8")
+        content_str = (await upload_file.read()).decode("utf-8")
         csv_file = io.StringIO(content_str)
         reader = csv.DictReader(csv_file)
         required_columns: list[str] = ["scac", "kn_port_code", "carrier_port_code"]
@@ -34,7 +32,7 @@ async def upload_port_code_mapping(upload_file: UploadFile):
                                 detail="File is missing one or more required columns.")
         try:
             validated = PORT_CODE_ADAPTER.validate_python(reader)
-            await db.bulk_set(PORT_CODE_ADAPTER.dump_python(validated))
+            await db.bulk_set(PORT_CODE_ADAPTER.dump_python(validated, mode='json'))
             return JSONResponse(status_code=status.HTTP_200_OK, content='OK')
         except ValidationError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Validation error:{e.errors()}")
@@ -49,7 +47,7 @@ async def read_port_code_mapping(
     kn_port_code: str | None = Query(alias='knPortCode', default=None, max_length=5, pattern=r"[A-Z]{2}[A-Z0-9]{3}",
                                      example='HKHKG', description='Search by either port or point of origin')):
     try:
-        read_result = await db.read_port_mapping_code(scac=scac, kn_port_code=kn_port_code)
+        read_result = await db.read_port_mapping_code(scac=scac.value if scac else None, kn_port_code=kn_port_code)
         validated = PORT_CODE_ADAPTER.validate_python(read_result) if read_result else ...
         final_result = PORT_CODE_ADAPTER.dump_python(validated) if read_result else 'No result match the request'
         return JSONResponse(status_code=status.HTTP_200_OK, content=final_result)
@@ -64,7 +62,7 @@ async def refresh_port_code_mapping(query_params: Annotated[PortCodeMapping, Que
     so if you delete certain port code mapping using delete API, you also have to refresh the port code mapping with this API.
     """
     try:
-        updated_result = await db.update_carrier_port_code(scac=query_params.scac,
+        updated_result = await db.update_carrier_port_code(scac=query_params.scac.value,
                                                            kn_port_code=query_params.kn_port_code,
                                                            new_carrier_port_code=query_params.carrier_port_code)
         final_result = jsonable_encoder(updated_result)
@@ -82,7 +80,7 @@ async def delete_port_code_mapping(
     You can choose to delete either all the port mapping  or specific port mapping based on scac or/and kn port code
     """
     try:
-        await db.delete_port_mapping_code(scac=scac, kn_port_code=kn_port_code)
+        await db.delete_port_mapping_code(scac=scac.value if scac else None, kn_port_code=kn_port_code)
         return JSONResponse(status_code=status.HTTP_200_OK, content='Deleted all entries')
     except ValidationError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Validation error:{e.errors()}")
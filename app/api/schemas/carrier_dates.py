@@ -0,0 +1,74 @@
+"""
+Every carrier timestamp is parsed once into integer seconds since the epoch and the result is memoized,a 4 week lane
+repeats the same sailing dates in every schedule calling at it.
+The comparisons and the transit time math are done on the integers and a date is only formatted again for the product.
+Two clocks are kept apart:
+wall_clock_epoch is the local time printed by the carrier with its utc offset dropped,which is what the product shows
+utc_epoch is the actual instant,what datetime.fromisoformat compares and subtracts
+"""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+
+DAY: int = 86400
+ONE_SECOND: timedelta = timedelta(seconds=1)
+EPOCH: datetime = datetime(1970, 1, 1)
+UTC_EPOCH: datetime = EPOCH.replace(tzinfo=timezone.utc)
+WALL_CLOCK_PATTERN: re.Pattern = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}')
+WALL_CLOCK_FORMATS: tuple = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+
+def wall_clock(date_string: str) -> str:
+    """The date and time part of a timestamp without its fraction and utc offset"""
+    reformat_date_string: str = date_string.split('+')[0] if '+' in date_string else date_string[:19]
+    return reformat_date_string.split('.')[0] if '.' in reformat_date_string else reformat_date_string
+
+
+def parse_wall_clock(text: str) -> datetime:
+    if WALL_CLOCK_PATTERN.fullmatch(text):
+        return datetime(int(text[:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]), int(text[14:16]),
+                        int(text[17:19]))
+    # Unpadded fields and the like which only strptime accepts
+    return datetime.strptime(text, WALL_CLOCK_FORMATS['T' not in text])
+
+
+@lru_cache(maxsize=16384)
+def wall_clock_epoch(date_string: str) -> Optional[int]:
+    """None when the carrier did not send a date and time"""
+    try:
+        return (parse_wall_clock(wall_clock(date_string)) - EPOCH) // ONE_SECOND
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=16384)
+def iso_8601(epoch: int) -> str:
+    return (EPOCH + timedelta(seconds=epoch)).isoformat()
+
+
+@lru_cache(maxsize=16384)
+def utc_epoch(date_string: str) -> int:
+    """A timestamp without an utc offset is taken as utc.Raises ValueError like datetime.fromisoformat"""
+    moment: datetime = datetime.fromisoformat(date_string)
+    return ((moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)) - UTC_EPOCH) // ONE_SECOND
+
+
+def format_utc(epoch: int, pattern: str) -> str:
+    return (EPOCH + timedelta(seconds=epoch)).strftime(pattern)
+
+
+def transit_days(etd: str, eta: str) -> int:
+    """Whole days from etd to eta,what (fromisoformat(eta) - fromisoformat(etd)).days gives"""
+    return (utc_epoch(eta) - utc_epoch(etd)) // DAY
+
+
+@lru_cache(maxsize=16384)
+def day_number(date_string: str) -> int:
+    return date.fromisoformat(date_string[:10]).toordinal()
+
+
+def calendar_days(etd: str, eta: str) -> int:
+    """Days between the dates of etd and eta regardless of their time"""
+    return day_number(eta) - day_number(etd)
@@ -0,0 +1,153 @@
+"""
+A product used to hold every mapped schedule as a graph of pydantic objects (a schedule,its legs and every point,cutoff,
+transportation,voyage and service of them) until it had been sorted and dumped.
+The table keeps one serialized row per schedule plus the columns the product is sorted,filtered and deduplicated by,
+the port,carrier and voyage codes interned into integers and the dates as epoch seconds, so the model graph of a
+schedule can be dropped as soon as it has been validated.
+"""
+
+from array import array
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from .carrier_dates import wall_clock_epoch
+from .schema_response import Schedule
+from .schema_serializer import schedule_to_dict, serialize_rows, unpack_schedules
+
+DUMMY_IMO: str = '9999999'
+
+
+def epoch(iso_date: str) -> int:
+    """A date pydantic let through unparsed is sorted first"""
+    return wall_clock_epoch(iso_date) or 0
+
+
+def first_sailing(row: dict) -> Tuple[int, str]:
+    """IMO and voyage of the first leg sailing on an actual vessel,(0,'') when every leg has a placeholder reference
+    or the dummy IMO.The external voyage is the one partners of a vessel sharing agreement have in common"""
+    for leg in row.get('legs', ()):
+        reference: str = str(leg.get('transportations', {}).get('reference', ''))
+        if len(reference) == 7 and reference.isdigit() and reference != DUMMY_IMO:
+            voyage: dict = leg['voyages']
+            return int(reference), str(voyage.get('externalVoyage') or voyage['internalVoyage'])
+    return 0, ''
+
+
+def with_offering_scac(row: bytes, scacs: List[str]) -> bytes:
+    """offeringScac is the last field of a schedule"""
+    return row[:-1] + b',"offeringScac":' + orjson.dumps(scacs) + b'}'
+
+
+class ScheduleTable:
+    __slots__ = ('codes', 'code_ids', 'scac', 'point_from', 'point_to', 'etd', 'eta', 'transit_time',
+                 'transshipment', 'vessel', 'voyage', 'rows')
+
+    def __init__(self, codes: Optional[List[str]] = None, code_ids: Optional[Dict[str, int]] = None) -> None:
+        self.codes: List[str] = [] if codes is None else codes
+        self.code_ids: Dict[str, int] = {} if code_ids is None else code_ids
+        self.scac: array = array('I')
+        self.point_from: array = array('I')
+        self.point_to: array = array('I')
+        self.etd: array = array('q')
+        self.eta: array = array('q')
+        self.transit_time: array = array('q')
+        self.transshipment: array = array('b')
+        self.vessel: array = array('q')
+        self.voyage: array = array('I')
+        self.rows: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def intern(self, code: str) -> int:
+        if (code_id := self.code_ids.get(code)) is None:
+            code_id = self.code_ids[code] = len(self.codes)
+            self.codes.append(code)
+        return code_id
+
+    def code(self, code_id: int) -> str:
+        return self.codes[code_id]
+
+    def append(self, schedule: Schedule) -> None:
+        """Validate the schedule exactly like the product serializer does,a ValidationError leaves the table as it was"""
+        row: dict = schedule_to_dict(schedule)
+        self.scac.append(self.intern(row['scac']))
+        self.point_from.append(self.intern(row['pointFrom']))
+        self.point_to.append(self.intern(row['pointTo']))
+        self.etd.append(epoch(row['etd']))
+        self.eta.append(epoch(row['eta']))
+        self.transit_time.append(row['transitTime'])
+        self.transshipment.append(row['transshipment'])
+        vessel, voyage = first_sailing(row)
+        self.vessel.append(vessel)
+        self.voyage.append(self.intern(voyage))
+        self.rows.append(orjson.dumps(row))
+
+    def extend(self, schedules: Iterable[Schedule]) -> 'ScheduleTable':
+        for schedule in schedules:
+            self.append(schedule)
+        return self
+
+    @classmethod
+    def from_schedules(cls, schedules: Iterable[Schedule]) -> 'ScheduleTable':
+        return cls().extend(schedules)
+
+    @classmethod
+    def from_packed(cls, payload: bytes) -> 'ScheduleTable':
+        """Build the table in a process worker out of the schedules packed by pack_schedules"""
+        return cls.from_schedules(unpack_schedules(payload))
+
+    def take(self, indices: Iterable[int]) -> 'ScheduleTable':
+        """A table of the given rows in the given order,the interned codes are shared"""
+        table = ScheduleTable(codes=self.codes, code_ids=self.code_ids)
+        for index in indices:
+            table.scac.append(self.scac[index])
+            table.point_from.append(self.point_from[index])
+            table.point_to.append(self.point_to[index])
+            table.etd.append(self.etd[index])
+            table.eta.append(self.eta[index])
+            table.transit_time.append(self.transit_time[index])
+            table.transshipment.append(self.transshipment[index])
+            table.vessel.append(self.vessel[index])
+            table.voyage.append(self.voyage[index])
+            table.rows.append(self.rows[index])
+        return table
+
+    def compress(self, selectors: Iterable[Any]) -> 'ScheduleTable':
+        return self.take(compress(range(len(self)), selectors))
+
+    def sorted(self) -> 'ScheduleTable':
+        """Earliest departure first then the shortest transit time"""
+        etd, transit_time = self.etd, self.transit_time
+        return self.take(sorted(range(len(self)), key=lambda index: (etd[index], transit_time[index])))
+
+    def sailing(self, index: int) -> Optional[tuple]:
+        """Same vessel and voyage from the same port of loading at the same time to the same port of discharge at the
+        same time,None for a schedule without any actual vessel which is never merged"""
+        if not self.vessel[index]:
+            return None
+        return (self.point_from[index], self.etd[index], self.point_to[index], self.eta[index], self.vessel[index],
+                self.voyage[index])
+
+    def deduplicated(self) -> 'ScheduleTable':
+        """One row per sailing in O(n) with a hash index.The first row of a sailing is kept and lists every scac
+        offering it,a carrier returning the same sailing twice is simply deduplicated"""
+        first_rows: Dict[tuple, int] = {}
+        offering: Dict[int, List[int]] = {}
+        kept: List[int] = []
+        for index in range(len(self)):
+            if (sailing := self.sailing(index)) is None or (first := first_rows.setdefault(sailing, index)) == index:
+                kept.append(index)
+            elif self.scac[index] not in (scacs := offering.setdefault(first, [self.scac[first]])):
+                scacs.append(self.scac[index])
+        table: ScheduleTable = self.take(kept)
+        for position, index in enumerate(kept):
+            if len(offering.get(index, ())) > 1:
+                table.rows[position] = with_offering_scac(table.rows[position], [self.code(scac) for scac in
+                                                                                 offering[index]])
+        return table
+
+    def product_json(self, product_id: Any, origin: str, destination: str) -> bytes:
+        return serialize_rows(product_id=product_id, origin=origin, destination=destination, rows=self.rows)
@@ -2,8 +2,11 @@ from datetime import date
 from enum import Enum, StrEnum
 from typing import Annotated, Any, List, Optional
 
+import orjson
 from pydantic import BaseModel, Field, TypeAdapter
 
+from app.internal.setting import load_yaml
+
 
 class CarrierCode(str, Enum):
     MSCU = 'MSCU'
@@ -29,6 +32,12 @@ class StartDateType(StrEnum):
     arrival = "Arrival"
 
 
+class SortBy(StrEnum):
+    etd = 'ETD'
+    eta = 'ETA'
+    transit_time = 'transitTime'
+
+
 class SearchRange(Enum):
     One = ('1', '7')
     Two = ('2', '14')
@@ -71,6 +80,29 @@ class QueryParams(BaseModel):
                              description="vessel flag", max_length=2, pattern=r"[A-Z]{2}"),]
     service: Annotated[Any, Field(validation_alias='service', serialization_alias='service', default=None,
                                   description="service code or service name")]
+    dedup: Annotated[Optional[bool], Field(default=None,
+                                           description="Merge the same sailing offered by several carriers e.g. vessel sharing partners into one schedule listing every offering scac")]
+    limit: Annotated[Optional[int], Field(default=None, ge=1, le=1000,
+                                          description="Return a page of that many schedules with a nextCursor to fetch the following one")]
+    cursor: Annotated[Optional[str], Field(default=None, max_length=200,
+                                           description="The nextCursor of the previous page,the other parameters must be the same")]
+    sort_by: Annotated[Optional[SortBy], Field(validation_alias='sortBy', serialization_alias='sortBy', default=None,
+                                               description="Order of the pages,ETD (then transit time) when not given,ETA or transitTime")]
+    stream: Annotated[Optional[bool], Field(default=None,
+                                            description="Stream the schedules as NDJSON as soon as each carrier responds,same as Accept:application/x-ndjson")]
+
+    def normalized_key(self) -> str:
+        """Identical searches produce the same key regardless of the parameter order or the scac order in the url.
+        Every page of a search shares the key of its full product"""
+        query: dict = self.model_dump(mode='json', exclude_none=True, exclude={'stream', 'limit', 'cursor', 'sort_by'})
+        query['scac'] = sorted(set(query.get('scac', [])))
+        return orjson.dumps(query, option=orjson.OPT_SORT_KEYS).decode()
+
+
+class BatchQuery(BaseModel):
+    model_config = {"extra": "forbid"}
+    lanes: Annotated[List[QueryParams], Field(min_length=1, max_length=load_yaml()['data']['batch']['maxLanes'],
+                                              description="One search per lane with the same parameters as /schedules/p2p")]
 
 
 class PortCodeMapping(BaseModel):
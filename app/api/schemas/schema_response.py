@@ -1,25 +1,16 @@
 import logging
-from datetime import datetime
 from typing import Annotated, Any, List, Literal, Optional, Union
 from uuid import UUID
 
 from pydantic import AfterValidator, BaseModel, ConfigDict, Field, NonNegativeInt, TypeAdapter, model_validator
 
+from .carrier_dates import iso_8601, wall_clock, wall_clock_epoch
 from .schema_request import CarrierCode
 
 
 def convert_datetime_to_iso_8601(date_string: str) -> str:
-    reformat_date_string = date_string.split("+")[0] if "+" in date_string else date_string[:19]
-    if "." in reformat_date_string:
-        reformat_date_string = reformat_date_string.split(".")[0]
-    try:
-        if "T" in reformat_date_string:
-            date_object = datetime.strptime(reformat_date_string, "%Y-%m-%dT%H:%M:%S")
-        else:
-            date_object = datetime.strptime(reformat_date_string, "%Y-%m-%d %H:%M:%S")
-        return date_object.strftime('%Y-%m-%dT%H:%M:%S')
-    except ValueError:
-        return reformat_date_string
+    epoch: Optional[int] = wall_clock_epoch(date_string)
+    return wall_clock(date_string) if epoch is None else iso_8601(epoch)
 
 
 DateTimeReformat = Annotated[str, AfterValidator(convert_datetime_to_iso_8601)]
@@ -123,6 +114,7 @@ class Schedule(BaseModel):
     transitTime: NonNegativeInt
     transshipment: bool
     legs: List[Leg] = Field(default_factory=list)
+    offeringScac: Optional[List[CarrierCode]] = None
 
     @model_validator(mode='after')
     def check_etd_eta(self) -> 'Schedule':
@@ -139,6 +131,7 @@ class Product(BaseModel):
     destination: Annotated[str, Field(max_length=5, title="Port Of Discharge", pattern=r"[A-Z]{2}[A-Z0-9]{3}")]
     noofSchedule: NonNegativeInt
     schedules: Optional[List[Schedule]] = None
+    nextCursor: Optional[str] = None
 
 
 class Error(BaseModel):
@@ -152,3 +145,4 @@ class HealthCheck(BaseModel):
 
 
 PRODUCT_ADAPTER = TypeAdapter(Product)
+SCHEDULE_ADAPTER = TypeAdapter(Schedule)
@@ -0,0 +1,233 @@
+"""
+The carrier mappers build the response models with model_construct, which skips every validator.
+The response used to be validated and dumped twice (once by gen_all_valid_schedules with exclude_none and once more by the
+response model of FastAPI with exclude_defaults) so the final json is the one of a fully validated model without defaults.
+This module produces the very same json in one pass straight from the constructed models.
+Anything the fast path does not expect (a value pydantic would coerce or reject) is handed over to pydantic for that schedule,
+which either coerces it exactly like before or raises the usual ValidationError.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, List, Optional, get_args
+from uuid import UUID
+
+import orjson
+from pydantic import BaseModel
+
+from .schema_request import CarrierCode
+from .schema_response import (PRODUCT_ADAPTER, REFERENCE_MAPPING, SCHEDULE_ADAPTER, TRANSPORT_TYPE, Cutoff, Leg,
+                              PointBase, Schedule, Service, Transportation, Voyage, convert_datetime_to_iso_8601)
+
+LOCATION_CODE_PATTERN: re.Pattern = re.compile(r'[A-Z]{2}[A-Z0-9]{3}')
+CARRIER_CODES: frozenset = frozenset(code.value for code in CarrierCode)
+TRANSPORT_TYPES: frozenset = frozenset(get_args(TRANSPORT_TYPE))
+ANY_SCALAR_TYPES: tuple = (str, int, bool)
+RESPONSE_MODELS: dict = {model.__name__: model for model in (PointBase, Cutoff, Transportation, Voyage, Service, Leg, Schedule)}
+
+
+class FallbackToPydantic(Exception):
+    """The value is not one the fast path knows how to validate"""
+
+
+def _check(condition: bool) -> None:
+    if not condition:
+        raise FallbackToPydantic
+
+
+def _put(result: dict, key: str, value: Any) -> None:
+    """Fields defaulting to None are left out exactly like exclude_defaults does"""
+    if value is not None:
+        result[key] = value
+
+
+def _any(value: Any) -> Any:
+    _check(value is None or type(value) in ANY_SCALAR_TYPES)
+    return value
+
+
+def _optional_str(value: Any) -> Optional[str]:
+    _check(value is None or type(value) is str)
+    return value
+
+
+def _location_code(value: Any) -> str:
+    _check(type(value) is str and len(value) <= 5 and LOCATION_CODE_PATTERN.match(value) is not None)
+    return value
+
+
+# A schedule repeats the dates of its first and last leg and sailings share their cutoffs,so strptime is skipped for most of them
+_reformat_date = lru_cache(maxsize=8192)(convert_datetime_to_iso_8601)
+
+
+def _date(value: Any) -> str:
+    _check(type(value) is str)
+    return _reformat_date(value)
+
+
+def _non_negative_int(value: Any) -> int:
+    _check(type(value) is int and value >= 0)
+    return value
+
+
+def _point(point: PointBase) -> dict:
+    _check(type(point) is PointBase)
+    result: dict = {}
+    _put(result, 'locationName', _any(point.locationName))
+    result['locationCode'] = _location_code(point.locationCode)
+    _put(result, 'terminalName', _any(point.terminalName))
+    _put(result, 'terminalCode', _any(point.terminalCode))
+    return result
+
+
+def _cutoff(cutoff: Cutoff) -> dict:
+    _check(type(cutoff) is Cutoff)
+    result: dict = {}
+    for field in ('cyCutoffDate', 'docCutoffDate', 'vgmCutoffDate'):
+        if (cutoff_date := getattr(cutoff, field)) is not None:
+            result[field] = _date(cutoff_date)
+    return result
+
+
+def _transportation(transportation: Transportation) -> dict:
+    _check(type(transportation) is Transportation)
+    transport_type: Any = transportation.transportType
+    _check(type(transport_type) is str and transport_type in TRANSPORT_TYPES)
+    transport_name: Any = _any(transportation.transportName)
+    reference_type: Optional[str] = _optional_str(transportation.referenceType)
+    reference: Any = transportation.reference
+    _check(reference is None or type(reference) in (str, int))
+    # check_reference_type_or_reference would raise
+    _check((reference_type is None) == (reference is None))
+    if reference_type is None:
+        # add_reference
+        transport_name = 'TBN' if transport_name is None else transport_name
+        reference_type = 'IMO'
+        reference = REFERENCE_MAPPING.get(transport_type)
+    result: dict = {'transportType': transport_type}
+    _put(result, 'transportName', transport_name)
+    _put(result, 'referenceType', reference_type)
+    _put(result, 'reference', reference)
+    return result
+
+
+def _voyage(voyage: Voyage) -> dict:
+    _check(type(voyage) is Voyage)
+    internal_voyage: Any = _any(voyage.internalVoyage)
+    # check_voyage
+    result: dict = {'internalVoyage': '001' if internal_voyage is None else internal_voyage}
+    _put(result, 'externalVoyage', _any(voyage.externalVoyage))
+    return result
+
+
+def _service(service: Service) -> dict:
+    _check(type(service) is Service)
+    result: dict = {}
+    _put(result, 'serviceCode', _any(service.serviceCode))
+    _put(result, 'serviceName', _any(service.serviceName))
+    return result
+
+
+def _leg(leg: Leg) -> dict:
+    _check(type(leg) is Leg)
+    etd: str = _date(leg.etd)
+    eta: str = _date(leg.eta)
+    # check_leg_details would raise
+    _check(not (eta < etd or etd > eta))
+    cutoffs: Optional[dict] = _cutoff(leg.cutoffs) if leg.cutoffs is not None else None
+    # check_cy_cut_off
+    if cutoffs is not None and cutoffs.get('cyCutoffDate') and etd < cutoffs['cyCutoffDate']:
+        cutoffs = None
+    result: dict = {'pointFrom': _point(leg.pointFrom), 'pointTo': _point(leg.pointTo), 'etd': etd, 'eta': eta}
+    _put(result, 'cutoffs', cutoffs)
+    result['transitTime'] = _non_negative_int(leg.transitTime)
+    if leg.transportations is not None:
+        result['transportations'] = _transportation(leg.transportations)
+    result['voyages'] = _voyage(leg.voyages)
+    if leg.services is not None:
+        result['services'] = _service(leg.services)
+    return result
+
+
+def _schedule(schedule: Schedule) -> dict:
+    _check(type(schedule) is Schedule)
+    scac: Any = schedule.scac.value if isinstance(schedule.scac, CarrierCode) else schedule.scac
+    _check(type(scac) is str and scac in CARRIER_CODES)
+    etd: str = _date(schedule.etd)
+    eta: str = _date(schedule.eta)
+    # check_etd_eta would raise
+    _check(not (eta < etd or etd > eta))
+    transshipment: Any = schedule.transshipment
+    _check(type(transshipment) is bool)
+    legs: Any = schedule.legs
+    _check(type(legs) is list)
+    result: dict = {'scac': scac, 'pointFrom': _location_code(schedule.pointFrom),
+                    'pointTo': _location_code(schedule.pointTo), 'etd': etd, 'eta': eta,
+                    'transitTime': _non_negative_int(schedule.transitTime), 'transshipment': transshipment}
+    if legs:
+        result['legs'] = [_leg(leg) for leg in legs]
+    return result
+
+
+def schedule_to_dict(schedule: Schedule) -> dict:
+    """Json ready dict of a fully validated schedule without its default fields"""
+    try:
+        return _schedule(schedule)
+    except (FallbackToPydantic, AttributeError):
+        return SCHEDULE_ADAPTER.dump_python(
+            SCHEDULE_ADAPTER.validate_python(schedule.model_dump(mode='json', exclude_none=True)), mode='json',
+            exclude_defaults=True)
+
+
+def serialize_schedule(schedule: Schedule) -> bytes:
+    return orjson.dumps(schedule_to_dict(schedule))
+
+
+def serialize_product(product_id: Any, origin: str, destination: str, schedules: List[Schedule]) -> bytes:
+    """Validate and serialize the whole product in one pass"""
+    try:
+        product: dict = {'productid': str(UUID(str(product_id))), 'origin': _location_code(origin),
+                         'destination': _location_code(destination), 'noofSchedule': len(schedules)}
+    except (FallbackToPydantic, ValueError):
+        final_set: dict = {'productid': product_id, 'origin': origin, 'destination': destination,
+                           'noofSchedule': len(schedules), 'schedules': schedules}
+        return PRODUCT_ADAPTER.dump_json(PRODUCT_ADAPTER.validate_python(
+            PRODUCT_ADAPTER.dump_python(PRODUCT_ADAPTER.validate_python(final_set), mode='json', exclude_none=True)),
+            exclude_defaults=True)
+    product['schedules'] = [schedule_to_dict(schedule) for schedule in schedules]
+    return orjson.dumps(product)
+
+
+def serialize_rows(product_id: Any, origin: str, destination: str, rows: List[bytes]) -> bytes:
+    """The product of schedules which have already been serialized one by one by serialize_schedule"""
+    try:
+        product: dict = {'productid': str(UUID(str(product_id))), 'origin': _location_code(origin),
+                         'destination': _location_code(destination), 'noofSchedule': len(rows)}
+    except (FallbackToPydantic, ValueError):
+        return serialize_product(product_id=product_id, origin=origin, destination=destination,
+                                 schedules=[orjson.loads(row) for row in rows])
+    return orjson.dumps(product)[:-1] + b',"schedules":[' + b','.join(rows) + b']}'
+
+
+def _model_fields(value: Any) -> dict:
+    if isinstance(value, BaseModel):
+        return {'__model__': type(value).__name__, **value.__dict__}
+    raise TypeError(f'{type(value).__name__} cannot be packed')
+
+
+def _construct(value: Any) -> Any:
+    if isinstance(value, dict) and (model_name := value.pop('__model__', None)):
+        return RESPONSE_MODELS[model_name].model_construct(**{key: _construct(field) for key, field in value.items()})
+    if isinstance(value, list):
+        return [_construct(item) for item in value]
+    return value
+
+
+def pack_schedules(schedules: List[Schedule]) -> bytes:
+    """Constructed schedules as compact json bytes for a process worker.
+    Datetimes are not packed because orjson would turn them into strings that pydantic would never have accepted"""
+    return orjson.dumps(schedules, default=_model_fields, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def unpack_schedules(payload: bytes) -> List[Schedule]:
+    return _construct(orjson.loads(payload))
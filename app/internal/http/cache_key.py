@@ -0,0 +1,46 @@
+from datetime import date
+from enum import Enum
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+from app.internal.http.rate_limiter import current_carrier
+from app.internal.setting import load_yaml
+
+CARRIER_CACHE_SETTING: dict = load_yaml()['data']['carrierCache']
+
+VOLATILE_PARAMS: frozenset = frozenset(param.lower() for param in CARRIER_CACHE_SETTING['volatileParams'] or ())
+
+
+def mapper_version(scac: str) -> int:
+    """Bumping the version of a scac stops its cached responses from being read"""
+    versions: dict = CARRIER_CACHE_SETTING['mapperVersion']
+    return versions.get(scac, versions['default'])
+
+
+def canonical_value(value: Any) -> str:
+    if isinstance(value, Enum):
+        return canonical_value(value.value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ','.join(canonical_value(item) for item in value)
+    if isinstance(value, dict):
+        return canonical_query(value)
+    return str(value)
+
+
+def canonical_query(params: Optional[Dict[str, Any]]) -> str:
+    """Sorted,stringified and without the params which do not change the response e.g. api keys"""
+    return urlencode(sorted((str(key), canonical_value(value)) for key, value in (params or {}).items()
+                            if value is not None and str(key).lower() not in VOLATILE_PARAMS))
+
+
+def carrier_cache_key(url: str, params: Optional[Dict[str, Any]] = None, json: Optional[Dict[str, Any]] = None,
+                      data: Optional[Dict[str, Any]] = None) -> str:
+    """Identical carrier requests produce the same key regardless of the param order or whether a date was given as a
+    date or a string.The body of a POST is part of the key"""
+    scac: str = current_carrier(url)
+    key: str = f'{scac}:v{mapper_version(scac)}:{url}?{canonical_query(params)}'
+    if body := json or data:
+        key += f'#{canonical_query(body)}'
+    return key
@@ -0,0 +1,97 @@
+"""
+Connection pool of every carrier.Each scac (or host for the requests outside a carrier search) sends its requests
+through its own aiohttp session and connector,with the limits,timeouts and keep-alive declared for it.A carrier whose
+connections are all held by slow responses only exhausts its own limit,the other carriers keep their connections.
+"""
+import logging
+import ssl
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Tuple
+
+import aiohttp
+
+from app.internal.setting import load_yaml
+
+POOL_SETTING: dict = load_yaml()['data']['carrierPools']
+
+
+def connection_counts(connector: aiohttp.BaseConnector) -> Tuple[int, int, int]:
+    """Idle,active and acquiring connections.aiohttp has no public counters so the connector is read,never changed"""
+    idle: int = sum(len(connections) for connections in getattr(connector, '_conns', {}).values())
+    acquiring: int = sum(len(waiters) for waiters in getattr(connector, '_waiters', {}).values())
+    return idle, len(getattr(connector, '_acquired', ())), acquiring
+
+
+class CarrierPool:
+    def __init__(self, scac: str, setting: dict, ssl_context: ssl.SSLContext, dns_cache: int,
+                 trace_configs: Iterable[aiohttp.TraceConfig]) -> None:
+        self.scac: str = scac
+        self.queued: int = 0
+        self.connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            ttl_dns_cache=dns_cache,
+            limit=setting['maxConnection'],
+            limit_per_host=setting['maxConnectionPerHost'],
+            keepalive_timeout=setting['keepAliveExpiry']
+        )
+        self.session = aiohttp.ClientSession(
+            connector=self.connector,
+            timeout=aiohttp.ClientTimeout(
+                total=setting['elswhereTimeOut'],
+                connect=setting['poolTimeOut'],
+                sock_connect=setting['connectTimeOut']
+            ),
+            trust_env=True,  # trust_env=True means read environment variables e.g:HTTP_PROXY,HTTPS_PROXY
+            headers={"Connection": "Keep-Alive"},
+            skip_auto_headers=['User-Agent'],
+            trace_configs=[*trace_configs, self.trace_config()]
+        )
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Count the requests which had to wait for a free connection of the pool"""
+
+        async def on_connection_queued_start(session: aiohttp.ClientSession, context: SimpleNamespace,
+                                             params: Any) -> None:
+            self.queued += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        return trace_config
+
+    def stats(self) -> Dict[str, Any]:
+        idle, active, acquiring = connection_counts(self.connector)
+        return {'limit': self.connector.limit, 'limitPerHost': self.connector.limit_per_host, 'idle': idle,
+                'active': active, 'acquiring': acquiring, 'queued': self.queued}
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+class CarrierPools:
+    """The pool of a scac is created by its first request with the default setting and the override of the scac"""
+
+    def __init__(self, setting: dict, ssl_context: ssl.SSLContext, dns_cache: int,
+                 trace_configs: Iterable[aiohttp.TraceConfig] = ()) -> None:
+        self.default: dict = setting['default']
+        self.overrides: dict = {scac: override for scac, override in setting.items() if scac != 'default'}
+        self.ssl_context: ssl.SSLContext = ssl_context
+        self.dns_cache: int = dns_cache
+        self.trace_configs: Tuple[aiohttp.TraceConfig, ...] = tuple(trace_configs)
+        self.__pools: Dict[str, CarrierPool] = {}
+
+    def get(self, scac: str) -> CarrierPool:
+        if (pool := self.__pools.get(scac)) is None:
+            pool = self.__pools[scac] = CarrierPool(
+                scac=scac, setting=dict(self.default, **(self.overrides.get(scac) or {})),
+                ssl_context=self.ssl_context, dns_cache=self.dns_cache, trace_configs=self.trace_configs)
+            logging.info(f'Connection pool of {scac} initialized with {pool.connector.limit} connections',
+                         extra={'custom_attribute': None})
+        return pool
+
+    def stats(self) -> Dict[str, Any]:
+        return {scac: pool.stats() for scac, pool in self.__pools.items()}
+
+    async def close(self) -> None:
+        pools, self.__pools = list(self.__pools.values()), {}
+        for pool in pools:
+            await pool.close()
@@ -0,0 +1,104 @@
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from enum import StrEnum
+from typing import Any, Deque, Dict
+
+from app.internal.setting import load_yaml
+from app.storage import db
+
+
+class CircuitState(StrEnum):
+    closed = 'closed'
+    open = 'open'
+    half_open = 'half-open'
+
+
+class CircuitBreaker:
+    """Stop calling a carrier that keeps timing out.
+    closed = every search calls the carrier,consecutive failures beyond the threshold open the circuit
+    open = the carrier is skipped straight away until the recovery timeout is over
+    half-open = a limited number of probes are let through,a successful one closes the circuit and a failed one opens it again"""
+
+    def __init__(self, scac: str, setting: dict) -> None:
+        self.scac: str = scac
+        self.failure_threshold: int = setting['failureThreshold']
+        self.recovery_timeout: float = setting['recoveryTimeout']
+        self.half_open_probes: int = setting['halfOpenProbes']
+        self.shared: bool = setting['shared']
+        self.state: CircuitState = CircuitState.closed
+        self.failures: int = 0
+        self.opened_at: float = 0
+        self.probes: int = 0
+        self.short_circuited: int = 0
+        self.transitions: Deque[Dict[str, str]] = deque(maxlen=setting['keepTransitions'])
+
+    def __transition(self, state: CircuitState, reason: str) -> None:
+        if state == self.state:
+            return
+        logging.warning(f'{self.scac} circuit {self.state} -> {state} - {reason}')
+        self.transitions.append({'from': self.state, 'to': state, 'reason': reason,
+                                 'at': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+        self.state = state
+        self.probes = 0
+        if state == CircuitState.open:
+            self.opened_at = time.monotonic()
+        elif state == CircuitState.closed:
+            self.failures = 0
+
+    async def allow(self) -> bool:
+        if self.state == CircuitState.closed and self.shared and await db.is_locked(key=self.scac,
+                                                                                    namespace='circuit breaker'):
+            self.__transition(CircuitState.open, 'opened by another worker')
+        if self.state == CircuitState.open and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.__transition(CircuitState.half_open, f'{self.recovery_timeout}s recovery timeout is over')
+        if self.state == CircuitState.closed:
+            return True
+        if self.state == CircuitState.half_open and self.probes < self.half_open_probes:
+            self.probes += 1
+            return True
+        self.short_circuited += 1
+        return False
+
+    async def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CircuitState.closed:
+            self.__transition(CircuitState.closed, 'probe succeeded')
+
+    def release_probe(self) -> None:
+        """A call which ended without an outcome e.g. its mapping failed gives its probe back,otherwise the circuit
+        would stay half-open with no probe left"""
+        if self.state == CircuitState.half_open and self.probes:
+            self.probes -= 1
+
+    async def record_failure(self, reason: str) -> None:
+        self.failures += 1
+        if self.state == CircuitState.half_open or (
+                self.state == CircuitState.closed and self.failures >= self.failure_threshold):
+            self.__transition(CircuitState.open, f'{self.failures} consecutive failures,last one {reason}')
+            if self.shared:
+                await db.acquire_lock(key=self.scac, expire=int(self.recovery_timeout), namespace='circuit breaker')
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.state, 'consecutiveFailures': self.failures, 'shortCircuited': self.short_circuited,
+                'retryIn': round(max(self.recovery_timeout - (time.monotonic() - self.opened_at), 0), 2)
+                if self.state == CircuitState.open else 0,
+                'transitions': list(self.transitions)}
+
+
+class CircuitBreakers:
+    def __init__(self, setting: dict) -> None:
+        self.setting: dict = setting
+        self.__breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, scac: str) -> CircuitBreaker:
+        if (breaker := self.__breakers.get(scac)) is None:
+            breaker = self.__breakers[scac] = CircuitBreaker(scac=scac, setting=self.setting)
+        return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        return {scac: breaker.stats() for scac, breaker in self.__breakers.items()}
+
+
+circuit_breakers = CircuitBreakers(load_yaml()['data']['circuitBreaker'])
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import aiohttp
+
+from app.internal.http.rate_limiter import CarrierLimiter
+from app.internal.setting import load_yaml
+
+
+def is_successful(response: aiohttp.ClientResponse) -> bool:
+    return response.status < 300
+
+
+def discard(task: asyncio.Task) -> None:
+    """Cancel a losing request or give its connection back to the pool if it already got a response"""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        task.result().release()
+
+
+class HedgePolicy:
+    """Once a call of the carrier is slower than the given percentile of its recent calls,the same request is sent
+    again and the first successful response wins.A hedge spends a token of the carrier like any other request
+    and is not sent if the carrier budget is exhausted"""
+
+    def __init__(self, scac: str, setting: dict) -> None:
+        self.scac: str = scac
+        self.percentile: float = setting['percentile']
+        self.min_samples: int = setting['minSamples']
+        self.min_delay: float = setting['minDelay']
+        self.latencies: Deque[float] = deque(maxlen=setting['window'])
+        self.calls: int = 0
+        self.hedged: int = 0
+        self.hedge_wins: int = 0
+        self.skipped: int = 0
+
+    def delay(self) -> Optional[float]:
+        """Seconds to wait for the primary call before hedging it,None until enough calls have been observed"""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ranked: list = sorted(self.latencies)
+        return max(self.min_delay, ranked[min(int(len(ranked) * self.percentile / 100), len(ranked) - 1)])
+
+    async def timed(self, send: Callable[[], Awaitable[aiohttp.ClientResponse]]) -> aiohttp.ClientResponse:
+        """Only the primary call is sampled,when the hedge wins the time of the race says nothing about the carrier"""
+        start_time: float = time.monotonic()
+        response: aiohttp.ClientResponse = await send()
+        self.latencies.append(time.monotonic() - start_time)
+        return response
+
+    async def race(self, send: Callable[[], Awaitable[aiohttp.ClientResponse]],
+                   limiter: CarrierLimiter) -> aiohttp.ClientResponse:
+        self.calls += 1
+        primary: asyncio.Task = asyncio.create_task(self.timed(send))
+        tasks: Dict[asyncio.Task, str] = {primary: 'primary'}
+        winner: Optional[asyncio.Task] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay())
+            if not done:
+                if await limiter.try_token():
+                    self.hedged += 1
+                    logging.info(f'{self.scac} call slower than {self.delay():.2f}s,hedging it')
+                    tasks[asyncio.create_task(send())] = 'hedge'
+                else:
+                    self.skipped += 1
+            pending: set = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None and is_successful(task.result())), None)
+            # Neither call succeeded,the primary outcome is the one reported
+            winner = winner or primary
+            if tasks[winner] == 'hedge':
+                self.hedge_wins += 1
+            return winner.result()
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    discard(task)
+
+    def stats(self) -> Dict[str, Any]:
+        delay: Optional[float] = self.delay()
+        return {'calls': self.calls, 'hedged': self.hedged, 'hedgeWins': self.hedge_wins,
+                'skippedOutOfBudget': self.skipped, 'hedgeDelay': round(delay, 3) if delay is not None else None}
+
+
+class HedgePolicies:
+    """Hedging is opt-in per scac and only applies to GET,the POST requests are token requests"""
+
+    def __init__(self, setting: dict) -> None:
+        self.enabled: frozenset = frozenset(setting['enabled'] or ())
+        self.default: dict = setting['default']
+        self.overrides: dict = {scac: override for scac, override in setting.items() if scac not in ('enabled', 'default')}
+        self.__policies: Dict[str, HedgePolicy] = {}
+
+    def get(self, scac: str, method: str) -> Optional[HedgePolicy]:
+        if scac not in self.enabled or method.upper() != 'GET':
+            return None
+        if (policy := self.__policies.get(scac)) is None:
+            policy = self.__policies[scac] = HedgePolicy(scac=scac,
+                                                         setting=dict(self.default, **(self.overrides.get(scac) or {})))
+        return policy
+
+    def stats(self) -> Dict[str, Any]:
+        return {scac: policy.stats() for scac, policy in self.__policies.items()}
+
+
+hedge_policies = HedgePolicies(load_yaml()['data']['hedging'])
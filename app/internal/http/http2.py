@@ -0,0 +1,126 @@
+"""
+HTTP/2 transport of the carrier hosts supporting multiplexing.The requests of such a host share a few connections
+instead of opening one each,the other hosts stay on the aiohttp session.The httpx response is wrapped into the part
+of aiohttp.ClientResponse the client uses and the httpx errors are raised as their aiohttp counterparts,so the
+retries,circuit breakers and status mapping treat both transports alike.
+"""
+import asyncio
+import logging
+import ssl
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import httpx
+import orjson
+
+from app.internal.http.warmup import host_latency
+
+try:
+    import h2  # noqa: F401 httpx only negotiates HTTP/2 when h2 is installed
+except ImportError:  # HTTP/2 is optional,the hosts are then sent over aiohttp
+    h2 = None
+
+
+def transport_error(error: httpx.TransportError) -> aiohttp.ClientError:
+    if isinstance(error, httpx.TimeoutException):
+        return aiohttp.ServerTimeoutError(f'{error.__class__.__name__}:{error}')
+    return aiohttp.ClientConnectionError(f'{error.__class__.__name__}:{error}')
+
+
+class Http2Content:
+    def __init__(self, response: httpx.Response) -> None:
+        self.__response: httpx.Response = response
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in self.__response.aiter_bytes(size):
+                yield chunk
+        except httpx.TransportError as payload_error:
+            raise aiohttp.ClientPayloadError(f'{payload_error.__class__.__name__}:{payload_error}') from payload_error
+
+
+class Http2Response:
+    """What the client reads of an aiohttp.ClientResponse"""
+
+    def __init__(self, response: httpx.Response) -> None:
+        self.__response: httpx.Response = response
+        self.status: int = response.status_code
+        self.headers: httpx.Headers = response.headers
+        self.url: str = str(response.url)
+        self.content: Http2Content = Http2Content(response)
+
+    async def read(self) -> bytes:
+        try:
+            return await self.__response.aread()
+        except httpx.TransportError as payload_error:
+            raise aiohttp.ClientPayloadError(f'{payload_error.__class__.__name__}:{payload_error}') from payload_error
+
+    async def json(self) -> Any:
+        return orjson.loads(await self.read())
+
+    def release(self) -> None:
+        asyncio.ensure_future(self.__response.aclose())
+
+    async def __aenter__(self) -> 'Http2Response':
+        return self
+
+    async def __aexit__(self, exc_type=None, exc=None, tb=None) -> None:
+        await self.__response.aclose()
+
+
+class ConnectTiming:
+    """Time taken to open the connection of one request,None when it reused one"""
+
+    def __init__(self) -> None:
+        self.connect: Optional[float] = None
+        self.__started: Optional[float] = None
+
+    async def trace(self, event: str, info: Dict[str, Any]) -> None:
+        if event == 'connection.connect_tcp.started':
+            self.__started = time.monotonic()
+        elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete') and self.__started:
+            self.connect = time.monotonic() - self.__started
+
+
+class Http2Transport:
+    def __init__(self, hosts: Iterable[str], setting: dict, limits: dict, ssl_context: ssl.SSLContext) -> None:
+        """ssl_context must not be the one of the aiohttp connector,httpx sets its ALPN protocols to h2"""
+        self.hosts: frozenset = frozenset(hosts)
+        self.__client = httpx.AsyncClient(
+            http2=True, verify=ssl_context, trust_env=True,
+            timeout=httpx.Timeout(limits['elswhereTimeOut'], connect=limits['connectTimeOut'],
+                                  pool=limits['poolTimeOut']),
+            limits=httpx.Limits(max_connections=setting['maxConnections'],
+                                max_keepalive_connections=setting['maxConnections'],
+                                keepalive_expiry=limits['keepAliveExpiry']))
+        logging.info(f'HTTP/2 transport initialized for {sorted(self.hosts)}', extra={'custom_attribute': None})
+
+    @classmethod
+    def create(cls, setting: dict, limits: dict, ssl_context: ssl.SSLContext) -> Optional['Http2Transport']:
+        if not setting['hosts']:
+            return None
+        if h2 is None:
+            logging.warning(f'h2 is not installed,{setting["hosts"]} are sent over HTTP/1.1 with aiohttp instead')
+            return None
+        return cls(hosts=setting['hosts'], setting=setting, limits=limits, ssl_context=ssl_context)
+
+    def handles(self, url: str) -> bool:
+        return urlsplit(url).hostname in self.hosts
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> Http2Response:
+        timing = ConnectTiming()
+        start_time: float = time.monotonic()
+        request: httpx.Request = self.__client.build_request(method=method, url=url,
+                                                             extensions={'trace': timing.trace}, **kwargs)
+        try:
+            response: httpx.Response = await self.__client.send(request, stream=True)
+        except httpx.TransportError as request_error:
+            raise transport_error(request_error) from request_error
+        host_latency.record(host=urlsplit(url).hostname, seconds=time.monotonic() - start_time,
+                            connect=timing.connect, transport=response.http_version)
+        return Http2Response(response)
+
+    async def close(self) -> None:
+        await self.__client.aclose()
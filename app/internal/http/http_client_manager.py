@@ -2,73 +2,224 @@ import asyncio
 import logging
 import ssl
 import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from datetime import timedelta
+from functools import partial
 from itertools import chain
-from typing import Any, AsyncGenerator, Callable, Dict, Generator, Optional
+from json import JSONDecodeError
+from typing import Any, AsyncContextManager, AsyncGenerator, AsyncIterator, Callable, Dict, Generator, Iterable, List, Optional, Tuple
 from uuid import UUID
 
 import aiohttp
-import orjson
-from fastapi import BackgroundTasks, HTTPException, Request, Response, status
+from fastapi import BackgroundTasks, HTTPException, Response, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 from fastapi.responses import JSONResponse
-
-from app.api.schemas import schema_response
+from pydantic import ValidationError
+
+from app.api.handler.p2p_schedule.pagination import PAGE_INDEX_NAMESPACE, page_index
+from app.api.schemas import schema_response, schema_serializer
+from app.api.schemas.schedule_table import ScheduleTable
+from app.internal.http.cache_key import carrier_cache_key
+from app.internal.http.carrier_pools import POOL_SETTING, CarrierPools
+from app.internal.http.circuit_breaker import CircuitBreaker, CircuitState, circuit_breakers
+from app.internal.http.hedging import HedgePolicy, hedge_policies
+from app.internal.http.http2 import Http2Response, Http2Transport
+from app.internal.http.json_stream import CachedItems, ItemPath, iter_chunks, iter_items
+from app.internal.http.range_pages import PageFailed, PageRetry, range_paginators
+from app.internal.http.rate_limiter import CarrierThrottled, carrier_limiters, current_carrier, use_carrier
+from app.internal.http.token_manager import token_manager
+from app.internal.http.warmup import WARMUP_SETTING, carrier_origins, host_latency, prewarm
 from app.internal.logging import setup_logging
-from app.internal.setting import load_yaml
+from app.internal.offload import offloader
+from app.internal.setting import Settings, get_settings, load_yaml
 from app.storage import db
 
+CARRIER_RESPONSE_NAMESPACE: str = 'original response'
+
+SCHEDULE_PRODUCT_SETTING: dict = load_yaml()['data']['scheduleProduct']
+
+JSON_CHUNK_BYTES: int = load_yaml()['data']['jsonStream']['chunkBytes']
+
+MAP_BATCH: int = load_yaml()['data']['jsonStream']['mapBatch']
+
+MAX_CACHED_BYTES: int = load_yaml()['data']['jsonStream']['maxCachedBytes']
+
+RETRY_PAGE_STATUS: frozenset = frozenset({status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                          status.HTTP_502_BAD_GATEWAY, status.HTTP_503_SERVICE_UNAVAILABLE,
+                                          status.HTTP_504_GATEWAY_TIMEOUT})
+
+_revalidate_ctx_var: ContextVar[bool] = ContextVar('revalidate', default=False)
+
+_carrier_slot_ctx_var: ContextVar[Optional[Callable[[str], AsyncContextManager]]] = ContextVar('carrier slot', default=None)
+
+
+def start_revalidation() -> None:
+    """Within the current task,carrier responses are fetched again and overwrite their stale cache entries.
+    Tokens and other lookups keep being served from the cache"""
+    _revalidate_ctx_var.set(True)
+
+
+def is_revalidating() -> bool:
+    return _revalidate_ctx_var.get()
+
+
+def use_carrier_slots(slot: Callable[[str], AsyncContextManager]) -> None:
+    """Within the current task,every carrier task holds a slot of its scac e.g. the carrier cap of a batch.It waits
+    for the slot before its timeout starts"""
+    _carrier_slot_ctx_var.set(slot)
+
+
+def use_cached_response(namespace: str | None) -> bool:
+    return bool(namespace) and not (is_revalidating() and namespace.endswith(CARRIER_RESPONSE_NAMESPACE))
+
+
+def carrier_rows(matrix: Generator) -> Generator:
+    return (row for row in matrix if not isinstance(row, Exception) and row is not None)
+
+
+def map_all_schedules(matrix: Generator) -> list:
+    """The carrier handlers return lazy generators,consuming them is where the carrier responses get mapped"""
+    return list(chain.from_iterable(carrier_rows(matrix)))
+
+
+def tabulate_all_schedules(matrix: Generator) -> ScheduleTable:
+    """Every schedule is validated into the table as soon as its carrier mapper yields it so the model graph of the
+    whole product never exists at once"""
+    return ScheduleTable.from_schedules(chain.from_iterable(carrier_rows(matrix)))
+
+
+def sorted_product(table: ScheduleTable, product_id: UUID, origin: str, destination: str) -> Tuple[bytes, Optional[bytes]]:
+    """The product and the page index of its rows"""
+    sorted_table: ScheduleTable = table.sorted()
+    product: bytes = sorted_table.product_json(product_id=product_id, origin=origin, destination=destination)
+    return product, page_index(sorted_table, product)
+
+
+async def iter_batches(items: AsyncIterator[Any], size: int = MAP_BATCH) -> AsyncIterator[List[Any]]:
+    batch: List[Any] = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def map_batch(mapper: Callable[[Any], Iterable], batch: List[Any]) -> list:
+    return [schedule for item in batch for schedule in mapper(item)]
+
+
+async def map_items(items: AsyncIterator[Any], mapper: Callable[[Any], Iterable]) -> list:
+    """Map the elements of a carrier response in the offload thread one batch at a time as they are decoded,the event
+    loop only decodes and no more than one batch of raw elements is held"""
+    schedules: list = []
+    async for batch in iter_batches(items):
+        schedules.extend(await offloader.run_in_thread(map_batch, mapper, batch, size=len(batch)))
+    return schedules
+
+
+def map_and_pack(matrix: Generator) -> Tuple[list, Optional[bytes]]:
+    """Map the schedules and pack them for a process worker in the same thread step,no payload when there are too few
+    schedules to leave the thread or they cannot be packed"""
+    schedules: list = map_all_schedules(matrix)
+    if offloader.run_inline(size=len(schedules)):
+        return schedules, None
+    try:
+        return schedules, schema_serializer.pack_schedules(schedules)
+    except TypeError as pack_error:
+        logging.warning(f'Unable to pack the schedules for a process worker - {pack_error}')
+        return schedules, None
+
+
+async def tabulate_off_loop(matrix: Generator) -> ScheduleTable:
+    """A process worker is given the schedules as compact json bytes rather than a pickled model graph and sends the
+    table back,the packing is done in the offload thread and never on the event loop"""
+    if not offloader.uses_processes:
+        return await offloader.run_in_thread(tabulate_all_schedules, matrix)
+    schedules, payload = await offloader.run_in_thread(map_and_pack, matrix)
+    if payload is not None:
+        return await offloader.run_in_process(ScheduleTable.from_packed, payload, size=len(schedules))
+    return await offloader.run_in_thread(ScheduleTable.from_schedules, schedules, size=len(schedules))
+
+
+def carrier_ssl_context(ciphers: str) -> ssl.SSLContext:
+    """One context per transport,httpx changes the ALPN protocols of the context it is given"""
+    ctx = ssl.create_default_context()
+    ctx.set_ciphers(ciphers)
+    return ctx
+
+
+def log_failed_response(response: aiohttp.ClientResponse) -> None:
+    if response.status in (status.HTTP_500_INTERNAL_SERVER_ERROR, status.HTTP_502_BAD_GATEWAY):
+        logging.critical(f'Unable to connect to {response.url}')
+    elif response.status == status.HTTP_429_TOO_MANY_REQUESTS:
+        logging.critical(f'Too Many Request Sent To {response.url}')
+
 
 class HTTPClientWrapper:
     def __init__(self) -> None:
-        self.default_limits = load_yaml()['data']['connectionPoolSetting']
-        self.limits = self.default_limits.copy()
-        self.lock = asyncio.Lock()
-        self._client: Optional[aiohttp.ClientSession] = None
+        self.limits: dict = load_yaml()['data']['connectionPoolSetting']
+        self.pools: Optional[CarrierPools] = None
+        self.http2: Optional[Http2Transport] = None
 
     async def startup(self) -> None:
         """Initialize the HTTP client and start necessary services."""
         setup_logging()
         await db.initialize_database()
+        db.start_invalidation_listener()
+        db.write_behind.start()
+        offloader.startup()
 
-        if self._client is None:
-            ctx = ssl.create_default_context()
-            ctx.set_ciphers('DEFAULT')
-            self.conn = aiohttp.TCPConnector(
-                ssl=ctx,
-                ttl_dns_cache=self.limits['dnsCache'],
-                limit_per_host=self.limits['maxConnectionPerHost'],
-                limit=self.limits['maxClientConnection'],
-                keepalive_timeout=self.limits['keepAliveExpiry']
-            )
-            self._client = aiohttp.ClientSession(
-                connector=self.conn,
-                timeout=aiohttp.ClientTimeout(
-                    total=self.limits['elswhereTimeOut'],
-                    connect=self.limits['poolTimeOut']
-                ),
-                trust_env=True,  # trust_env=True means read environment variables e.g:HTTP_PROXY,HTTPS_PROXY
-                headers={"Connection": "Keep-Alive"},
-                skip_auto_headers=['User-Agent']
-            )
+        if self.pools is None:
+            self.pools = CarrierPools(setting=POOL_SETTING, ssl_context=carrier_ssl_context(self.limits['tlsCiphers']),
+                                      dns_cache=self.limits['dnsCache'], trace_configs=[host_latency.trace_config()])
             logging.info("Aiohttp Client initialized", extra={'custom_attribute': None})
+            self.http2 = Http2Transport.create(setting=load_yaml()['data']['http2'], limits=self.limits,
+                                               ssl_context=carrier_ssl_context(self.limits['tlsCiphers']))
+            if WARMUP_SETTING['enabled']:
+                # Before the tokens are fetched so they are fetched over the warm connections too
+                await self.prewarm()
+        token_manager.startup(client=self)
 
     async def shutdown(self) -> None:
         """Shut down the HTTP client and stop necessary services."""
+        token_manager.shutdown()
         await db.close()
+        offloader.shutdown()
 
-        if self._client:
-            await self._client.close()
+        if self.pools:
+            await self.pools.close()
             logging.info("Aiohttp Client closed", extra={'custom_attribute': None})
+        if self.http2:
+            await self.http2.close()
 
-    async def _adjust_pool_limits(self) -> None:
-        """Dynamically adjust the connection pool limits of the aiohttp client when a PoolTimeout error occurs"""
-        async with self.lock:
-            self.limits['maxClientConnection'] += 20
-            self.limits['maxConnectionPerHost'] += 10
-            self.conn._limit = self.limits['maxClientConnection']
-            self.conn._limit_per_host = self.limits['maxConnectionPerHost']
+    def uses_http2(self, url: str) -> bool:
+        return self.http2 is not None and self.http2.handles(url)
+
+    async def prewarm(self) -> None:
+        """Open keep-alive connections in the pool of every scac to the hosts it searches before the first search,a
+        multiplexed HTTP/2 host only needs one"""
+        try:
+            settings: Settings = get_settings()
+        except ValidationError as settings_error:
+            logging.warning(f'Connections not pre-warmed,the carrier settings are incomplete - {settings_error}')
+            return
+        await prewarm(carriers={scac: {origin: 1 if self.uses_http2(origin) else WARMUP_SETTING['connectionsPerHost']
+                                       for origin in carrier_origins(settings, fields)}
+                                for scac, fields in WARMUP_SETTING['carriers'].items()},
+                      touch=self.touch, timeout=WARMUP_SETTING['timeout'])
+
+    async def touch(self, origin: str, scac: str) -> None:
+        """Whatever the status,the connection which carried the HEAD request goes back to the pool of the scac"""
+        if self.uses_http2(origin):
+            async with await self.http2.request(method='HEAD', url=origin):
+                return
+        use_carrier(scac)
+        async with self.pools.get(scac).session.head(origin, allow_redirects=False):
+            return
 
     async def close(self) -> None:
         await self.shutdown()
@@ -105,79 +256,167 @@ class HTTPClientWrapper:
                     expire: timedelta = timedelta(hours=load_yaml()['data']['backgroundTasks']['scheduleExpiry']),
                     namespace: str | None = None,
                     stream: bool = False) -> AsyncGenerator[Dict[str, Any], None]:
-        """Fetch the file from carrier API and deserialize the json file """
-        if not stream:
-            async for response in self.handle_standard_response(url, method, params, headers, json, data,
-                                                                background_tasks=background_tasks, expire=expire,
-                                                                namespace=namespace):
-                yield response
-        else:
-            async for response in self.handle_streaming_response(url, method, params, headers, data,
-                                                                 background_tasks=background_tasks, expire=expire,
-                                                                 namespace=namespace):
+        """Fetch the file from carrier API and deserialize the json file.
+        A carrier whose budget is exhausted is skipped like a carrier answering 429"""
+        try:
+            if not stream:
+                async for response in self.handle_standard_response(url, method, params, headers, json, data,
+                                                                    background_tasks=background_tasks, expire=expire,
+                                                                    namespace=namespace):
+                    yield response
+            else:
+                async for response in self.handle_streaming_response(url, method, params, headers, data,
+                                                                     background_tasks=background_tasks, expire=expire,
+                                                                     namespace=namespace):
+                    yield response
+        except CarrierThrottled as throttled:
+            logging.critical(f'Skip {url} - {throttled}')
+            yield None
+
+    async def parse_items(self, url: str, path: ItemPath = (), method: str = 'GET',
+                          params: Optional[Dict[str, Any]] = None,
+                          headers: Optional[Dict[str, Any]] = None,
+                          json: Optional[Dict[str, Any]] = None,
+                          data: Optional[Dict[str, Any]] = None,
+                          background_tasks: Optional[BackgroundTasks] = None,
+                          expire: timedelta = timedelta(hours=load_yaml()['data']['backgroundTasks']['scheduleExpiry']),
+                          namespace: str | None = None) -> AsyncGenerator[Any, None]:
+        """Fetch the file from carrier API and yield the elements of the array at path e.g. ('oceanProducts',) one at a
+        time as the body arrives.Nothing is yielded when the carrier fails or its budget is exhausted"""
+        try:
+            async for item in self.handle_items_response(url, method, params, headers, json, data, path=path,
+                                                         background_tasks=background_tasks, expire=expire,
+                                                         namespace=namespace):
+                yield item
+        except CarrierThrottled as throttled:
+            logging.critical(f'Skip {url} - {throttled}')
+
+    @asynccontextmanager
+    async def send(self, method: str, url: str, concurrent: bool = True,
+                   **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send the request within the budget of the carrier and hedge it if the carrier opted in"""
+        scac: str = current_carrier(url)
+        async with carrier_limiters.slot(url=url, concurrent=concurrent) as lease:
+            async def request() -> aiohttp.ClientResponse | Http2Response:
+                if self.uses_http2(url):
+                    return await self.http2.request(method=method, url=url, **kwargs)
+                return await self.pools.get(scac).session.request(method=method, url=url, **kwargs)
+
+            hedge_policy: Optional[HedgePolicy] = hedge_policies.get(scac=scac, method=method)
+            response = await (hedge_policy.race(send=request, limiter=lease.limiter) if hedge_policy else request())
+            async with response:
+                await lease.observe(status_code=response.status, retry_after=response.headers.get('Retry-After'))
                 yield response
 
-    async def handle_extra_response(self, url: str, method: str, params: Optional[Dict[str, Any]],
-                                    headers: Optional[Dict[str, Any]], json: Optional[Dict[str, Any]],
-                                    data: Optional[Dict[str, Any]], ) -> AsyncGenerator[Dict[str, Any], None]:
-        start_time = time.time()
-        async with self._client.request(method=method, url=url, params=params, headers=headers, json=json, data=data) as extra_response:
-            response_time = time.time() - start_time
-            logging.info(
-                f'{method} took {response_time:.2f}s to process the request {extra_response.url} {extra_response.status}')
-            if extra_response.status in (
-                    status.HTTP_206_PARTIAL_CONTENT, status.HTTP_200_OK) and extra_response is not None:
-                response_json = await extra_response.json()
-                yield response_json
-
     async def handle_standard_response(self, url: str, method: str, params: Optional[Dict[str, Any]],
                                        headers: Optional[Dict[str, Any]],
                                        json: Optional[Dict[str, Any]], data: Optional[Dict[str, Any]],
                                        background_tasks: Optional[BackgroundTasks], expire: timedelta,
                                        namespace: str | None = None) -> AsyncGenerator[Dict[str, Any], None]:
         try:
-            cache_result = await db.get(key=url + str(params), namespace=namespace) if namespace else None
+            cache_key: str = carrier_cache_key(url=url, params=params, json=json, data=data)
+            cache_result = await db.get(key=cache_key, namespace=namespace) if use_cached_response(namespace) else None
             if cache_result:
                 yield cache_result
             else:
                 start_time = time.time()
-                async with self._client.request(method=method, url=url, params=params, headers=headers, json=json,
-                                                data=data) as response:
+                async with self.send(method=method, url=url, params=params, headers=headers, json=json,
+                                     data=data) as response:
                     response_time = time.time() - start_time
                     logging.info(
                         f'{method} took {response_time:.2f}s to process the request {response.url} {response.status}')
                     if response.status == status.HTTP_206_PARTIAL_CONTENT:
-                        combined_schedule: list = []
-                        combined_schedule.extend(await response.json())
-                        page: int = 50
-                        last_page: int = int(response.headers['content-range'].partition('/')[2])
-                        extra_p2p_task = [asyncio.create_task(anext(
-                            self.handle_extra_response(method="GET", url=url, params=params, json=json, data=data,
-                                                       headers=dict(headers, **{'range': f'{num}-{49 + num}'})))) for
-                                          num in range(page, last_page, page)]
-                        extra_p2p_result = await asyncio.gather(*extra_p2p_task)
-                        combined_schedule.extend(*extra_p2p_result)
+                        combined_schedule: list = await response.json()
+                        async for page in range_paginators.get(current_carrier(url)).iter_pages(
+                                fetch=partial(self.fetch_page, url=url, method=method, params=params, headers=headers,
+                                              json=json, data=data, path=()),
+                                content_range=response.headers['content-range']):
+                            combined_schedule.extend(page)
                         if background_tasks:
-                            background_tasks.add_task(db.set, key=url + str(params), value=combined_schedule,
-                                                      expire=expire, namespace=namespace)
+                            await db.set_later(key=cache_key, value=combined_schedule, expire=expire,
+                                               namespace=namespace, overwrite=is_revalidating())
                         yield combined_schedule
                     elif response.status == status.HTTP_200_OK:
                         response_json = await response.json()
                         if background_tasks:
-                            background_tasks.add_task(db.set, key=url + str(params), value=response_json, expire=expire,
-                                                      namespace=namespace)
+                            await db.set_later(key=cache_key, value=response_json, expire=expire,
+                                               namespace=namespace, overwrite=is_revalidating())
                         yield response_json
-                    elif response.status in (status.HTTP_500_INTERNAL_SERVER_ERROR, status.HTTP_502_BAD_GATEWAY):
-                        logging.critical(f'Unable to connect to {response.url}')
-                        yield None
-                    elif response.status == status.HTTP_429_TOO_MANY_REQUESTS:
-                        logging.critical(f'Too Many Request Sent To {response.url}')
-                        yield None
                     else:
+                        log_failed_response(response)
                         yield None
         except aiohttp.ClientProxyConnectionError as proxy_issue:
             logging.error(f'Proxy Issue:{proxy_issue}')
 
+    async def handle_items_response(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                                    headers: Optional[Dict[str, Any]],
+                                    json: Optional[Dict[str, Any]], data: Optional[Dict[str, Any]], path: ItemPath,
+                                    background_tasks: Optional[BackgroundTasks], expire: timedelta,
+                                    namespace: str | None = None) -> AsyncGenerator[Any, None]:
+        """The elements are cached once the whole array has arrived,as the document holding only that array so the
+        entries written before by handle_standard_response are read the same way"""
+        try:
+            cache_key: str = carrier_cache_key(url=url, params=params, json=json, data=data)
+            cache_result = await db.get_bytes(key=cache_key,
+                                              namespace=namespace) if use_cached_response(namespace) else None
+            if cache_result:
+                async for item in iter_items(iter_chunks(cache_result, JSON_CHUNK_BYTES), path=path):
+                    yield item
+                return
+            async for item in self.fetch_items(url, method, params, headers, json, data, path=path,
+                                               background_tasks=background_tasks, expire=expire, namespace=namespace,
+                                               cache_key=cache_key):
+                yield item
+        except aiohttp.ClientProxyConnectionError as proxy_issue:
+            logging.error(f'Proxy Issue:{proxy_issue}')
+
+    async def fetch_items(self, url: str, method: str, params: Optional[Dict[str, Any]],
+                          headers: Optional[Dict[str, Any]], json: Optional[Dict[str, Any]],
+                          data: Optional[Dict[str, Any]], path: ItemPath, background_tasks: Optional[BackgroundTasks],
+                          expire: timedelta, namespace: str | None, cache_key: str) -> AsyncGenerator[Any, None]:
+        start_time = time.time()
+        async with self.send(method=method, url=url, params=params, headers=headers, json=json,
+                             data=data) as response:
+            response_time = time.time() - start_time
+            logging.info(
+                f'{method} took {response_time:.2f}s to process the request {response.url} {response.status}')
+            if response.status not in (status.HTTP_200_OK, status.HTTP_206_PARTIAL_CONTENT):
+                log_failed_response(response)
+                return
+            cached_items = CachedItems(limit=MAX_CACHED_BYTES)
+            async for item in iter_items(response.content.iter_chunked(JSON_CHUNK_BYTES), path=path):
+                if background_tasks:
+                    cached_items.add(item)
+                yield item
+            if response.status == status.HTTP_206_PARTIAL_CONTENT:
+                # The items of the next pages are mapped in order while the ones after them are being fetched
+                async for page in range_paginators.get(current_carrier(url)).iter_pages(
+                        fetch=partial(self.fetch_page, url=url, method=method, params=params, headers=headers,
+                                      json=json, data=data, path=path),
+                        content_range=response.headers['content-range']):
+                    for item in page:
+                        if background_tasks:
+                            cached_items.add(item)
+                        yield item
+        if background_tasks and (body := cached_items.encode(path)) is not None:
+            await db.set_later(key=cache_key, value=body, expire=expire, namespace=namespace,
+                               overwrite=is_revalidating())
+        elif background_tasks:
+            logging.warning(f'{url} is not cached,its items are beyond {MAX_CACHED_BYTES} bytes')
+
+    async def fetch_page(self, first: int, last: int, url: str, method: str, params: Optional[Dict[str, Any]],
+                         headers: Optional[Dict[str, Any]], json: Optional[Dict[str, Any]],
+                         data: Optional[Dict[str, Any]], path: ItemPath) -> list:
+        """One page of a 206 response,a status worth asking again raises PageRetry"""
+        async with self.send(method=method, url=url, concurrent=False, params=params, json=json, data=data,
+                             headers=dict(headers or {}, range=f'{first}-{last}')) as page_response:
+            if page_response.status in (status.HTTP_206_PARTIAL_CONTENT, status.HTTP_200_OK):
+                return [item async for item in iter_items(page_response.content.iter_chunked(JSON_CHUNK_BYTES),
+                                                          path=path)]
+            if page_response.status in RETRY_PAGE_STATUS:
+                raise PageRetry(f'{page_response.url} answered {page_response.status}')
+            raise PageFailed(f'{page_response.url} answered {page_response.status} for the items {first}-{last}')
+
     async def handle_streaming_response(self, url: str, method: str, params: Optional[Dict[str, Any]],
                                         headers: Optional[Dict[str, Any]],
                                         data: Optional[Dict[str, Any]],
@@ -185,69 +424,77 @@ class HTTPClientWrapper:
                                         expire: timedelta, namespace: str | None = None) -> AsyncGenerator[
             Dict[str, Any], None]:
         try:
-            cache_result = await db.get(key=url + str(params), namespace=namespace) if namespace else None
+            cache_key: str = carrier_cache_key(url=url, params=params, data=data)
+            cache_result = await db.get(key=cache_key, namespace=namespace) if use_cached_response(namespace) else None
             if cache_result:
                 yield cache_result
             else:
                 start_time = time.time()
-                async with self._client.request(method, url=url, params=params, headers=headers, data=data) as stream_request:
+                async with self.send(method=method, url=url, params=params, headers=headers,
+                                     data=data) as stream_request:
                     # logging.info(self.client._connector._conns)
                     response_time = time.time() - start_time
                     logging.info(
                         f'{method} took {response_time:.2f}s to process the request {stream_request.url} {stream_request.status}')
                     if stream_request.status == status.HTTP_200_OK:
-                        async for data in stream_request.content:
-                            response = orjson.loads(data)
+                        # Every document of the body whether it is sent on one line,several or alongside others
+                        async for response in iter_items(stream_request.content.iter_chunked(JSON_CHUNK_BYTES),
+                                                         path=None):
                             if background_tasks:
-                                background_tasks.add_task(db.set, key=url + str(params), value=response, expire=expire,
-                                                          namespace=namespace)
+                                await db.set_later(key=cache_key, value=response, expire=expire,
+                                                   namespace=namespace, overwrite=is_revalidating())
                             yield response
                     elif stream_request.status == status.HTTP_429_TOO_MANY_REQUESTS:
                         logging.critical(f'Too Many Request Sent To {stream_request.url}')
                         yield None
                     else:
                         yield None
-        except orjson.JSONDecodeError as e:
+        except JSONDecodeError as e:
             logging.error(f'Error parsing JSON:{e}')
             raise
         except aiohttp.ClientProxyConnectionError as proxy_issue:
             logging.error(f'Proxy Issue:{proxy_issue}')
 
-    def gen_all_valid_schedules(self, request: Request, response: Response, product_id: UUID,
-                                matrix: Generator, point_from: str, point_to: str,
-                                background_tasks: BackgroundTasks, task_exception: bool,
-                                failed_scac: Optional[list] = None) -> Dict[str, Any]:
+    async def gen_all_valid_schedules(self, cache_key: str, product_id: UUID,
+                                      matrix: Generator, point_from: str, point_to: str,
+                                      background_tasks: BackgroundTasks, task_exception: bool,
+                                      failed_scac: Optional[list] = None, dedup: bool = False) -> Response:
         """Validate the schedule and serialize hte json file excluding the field without any value """
         mapping_time = time.time()
-        flat_list: list = list(
-            chain.from_iterable(row for row in matrix if not isinstance(row, Exception) and row is not None))
+        table: ScheduleTable = await tabulate_off_loop(matrix)
         logging.info(
-            f'mapping_time = {time.time() - mapping_time:.2f}s Gathering all the schedule files obtained from carriers and mapping to our data format')
-        count_schedules: int = len(flat_list)
-        response.headers.update(
-            {"Connection": "Keep-Alive", "Cache-Control": "max-age=7200,stale-while-revalidate=86400",
-             "KN-Count-Schedules": str(count_schedules)})
+            f'mapping_time = {time.time() - mapping_time:.2f}s Gathering all the schedule files obtained from carriers,mapping and validating them into one table')
+        if dedup:
+            count_mapped: int = len(table)
+            table = await offloader.run_in_thread(table.deduplicated, size=count_mapped)
+            logging.info(f'Merged {count_mapped - len(table)} of {count_mapped} schedules offered by several carriers')
+        count_schedules: int = len(table)
+        resp_headers: dict = {"Connection": "Keep-Alive",
+                              "Cache-Control": f"max-age={SCHEDULE_PRODUCT_SETTING['maxAge']},stale-while-revalidate={SCHEDULE_PRODUCT_SETTING['staleWhileRevalidate']}",
+                              "KN-Count-Schedules": str(count_schedules)}
 
         if count_schedules == 0:
-            resp_headers: dict = {'retry-failed': ", ".join(failed_scac)} if failed_scac else None
-            final_result = JSONResponse(status_code=status.HTTP_200_OK, headers=resp_headers, content=jsonable_encoder(
+            error_headers: dict = {'retry-failed': ", ".join(failed_scac)} if failed_scac else None
+            final_result = JSONResponse(status_code=status.HTTP_200_OK, headers=error_headers, content=jsonable_encoder(
                 schema_response.Error(productid=product_id, details=f"{point_from}-{point_to} schedule not found")))
         else:
             validation_start_time = time.time()
-            sorted_schedules: list = sorted(flat_list, key=lambda schedule: (schedule.etd, schedule.transitTime))
-            final_set: dict = {'productid': product_id, 'origin': point_from, 'destination': point_to,
-                               'noofSchedule': count_schedules, 'schedules': sorted_schedules}
-            final_validation = schema_response.PRODUCT_ADAPTER.validate_python(final_set)
-            logging.info(f'validation_time={time.time() - validation_start_time:.2f}s Validated the schedule ')
-
-            dump_start_time = time.time()
-            final_result = schema_response.PRODUCT_ADAPTER.dump_python(final_validation, mode='json', exclude_none=True)
+            # The exact bytes the product response model used to render so the cache holds what is sent to the client
+            final_body, index = await offloader.run_in_thread(
+                sorted_product, table, product_id, point_from, point_to, size=count_schedules)
             logging.info(
-                f'serialization_time={time.time() - dump_start_time:.2f}s Generate schedule file and exclude all the fields which are equal to None')
+                f'serialization_time={time.time() - validation_start_time:.2f}s Sorted the schedule table and joined its rows into the product')
             if not task_exception:
-                background_tasks.add_task(db.set, key=request.url, value=final_result, namespace="schedule product")
+                await db.set_later(key=cache_key, value=final_body, namespace="schedule product",
+                                   expire=SCHEDULE_PRODUCT_SETTING['maxAge'] + SCHEDULE_PRODUCT_SETTING['staleWhileRevalidate'],
+                                   overwrite=is_revalidating())
+                if index is not None:
+                    await db.set_later(key=cache_key, value=index, namespace=PAGE_INDEX_NAMESPACE,
+                                       expire=SCHEDULE_PRODUCT_SETTING['maxAge'] + SCHEDULE_PRODUCT_SETTING['staleWhileRevalidate'],
+                                       overwrite=is_revalidating())
             else:
-                response.headers['retry-failed'] = ", ".join(failed_scac)
+                resp_headers['retry-failed'] = ", ".join(failed_scac)
+            final_result = Response(content=final_body, media_type='application/json', headers=resp_headers)
         """
         HTTP connection pooling status
         IDLE:The connection is not currently being used for any request.It is available for reuse by new requests.
@@ -309,29 +556,79 @@ class AsyncTaskManager:
         self.results = await asyncio.gather(*self.__tasks.values(), return_exceptions=True)
 
     async def _timeout_wrapper(self, coro: Callable, task_name: str) -> Optional[Any]:
-        """Wrap a coroutine with a timeout and retry logic."""
+        """Wrap a coroutine with a timeout and retry logic.A carrier whose circuit is open is skipped straight away"""
+        breaker: CircuitBreaker = circuit_breakers.get(task_name.split("_task")[0])
         retries: int = 0
         adjusted_timeout = self.default_timeout
-        while retries < self.max_retries:
+        allowed: bool = await breaker.allow()
+        while allowed and retries < self.max_retries:
             try:
-                return await asyncio.wait_for(coro(), timeout=self.default_timeout)
-            except (
-                    asyncio.TimeoutError, asyncio.CancelledError, aiohttp.ClientConnectionError,
-                    aiohttp.ServerConnectionError):
-                """Due to timeout, the coroutine task is cancelled. Once its cancelled, we retry it"""
-                logging.warning(
-                    f"{task_name} timed out after {self.default_timeout} seconds. Retrying {retries + 1}/{self.max_retries}...")
+                result = await asyncio.wait_for(coro(), timeout=self.default_timeout)
+                await breaker.record_success()
+                return result
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ServerConnectionError) as failure:
+                """Due to timeout, the coroutine task is cancelled. Once its cancelled, we retry it.
+                The task itself being cancelled e.g. by a client leaving a stream is no failure of the carrier,it is
+                re-raised by the BaseException branch"""
+                outcome: str = f'timed out after {self.default_timeout} seconds' if isinstance(
+                    failure, asyncio.TimeoutError) else f'failed to connect - {failure.__class__.__name__}:{failure}'
+                logging.warning(f"{task_name} {outcome}. Retrying {retries + 1}/{self.max_retries}...")
+                await breaker.record_failure(reason=failure.__class__.__name__)
                 retries += 1
                 adjusted_timeout += 2
-                await asyncio.sleep(1)  # Wait for 1 sec before the next retry
-        logging.error(f"{task_name} reached maximum retries. Nothing will be cached")
+                # Once the circuit is open,retrying only delays the search
+                allowed = breaker.state == CircuitState.closed
+                if allowed and retries < self.max_retries:
+                    await asyncio.sleep(1)  # Wait for 1 sec before the next retry
+            except PageFailed as page_failed:
+                # The carrier kept failing the pages of its response,its schedules are incomplete
+                logging.error(f"{task_name} failed - {page_failed}. Nothing will be cached")
+                await breaker.record_failure(reason=page_failed.__class__.__name__)
+                self.__fail(task_name)
+                return None
+            except Exception as task_error:
+                # e.g. a mapper which could not read the response,it tells nothing about the carrier being up or down
+                logging.error(f"{task_name} failed - {task_error.__class__.__name__}:{task_error}. Nothing will be cached")
+                breaker.release_probe()
+                self.__fail(task_name)
+                return None
+            except BaseException:
+                breaker.release_probe()
+                raise
+        if not allowed:
+            logging.error(f"{task_name} skipped because its circuit is {breaker.state}. Nothing will be cached")
+        else:
+            logging.error(f"{task_name} reached maximum retries. Nothing will be cached")
+        self.__fail(task_name)
+        return None
+
+    async def _slot_wrapper(self, coro: Callable, task_name: str) -> Optional[Any]:
+        slot: Optional[Callable[[str], AsyncContextManager]] = _carrier_slot_ctx_var.get()
+        if slot is None:
+            return await self._timeout_wrapper(coro=coro, task_name=task_name)
+        async with slot(task_name.split("_task")[0]):
+            return await self._timeout_wrapper(coro=coro, task_name=task_name)
+
+    def __fail(self, task_name: str) -> None:
+        """The product is then neither cached nor complete,the scac is sent back in the retry-failed header"""
         self.error = True
         self.failed_scac.append(task_name.split("_task")[0])
-        return None
+
+    async def as_completed(self) -> AsyncGenerator[tuple, None]:
+        """Yield the scac and the result (or exception) of every task in the order they complete"""
+        pending: Dict[asyncio.Task, str] = {task: name for name, task in self.__tasks.items()}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                scac: str = pending.pop(task).split("_task")[0]
+                if task.cancelled():
+                    yield scac, asyncio.CancelledError()
+                else:
+                    yield scac, task.exception() or task.result()
 
     def create_task(self, name: str, coro: Callable) -> None:
         logging.info(f'Forward the request to {name.split("_task")[0]}')
-        self.__tasks[name] = asyncio.create_task(self._timeout_wrapper(coro=coro, task_name=name))
+        self.__tasks[name] = asyncio.create_task(self._slot_wrapper(coro=coro, task_name=name))
 
     def results(self) -> Generator:
         return (result for result in self.results if not isinstance(result, Exception)) if self.error else self.results
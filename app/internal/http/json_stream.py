@@ -0,0 +1,198 @@
+"""
+Incremental decoding of the carrier responses.The body is fed chunk by chunk as it arrives and every element of the
+array holding the schedules is decoded as soon as its last byte is there,so neither the raw body nor the decoded
+document ever has to be held at once.
+"""
+import codecs
+import re
+from json import JSONDecodeError, JSONDecoder
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+import orjson
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+DECODER = JSONDecoder()
+
+ItemPath = Optional[Tuple[str, ...]]
+
+
+class Incomplete(Exception):
+    """The value at the position has not fully arrived yet"""
+
+
+class NotFound(Exception):
+    """The document has no array at the path"""
+
+
+def skip_whitespace(text: str, position: int) -> int:
+    return WHITESPACE.match(text, position).end()
+
+
+def expect(text: str, position: int, char: str) -> int:
+    position = skip_whitespace(text, position)
+    if position == len(text):
+        raise Incomplete
+    if text[position] != char:
+        raise NotFound
+    return position + 1
+
+
+def decode_value(text: str, position: int) -> Tuple[Any, int]:
+    """A value is only complete once a character follows it,otherwise a number could still be missing digits.
+    Until the body is over a value which does not decode is assumed to be cut by the end of the chunk"""
+    try:
+        value, end = DECODER.raw_decode(text, position)
+    except JSONDecodeError:
+        raise Incomplete from None
+    end = skip_whitespace(text, end)
+    if end == len(text):
+        raise Incomplete
+    return value, end
+
+
+class JsonItems:
+    """Decode the elements of the array found at path e.g. ('response', 'routes'),() when the document is the array
+    itself,or every document of a stream of concatenated or newline delimited documents when path is None.
+    A value which has not fully arrived is decoded again once the pending text has doubled,which keeps the work
+    linear whatever the size of the elements compared to the chunks"""
+
+    def __init__(self, path: ItemPath = ()) -> None:
+        self.path: ItemPath = path
+        self.__text = codecs.getincrementaldecoder('utf-8')()
+        self.__pending: List[str] = []
+        self.__pending_length: int = 0
+        self.__retry_length: int = 0
+        self.__in_array: bool = path is None
+        self.__done: bool = False
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        if self.__done:
+            return []
+        self.__append(self.__text.decode(chunk))
+        if self.__pending_length < self.__retry_length:
+            return []
+        return self.__decode()
+
+    def close(self) -> List[Any]:
+        """Decode what is left once the body is over,a truncated or malformed body raises JSONDecodeError"""
+        if self.__done:
+            return []
+        self.__append(self.__text.decode(b'', final=True))
+        items: List[Any] = self.__decode()
+        text: str = ''.join(self.__pending)
+        complete: bool = self.__done
+        self.__done, self.__pending = True, []
+        if self.path is not None:
+            if not complete and (self.__in_array or skip_whitespace(text, 0) < len(text)):
+                raise JSONDecodeError(f'The body ended before the array at {self.path} was complete', text, len(text))
+        elif skip_whitespace(text, 0) < len(text):
+            # The last document is only followed by the end of the body
+            items.append(DECODER.decode(text))
+        return items
+
+    def __append(self, text: str) -> None:
+        if text:
+            self.__pending.append(text)
+            self.__pending_length += len(text)
+
+    def __decode(self) -> List[Any]:
+        text: str = ''.join(self.__pending)
+        position: int = 0
+        items: List[Any] = []
+        try:
+            if not self.__in_array:
+                position = self.__find_array(text)
+                self.__in_array = True
+            while not self.__done:
+                position = skip_whitespace(text, position)
+                if self.path is not None and text[position:position + 1] == ']':
+                    self.__done = True
+                    break
+                item, position = self.__next_item(text, position)
+                items.append(item)
+        except Incomplete:
+            self.__retry_length = 2 * (len(text) - position)
+        except NotFound:
+            self.__done = True
+        remaining: str = '' if self.__done else text[position:]
+        self.__pending = [remaining] if remaining else []
+        self.__pending_length = len(remaining)
+        return items
+
+    def __next_item(self, text: str, position: int) -> Tuple[Any, int]:
+        """The next element and the position after it and its separator"""
+        if position == len(text):
+            raise Incomplete
+        if self.path is None:
+            return decode_value(text, position)
+        item, position = decode_value(text, position)
+        if text[position] == ']':
+            self.__done = True
+        elif text[position] != ',':
+            raise JSONDecodeError(f'Expecting , or ] after an element of the array at {self.path}', text, position)
+        return item, position + 1
+
+    def __find_array(self, text: str) -> int:
+        """Walk down the keys of the path,the values of the other keys are decoded only to be skipped"""
+        position: int = 0
+        for key in self.path:
+            position = expect(text, position, '{')
+            while True:
+                position = skip_whitespace(text, position)
+                if position == len(text):
+                    raise Incomplete
+                if text[position] == '}':
+                    raise NotFound
+                name, position = decode_value(text, position)
+                position = expect(text, position, ':')
+                if name == key:
+                    break
+                _, position = decode_value(text, skip_whitespace(text, position))
+                if text[position] == ',':
+                    position += 1
+        return expect(text, position, '[')
+
+
+async def iter_items(chunks: AsyncIterator[bytes], path: ItemPath = ()) -> AsyncIterator[Any]:
+    """Yield the elements of the array at path as the chunks of the body arrive"""
+    items = JsonItems(path=path)
+    async for chunk in chunks:
+        for item in items.feed(chunk):
+            yield item
+    for item in items.close():
+        yield item
+
+
+async def iter_chunks(body: bytes, size: int) -> AsyncIterator[bytes]:
+    """A cached body is fed like a response so it is not decoded at once either"""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def encode_items(path: Sequence[str], items: List[bytes]) -> bytes:
+    """The document holding only the array at path,the elements are already serialized"""
+    return b''.join([b'{' + orjson.dumps(key) + b':' for key in path] + [b'[', b','.join(items), b']', b'}' * len(path)])
+
+
+class CachedItems:
+    """Serialized elements kept for the cache entry of a response.A response beyond limit bytes is not cached,its
+    elements are dropped as soon as it is known so the memory held stays bounded"""
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.size: int = 0
+        self.items: Optional[List[bytes]] = []
+
+    def add(self, item: Any) -> None:
+        if self.items is None:
+            return
+        encoded: bytes = orjson.dumps(item)
+        self.size += len(encoded)
+        if self.size > self.limit:
+            self.items = None
+        else:
+            self.items.append(encoded)
+
+    def encode(self, path: Sequence[str]) -> Optional[bytes]:
+        return encode_items(path, self.items) if self.items is not None else None
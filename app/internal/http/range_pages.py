@@ -0,0 +1,139 @@
+"""
+Pages after the first one of a 206 Content-Range response.At most window pages are fetched ahead of the page the
+mapper is waiting for,a page which fails is retried and the pages are yielded in order as soon as they and all the
+pages before them are in.The window of a carrier grows with its successful pages and is cut when one fails,so a
+struggling carrier is sent fewer pages at once.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from json import JSONDecodeError
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Tuple
+
+import aiohttp
+
+from app.internal.http.rate_limiter import CarrierThrottled
+from app.internal.setting import load_yaml
+
+
+class PageRetry(Exception):
+    """The carrier answered the page with a status worth asking again e.g. 429 or 503"""
+
+
+class PageFailed(Exception):
+    """A page could not be fetched,the schedules of the carrier are incomplete and must not be used"""
+
+
+RETRIABLE: Tuple = (PageRetry, CarrierThrottled, asyncio.TimeoutError, aiohttp.ClientConnectionError,
+                    aiohttp.ClientPayloadError, JSONDecodeError)
+
+PageFetch = Callable[[int, int], Awaitable[List[Any]]]
+
+
+def page_ranges(content_range: str, page_size: int) -> List[Tuple[int, int]]:
+    """First and last index of the pages left e.g. [(50, 99), (100, 119)] after '0-49/120'"""
+    returned, _, total = content_range.partition('/')
+    try:
+        start: int = int(returned.rpartition('-')[2]) + 1
+    except ValueError:
+        start = page_size
+    last: int = int(total)
+    return [(first, min(first + page_size, last) - 1) for first in range(start, last, page_size)]
+
+
+def discard(task: asyncio.Task) -> None:
+    """Cancel a page nobody waits for anymore,the outcome of a finished one is retrieved so it is not reported"""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+class RangePaginator:
+    """Window of the pages of one carrier,grown by one every window of successful pages and multiplied by backoff
+    when a page fails,between minWindow and maxWindow"""
+
+    def __init__(self, scac: str, setting: dict) -> None:
+        self.scac: str = scac
+        self.page_size: int = setting['pageSize']
+        self.window: float = float(setting['initialWindow'])
+        self.min_window: int = setting['minWindow']
+        self.max_window: int = setting['maxWindow']
+        self.backoff: float = setting['backoff']
+        self.retries: int = setting['retries']
+        self.retry_delay: float = setting['retryDelay']
+        self.page_timeout: float = setting['pageTimeout']
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.responses: int = 0
+        self.pages: int = 0
+        self.retried: int = 0
+        self.failed: int = 0
+
+    async def iter_pages(self, fetch: PageFetch, content_range: str) -> AsyncIterator[List[Any]]:
+        """Yield the items of every page left in order.fetch(first, last) returns the items of one page"""
+        ranges: List[Tuple[int, int]] = page_ranges(content_range, self.page_size)
+        self.responses += 1
+        tasks: Dict[int, asyncio.Task] = {}
+        launched: int = 0
+        try:
+            for index in range(len(ranges)):
+                while launched < len(ranges) and launched < index + max(int(self.window), 1):
+                    tasks[launched] = asyncio.create_task(self.fetch_page(fetch, *ranges[launched]))
+                    launched += 1
+                yield await tasks.pop(index)
+        finally:
+            for task in tasks.values():
+                discard(task)
+
+    async def fetch_page(self, fetch: PageFetch, first: int, last: int) -> List[Any]:
+        attempt: int = 0
+        while True:
+            start_time: float = time.monotonic()
+            try:
+                items: List[Any] = await asyncio.wait_for(fetch(first, last), timeout=self.page_timeout)
+            except RETRIABLE as failure:
+                self.window = max(self.min_window, self.window * self.backoff)
+                if attempt == self.retries:
+                    self.failed += 1
+                    raise PageFailed(f'{self.scac} page {first}-{last} failed after {attempt + 1} attempts - '
+                                     f'{failure.__class__.__name__}:{failure}') from failure
+                attempt += 1
+                self.retried += 1
+                logging.warning(f'{self.scac} page {first}-{last} failed with {failure.__class__.__name__},'
+                                f'retrying {attempt}/{self.retries} with a window of {int(self.window)}')
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+                continue
+            latency: float = time.monotonic() - start_time
+            self.latencies.append(latency)
+            self.pages += 1
+            self.window = min(self.max_window, self.window + 1 / self.window)
+            logging.info(f'{self.scac} page {first}-{last} took {latency:.2f}s for {len(items)} items')
+            return items
+
+    def stats(self) -> Dict[str, Any]:
+        ranked: List[float] = sorted(self.latencies)
+        return {'window': int(self.window), 'responses': self.responses, 'pages': self.pages,
+                'retried': self.retried, 'failed': self.failed,
+                'pageLatency': {'avg': round(sum(ranked) / len(ranked), 4) if ranked else None,
+                                'p95': round(ranked[min(int(len(ranked) * 0.95), len(ranked) - 1)], 4) if ranked else None,
+                                'max': round(ranked[-1], 4) if ranked else None}}
+
+
+class RangePaginators:
+    def __init__(self, setting: dict) -> None:
+        self.default: dict = setting['default']
+        self.overrides: dict = {scac: override for scac, override in setting.items() if scac != 'default'}
+        self.__paginators: Dict[str, RangePaginator] = {}
+
+    def get(self, scac: str) -> RangePaginator:
+        if (paginator := self.__paginators.get(scac)) is None:
+            paginator = self.__paginators[scac] = RangePaginator(
+                scac=scac, setting=dict(self.default, **(self.overrides.get(scac) or {})))
+        return paginator
+
+    def stats(self) -> Dict[str, Any]:
+        return {scac: paginator.stats() for scac, paginator in self.__paginators.items()}
+
+
+range_paginators = RangePaginators(load_yaml()['data']['rangePages'])
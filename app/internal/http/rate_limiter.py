@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+from fastapi import status
+
+from app.internal.setting import load_yaml
+from app.storage import db
+
+THROTTLE_STATUS: frozenset = frozenset({status.HTTP_429_TOO_MANY_REQUESTS, status.HTTP_503_SERVICE_UNAVAILABLE})
+
+_carrier_ctx_var: ContextVar[Optional[str]] = ContextVar('carrier', default=None)
+
+
+def use_carrier(scac: str) -> None:
+    """Attribute every carrier request made by the current task to the budget of the scac"""
+    _carrier_ctx_var.set(scac)
+
+
+def current_carrier(url: str) -> str:
+    """Requests made outside a carrier task e.g. the port mapping are limited per host"""
+    return _carrier_ctx_var.get() or urlsplit(url).hostname or url
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """Retry-After is either a number of seconds or an HTTP date"""
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CarrierThrottled(Exception):
+    """The carrier budget does not allow another request within the time we can wait"""
+
+
+class CarrierLease:
+    """One request holding the budget of a carrier.The latency is measured from the moment the budget was granted"""
+
+    def __init__(self, limiter: 'CarrierLimiter') -> None:
+        self.limiter: CarrierLimiter = limiter
+        self.granted_at: float = time.monotonic()
+
+    async def observe(self, status_code: int, retry_after: Optional[str] = None) -> None:
+        await self.limiter.observe(status_code=status_code, latency=time.monotonic() - self.granted_at,
+                                   retry_after=retry_after)
+
+
+class CarrierLimiter:
+    """Concurrency limit of one carrier adjusted with AIMD plus a token bucket shared by all the workers through redis.
+    The limit grows by one every round of successful requests and is cut on a 429/503 or a response slower than the
+    latency target.A Retry-After pauses every worker until it is over"""
+
+    def __init__(self, carrier: str, setting: dict) -> None:
+        self.carrier: str = carrier
+        self.rate: float = setting['rate']
+        self.burst: int = setting['burst']
+        self.limit: float = float(setting['initialConcurrency'])
+        self.min_concurrency: int = setting['minConcurrency']
+        self.max_concurrency: int = setting['maxConcurrency']
+        self.latency_target: float = setting['latencyTarget']
+        self.backoff: float = setting['backoff']
+        self.max_wait: float = setting['maxWait']
+        self.in_flight: int = 0
+        self.cooldown_until: float = 0
+        self.throttled: int = 0
+        self.rejected: int = 0
+        self.__slot_released: asyncio.Condition = asyncio.Condition()
+
+    async def __wait_slot(self, deadline: float) -> None:
+        async with self.__slot_released:
+            try:
+                await asyncio.wait_for(self.__slot_released.wait_for(lambda: self.in_flight < int(self.limit)),
+                                       timeout=max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise CarrierThrottled(f'{self.carrier} has {self.in_flight} requests in flight for a limit of {int(self.limit)}')
+            self.in_flight += 1
+
+    async def __release_slot(self) -> None:
+        async with self.__slot_released:
+            self.in_flight -= 1
+            self.__slot_released.notify_all()
+
+    async def __wait_token(self, deadline: float) -> None:
+        while True:
+            wait: float = max(await db.take_token(key=self.carrier, rate=self.rate, burst=self.burst),
+                              self.cooldown_until - time.monotonic())
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise CarrierThrottled(f'{self.carrier} is out of budget for the next {wait:.2f}s')
+            await asyncio.sleep(wait)
+
+    async def try_token(self) -> bool:
+        """Take a token only if one is available right away e.g. for a hedged request"""
+        if self.cooldown_until > time.monotonic() or await db.take_token(key=self.carrier, rate=self.rate,
+                                                                         burst=self.burst) > 0:
+            self.rejected += 1
+            return False
+        return True
+
+    @asynccontextmanager
+    async def slot(self, concurrent: bool = True) -> AsyncIterator[CarrierLease]:
+        """concurrent=False only spends rate budget e.g. for the extra pages of a search already holding a slot"""
+        deadline: float = time.monotonic() + self.max_wait
+        try:
+            if concurrent:
+                await self.__wait_slot(deadline)
+            try:
+                await self.__wait_token(deadline)
+                yield CarrierLease(self)
+            finally:
+                if concurrent:
+                    await self.__release_slot()
+        except CarrierThrottled:
+            self.rejected += 1
+            raise
+
+    async def observe(self, status_code: int, latency: float, retry_after: Optional[str] = None) -> None:
+        if status_code in THROTTLE_STATUS:
+            self.throttled += 1
+            self.limit = max(self.min_concurrency, self.limit * self.backoff)
+            if (cooldown := parse_retry_after(retry_after)) is not None:
+                self.cooldown_until = max(self.cooldown_until, time.monotonic() + cooldown)
+                await db.set_cooldown(key=self.carrier, seconds=cooldown)
+            logging.warning(f'{self.carrier} throttled us with {status_code},concurrency limit cut to {int(self.limit)}')
+        elif latency > self.latency_target:
+            self.limit = max(self.min_concurrency, self.limit * (1 + self.backoff) / 2)
+        elif status_code < status.HTTP_500_INTERNAL_SERVER_ERROR:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'limit': int(self.limit), 'inFlight': self.in_flight, 'throttled': self.throttled,
+                'rejected': self.rejected, 'cooldown': round(max(self.cooldown_until - time.monotonic(), 0), 2)}
+
+
+class CarrierLimiters:
+    def __init__(self, setting: dict) -> None:
+        self.default: dict = setting['default']
+        self.overrides: dict = {carrier: override for carrier, override in setting.items() if carrier != 'default'}
+        self.__limiters: Dict[str, CarrierLimiter] = {}
+
+    def get(self, carrier: str) -> CarrierLimiter:
+        if (limiter := self.__limiters.get(carrier)) is None:
+            limiter = self.__limiters[carrier] = CarrierLimiter(
+                carrier=carrier, setting=dict(self.default, **(self.overrides.get(carrier) or {})))
+        return limiter
+
+    def slot(self, url: str, concurrent: bool = True) -> AsyncContextManager[CarrierLease]:
+        return self.get(current_carrier(url)).slot(concurrent=concurrent)
+
+    def stats(self) -> Dict[str, Any]:
+        return {carrier: limiter.stats() for carrier, limiter in self.__limiters.items()}
+
+
+carrier_limiters = CarrierLimiters(load_yaml()['data']['carrierLimits'])
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional
+
+from app.internal.http.rate_limiter import use_carrier
+from app.internal.setting import Settings, get_settings, load_yaml
+from app.internal.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from app.internal.http.http_client_manager import HTTPClientWrapper
+
+TokenFetcher = Callable[['HTTPClientWrapper', Settings], Awaitable[Optional[dict]]]
+
+
+class TokenUnavailable(Exception):
+    """The carrier did not grant an access token"""
+
+
+class AccessToken:
+    def __init__(self, value: str, expires_in: float) -> None:
+        self.value: str = value
+        self.expires_in: float = expires_in
+        self.expires_at: float = time.monotonic() + expires_in
+
+    @property
+    def valid(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    def refresh_in(self, margin: float) -> float:
+        """Seconds before the token is due for a refresh,a short lived token is refreshed halfway through"""
+        return max(self.expires_at - time.monotonic() - min(margin, self.expires_in / 2), 0)
+
+
+class TokenManager:
+    """Access tokens of the carriers kept in the memory of the worker.Every token is refreshed in the background
+    refreshMargin seconds before it expires so that a search reads it without any I/O,only a search running before
+    the first token of the carrier was granted has to wait for it.Concurrent refreshes of a carrier are single-flighted"""
+
+    def __init__(self, setting: dict) -> None:
+        self.refresh_margin: float = setting['refreshMargin']
+        self.retry_interval: float = setting['retryInterval']
+        self.prewarm: bool = setting['prewarm']
+        self.ttl: dict = setting['ttl']
+        self.refreshes: Counter = Counter()
+        self.failures: Counter = Counter()
+        self.__fetchers: Dict[str, TokenFetcher] = {}
+        self.__tokens: Dict[str, AccessToken] = {}
+        self.__refreshers: Dict[str, asyncio.Task] = {}
+        self.__flight = SingleFlight(name='access token')
+        self.__client: Optional['HTTPClientWrapper'] = None
+
+    def register(self, scac: str, fetch: TokenFetcher) -> None:
+        """fetch returns the json of the token endpoint,expires_in is used when the carrier provides it"""
+        self.__fetchers[scac] = fetch
+
+    def startup(self, client: 'HTTPClientWrapper') -> None:
+        self.__client = client
+        if self.prewarm:
+            for scac in self.__fetchers:
+                self.__keep_fresh(scac=scac, delay=0)
+
+    def shutdown(self) -> None:
+        for refresher in self.__refreshers.values():
+            refresher.cancel()
+        self.__refreshers.clear()
+        self.__tokens.clear()
+        self.__client = None
+
+    async def get(self, scac: str, client: 'HTTPClientWrapper') -> str:
+        token: Optional[AccessToken] = self.__tokens.get(scac)
+        if token is None or not token.valid:
+            self.__client = self.__client or client
+            token = await self.__flight.do(scac, lambda: self.__refresh(scac))
+            self.__keep_fresh(scac=scac, delay=token.refresh_in(self.refresh_margin))
+        return token.value
+
+    async def __refresh(self, scac: str) -> AccessToken:
+        use_carrier(scac)
+        try:
+            response: Optional[dict] = await self.__fetchers[scac](self.__client, get_settings())
+            token = AccessToken(value=response['access_token'],
+                                expires_in=float(response.get('expires_in') or self.ttl.get(scac, self.ttl['default'])))
+        except Exception as refresh_error:
+            self.failures[scac] += 1
+            logging.error(f'Unable to refresh the {scac} access token - {refresh_error.__class__.__name__}:{refresh_error}')
+            raise TokenUnavailable(f'{scac} did not grant an access token') from refresh_error
+        self.refreshes[scac] += 1
+        self.__tokens[scac] = token
+        logging.info(f'{scac} access token refreshed,expires in {token.expires_in:.0f}s')
+        return token
+
+    def __keep_fresh(self, scac: str, delay: float) -> None:
+        if scac not in self.__refreshers:
+            self.__refreshers[scac] = asyncio.create_task(self.__refresh_ahead(scac=scac, delay=delay))
+
+    async def __refresh_ahead(self, scac: str, delay: float) -> None:
+        """Keep refreshing the token ahead of its expiry.Once a refresh fails and the current token has expired,the
+        next search fetches the token on demand"""
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    delay = (await self.__flight.do(scac, lambda: self.__refresh(scac))).refresh_in(self.refresh_margin)
+                except TokenUnavailable:
+                    if (token := self.__tokens.get(scac)) is None or not token.valid:
+                        return
+                    delay = min(self.retry_interval, token.refresh_in(0))
+        finally:
+            if self.__refreshers.get(scac) is asyncio.current_task():
+                del self.__refreshers[scac]
+
+    def stats(self) -> Dict[str, Any]:
+        now: float = time.monotonic()
+        return {scac: {'expiresIn': round(max(self.__tokens[scac].expires_at - now, 0)) if scac in self.__tokens else 0,
+                       'refreshes': self.refreshes[scac], 'failures': self.failures[scac],
+                       'refreshingAhead': scac in self.__refreshers} for scac in self.__fetchers}
+
+
+token_manager = TokenManager(load_yaml()['data']['accessTokens'])
@@ -0,0 +1,128 @@
+"""
+Connections of the carrier hosts.At startup every host a carrier searches is sent a HEAD request through the pool of
+the carrier on as many connections as configured,so DNS,TCP and TLS are paid before the first search rather than by it.
+The latency of every carrier request is recorded per host up to the response headers,split between the requests
+which had to open their connection (cold) and the ones which reused a kept-alive one (warm).
+"""
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from pydantic import BaseModel
+
+from app.internal.setting import load_yaml
+
+WARMUP_SETTING: dict = load_yaml()['data']['connectionWarmup']
+
+Touch = Callable[[str, str], Awaitable[None]]
+
+
+def carrier_origins(settings: BaseModel, fields: Iterable[str]) -> List[str]:
+    """scheme://host[:port] of the urls held by the fields of the Settings,a url whose host is templated is skipped"""
+    origins: Dict[str, None] = {}
+    for field in fields:
+        url = urlsplit(getattr(settings, field, None) or '')
+        if url.scheme in ('http', 'https') and url.hostname and '{' not in url.netloc:
+            origins[f'{url.scheme}://{url.netloc}'] = None
+    return list(origins)
+
+
+def summary(samples: Deque[float]) -> Dict[str, Any]:
+    ranked: List[float] = sorted(samples)
+    if not ranked:
+        return {'requests': 0}
+    return {'requests': len(ranked), 'avg': round(sum(ranked) / len(ranked), 4),
+            'p95': round(ranked[min(int(len(ranked) * 0.95), len(ranked) - 1)], 4), 'max': round(ranked[-1], 4)}
+
+
+class HostSamples:
+    def __init__(self, window: int) -> None:
+        self.cold: Deque[float] = deque(maxlen=window)
+        self.warm: Deque[float] = deque(maxlen=window)
+        self.connect: Deque[float] = deque(maxlen=window)
+        self.transport: Optional[str] = None
+
+
+class HostLatency:
+    """Recent request latencies of every host,connect is the time taken to open the connection (DNS,TCP and TLS)
+    or None when the request reused one"""
+
+    def __init__(self, window: int) -> None:
+        self.window: int = window
+        self.prewarmed: Counter = Counter()
+        self.__hosts: Dict[str, HostSamples] = {}
+
+    def record(self, host: str, seconds: float, connect: Optional[float], transport: str) -> None:
+        if (samples := self.__hosts.get(host)) is None:
+            samples = self.__hosts[host] = HostSamples(window=self.window)
+        samples.transport = transport
+        if connect is None:
+            samples.warm.append(seconds)
+        else:
+            samples.cold.append(seconds)
+            samples.connect.append(connect)
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Time the aiohttp requests,a request opening a connection goes through on_connection_create"""
+
+        async def on_request_start(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+            context.start, context.connect = time.monotonic(), None
+
+        async def on_connection_create_start(session: aiohttp.ClientSession, context: SimpleNamespace,
+                                             params: Any) -> None:
+            context.connect_start = time.monotonic()
+
+        async def on_connection_create_end(session: aiohttp.ClientSession, context: SimpleNamespace,
+                                           params: Any) -> None:
+            context.connect = time.monotonic() - context.connect_start
+
+        async def on_request_end(session: aiohttp.ClientSession, context: SimpleNamespace,
+                                 params: aiohttp.TraceRequestEndParams) -> None:
+            self.record(host=params.url.host, seconds=time.monotonic() - context.start, connect=context.connect,
+                        transport=f'HTTP/{params.response.version.major}.{params.response.version.minor}')
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def stats(self) -> Dict[str, Any]:
+        return {host: {'transport': samples.transport, 'prewarmed': self.prewarmed[host],
+                       'cold': summary(samples.cold), 'warm': summary(samples.warm),
+                       'connect': summary(samples.connect)} for host, samples in self.__hosts.items()}
+
+
+host_latency = HostLatency(window=WARMUP_SETTING['latencyWindow'])
+
+
+async def warm_host(scac: str, origin: str, touch: Touch, connections: int) -> None:
+    """Concurrent requests make the pool open one connection each"""
+    results: list = await asyncio.gather(*(touch(origin, scac) for _ in range(connections)), return_exceptions=True)
+    failures: List[BaseException] = [result for result in results if isinstance(result, BaseException)]
+    host_latency.prewarmed[urlsplit(origin).hostname] += connections - len(failures)
+    if failures:
+        logging.warning(f'Unable to pre-warm {len(failures)} of {connections} connections of {scac} to {origin} - '
+                        f'{failures[0].__class__.__name__}:{failures[0]}')
+
+
+async def prewarm(carriers: Dict[str, Dict[str, int]], touch: Touch, timeout: float) -> None:
+    """carriers maps every scac to its origins and the number of connections to open to each of them.A host which
+    has not answered within the timeout is left cold,the startup does not wait any longer for it"""
+    start_time: float = time.monotonic()
+    hosts: Dict[str, None] = {urlsplit(origin).hostname: None for origins in carriers.values() for origin in origins}
+    try:
+        await asyncio.wait_for(asyncio.gather(*(warm_host(scac, origin, touch, connections)
+                                                for scac, origins in carriers.items()
+                                                for origin, connections in origins.items())), timeout=timeout)
+    except asyncio.TimeoutError:
+        cold: List[str] = [host for host in hosts if not host_latency.prewarmed[host]]
+        logging.warning(f'Pre-warming stopped after {timeout}s,{len(cold)} hosts are still cold:{cold}')
+    logging.info(f'Pre-warmed {sum(host_latency.prewarmed.values())} connections to {len(hosts)} carrier hosts '
+                 f'in {time.monotonic() - start_time:.2f}s')
@@ -0,0 +1,74 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.internal.setting import load_yaml
+
+
+class Offloader:
+    """Run the CPU bound steps (mapping the carrier responses,validating and serializing the product) off the event loop
+    so that a huge lane does not hold up every other request of the worker.
+    executor inline = everything stays on the event loop
+    executor thread = a thread pool,the carrier mappers return lazy generators which can only be consumed in a thread
+    executor process = the thread pool plus a process pool for the picklable steps which are given compact bytes"""
+
+    def __init__(self, executor: str, max_workers: int, inline_threshold: int) -> None:
+        if executor not in ('inline', 'thread', 'process'):
+            raise ValueError(f'Unknown offload executor {executor}')
+        self.executor: str = executor
+        self.max_workers: int = max_workers
+        self.inline_threshold: int = inline_threshold
+        self.__threads: Optional[ThreadPoolExecutor] = None
+        self.__processes: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.__processes is not None
+
+    def startup(self) -> None:
+        if self.executor != 'inline' and self.__threads is None:
+            self.__threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='offload')
+        if self.executor == 'process' and self.__processes is None:
+            # Forking a worker that already runs an event loop and other threads is unsafe,spawn a clean interpreter instead
+            self.__processes = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+            # Spawn the workers now rather than on the first huge lane
+            for _ in range(self.max_workers):
+                self.__processes.submit(int)
+        logging.info(f'Offload executor:{self.executor} max workers:{self.max_workers}', extra={'custom_attribute': None})
+
+    def shutdown(self) -> None:
+        for pool in (self.__threads, self.__processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.__threads = self.__processes = None
+
+    def run_inline(self, size: Optional[int]) -> bool:
+        return size is not None and size < self.inline_threshold
+
+    async def __run(self, pool: Executor, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+
+    async def run_in_thread(self, func: Callable, *args: Any, size: Optional[int] = None) -> Any:
+        """The context is copied into the thread so that context variables e.g. the revalidation flag still apply"""
+        if self.__threads is None or self.run_inline(size):
+            return func(*args)
+        return await self.__run(self.__threads, functools.partial(contextvars.copy_context().run, func), *args)
+
+    async def run_in_process(self, func: Callable, *args: Any, size: Optional[int] = None) -> Any:
+        """func and args must be picklable.Without a process pool it falls back to the thread pool"""
+        if self.__processes is None:
+            return await self.run_in_thread(func, *args, size=size)
+        if self.run_inline(size):
+            return func(*args)
+        return await self.__run(self.__processes, func, *args)
+
+
+OFFLOAD_SETTING: dict = load_yaml()['data']['offload']
+
+offloader = Offloader(executor=OFFLOAD_SETTING['executor'], max_workers=OFFLOAD_SETTING['maxWorkers'],
+                      inline_threshold=OFFLOAD_SETTING['inlineThreshold'])
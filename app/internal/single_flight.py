@@ -0,0 +1,35 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Concurrent calls with the same key await one in-flight coroutine and share its result.
+    The shared task is shielded so that a disconnected leader does not cancel the work the waiters are relying on"""
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.__calls: Dict[str, asyncio.Future] = {}
+        self.leaders: int = 0
+        # Totals only,a counter per search key would keep every lane,date and filter ever searched by the worker
+        self.coalesced: int = 0
+        self.peer_waits: int = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__calls
+
+    async def do(self, key: str, coro: Callable[[], Awaitable[Any]]) -> Any:
+        call = self.__calls.get(key)
+        if call is None:
+            self.leaders += 1
+            call = asyncio.ensure_future(coro())
+            self.__calls[key] = call
+            call.add_done_callback(lambda _: self.__calls.pop(key, None))
+        else:
+            self.coalesced += 1
+            logging.info(f'{self.name}:Coalesced into the in-flight call - {key}')
+        return await asyncio.shield(call)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'inFlight': len(self.__calls), 'leaders': self.leaders, 'coalescedWaiters': self.coalesced,
+                'crossWorkerWaiters': self.peer_waits}
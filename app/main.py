@@ -5,7 +5,7 @@ from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
-from app.api.routers import schedules_router, port_map
+from app.api.routers import metrics, schedules_router, port_map
 from app.api.schemas.schema_response import HealthCheck
 from app.internal.http.http_client_manager import shutdown_event, startup_event
 from app.internal.http.middleware import RequestContextLogMiddleware
@@ -24,6 +24,7 @@ app.add_middleware(
 
 app.include_router(schedules_router.router)
 app.include_router(port_map.router)
+app.include_router(metrics.router)
 app.add_event_handler("startup", startup_event)
 app.add_event_handler("shutdown", shutdown_event)
 
@@ -0,0 +1,97 @@
+import gzip
+import io
+import logging
+import zlib
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional,gzip is always available
+    zstandard = None
+
+# A compressed entry starts with a NUL byte which a json document never does,so entries written before the
+# compression was enabled are still read as they are
+CODEC_HEADERS: Dict[str, bytes] = {'gzip': b'\x00gz', 'zstd': b'\x00zs'}
+HEADER_LENGTH: int = 3
+CODEC_BY_HEADER: Dict[bytes, str] = {header: codec for codec, header in CODEC_HEADERS.items()}
+
+
+def content_encoding(entry: bytes) -> Optional[str]:
+    """The Content-Encoding matching the codec of the entry,None when it is stored uncompressed"""
+    return CODEC_BY_HEADER.get(entry[:HEADER_LENGTH])
+
+
+def encoding_weights(accept_encoding: str) -> Dict[str, float]:
+    """The q-value of every coding of an Accept-Encoding header,1 when it has none and 0 when it cannot be read"""
+    weights: Dict[str, float] = {}
+    for token in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in token.split(';'))
+        weight: float = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding:
+            weights[coding.lower()] = weight
+    return weights
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether the client accepts the encoding by name or through *,gzip;q=0 refuses it"""
+    weights: Dict[str, float] = encoding_weights(accept_encoding)
+    return weights.get(encoding, weights.get('*', 0.0)) > 0
+
+
+def compressed_body(entry: bytes) -> bytes:
+    return entry[HEADER_LENGTH:]
+
+
+def decompress(entry: bytes) -> bytes:
+    encoding: Optional[str] = content_encoding(entry)
+    if encoding is None:
+        return entry
+    if encoding == 'gzip':
+        return gzip.decompress(compressed_body(entry))
+    if zstandard is None:
+        raise ValueError('The entry is compressed with zstd but the zstandard package is not installed')
+    return zstandard.ZstdDecompressor().decompress(compressed_body(entry))
+
+
+def leading_bytes(entry: bytes, size: int) -> bytes:
+    """Up to the first size bytes of the decompressed entry,the rest of it is never decompressed"""
+    encoding: Optional[str] = content_encoding(entry)
+    if encoding is None:
+        return entry[:size]
+    if encoding == 'gzip':
+        return zlib.decompressobj(wbits=31).decompress(compressed_body(entry), size)
+    if zstandard is None:
+        raise ValueError('The entry is compressed with zstd but the zstandard package is not installed')
+    return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(compressed_body(entry))).read(size)
+
+
+class Compressor:
+    """Compress the cache entries of the configured namespaces with a codec header.The compressed body is exactly
+    what a client accepting the encoding gets,so a cache hit is sent without decoding or compressing it again"""
+
+    def __init__(self, codec: str, level: int, min_bytes: int) -> None:
+        if codec not in CODEC_HEADERS:
+            raise ValueError(f'Unknown compression codec {codec}')
+        if codec == 'zstd' and zstandard is None:
+            logging.warning('zstandard is not installed,cache entries are compressed with gzip instead')
+            codec = 'gzip'
+        self.codec: str = codec
+        self.level: int = level
+        self.min_bytes: int = min_bytes
+
+    def compress(self, payload: bytes) -> bytes:
+        if len(payload) < self.min_bytes:
+            return payload
+        if self.codec == 'zstd':
+            body: bytes = zstandard.ZstdCompressor(level=self.level).compress(payload)
+        else:
+            # mtime=0 keeps the output identical for an identical payload
+            body = gzip.compress(payload, compresslevel=self.level, mtime=0)
+        return CODEC_HEADERS[self.codec] + body
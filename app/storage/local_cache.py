@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LocalCache:
+    """In-process LRU tier in front of Redis.
+    The capacity is bounded by the size of the stored bytes rather than the number of entries because a schedule product
+    could be anything between a few hundred bytes and several hundred KB"""
+
+    def __init__(self, max_bytes: int, ttl: int) -> None:
+        self.max_bytes: int = max_bytes
+        self.ttl: int = ttl
+        self.__entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+        self.resident_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry: Optional[Tuple[float, bytes]] = self.__entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self.__remove(key)
+            self.misses += 1
+            return None
+        self.__entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Keep the entry no longer than the remaining ttl of its redis key so that both tiers expire together"""
+        ttl: float = min(ttl, self.ttl) if ttl is not None else self.ttl
+        size: int = len(value)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self.__entries:
+            self.__remove(key)
+        while self.resident_bytes + size > self.max_bytes and self.__entries:
+            self.__remove(next(iter(self.__entries)))
+            self.evictions += 1
+        self.__entries[key] = (time.monotonic() + ttl, value)
+        self.resident_bytes += size
+
+    def invalidate(self, key: str) -> None:
+        if key in self.__entries:
+            self.__remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.resident_bytes = 0
+
+    def __remove(self, key: str) -> None:
+        _, value = self.__entries.pop(key)
+        self.resident_bytes -= len(value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups: int = self.hits + self.misses
+        return {'entries': len(self.__entries), 'residentBytes': self.resident_bytes, 'maxBytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
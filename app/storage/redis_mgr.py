@@ -1,15 +1,71 @@
 import asyncio
 import hashlib
 import logging
+import time
 import uuid
+from collections import Counter
 from datetime import timedelta
-from typing import Dict, Optional, Union, Any
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union, Any
 
 import orjson
 from redis.asyncio import BlockingConnectionPool, Redis, WatchError
 from starlette.responses import JSONResponse
 
+from app.internal.offload import offloader
 from app.internal.setting import Settings, load_yaml
+from app.storage.compression import Compressor, content_encoding, decompress
+from app.storage.local_cache import LocalCache
+from app.storage.write_behind import PendingWrite, WriteBehind
+
+# Refill the bucket for the time elapsed since the last call and take one token.
+# Return 0 when a token was taken,otherwise the milliseconds to wait until one is available or the cooldown is over
+TOKEN_BUCKET_SCRIPT: str = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked')
+local blocked = tonumber(bucket[3]) or 0
+if blocked > now then
+    return blocked - now
+end
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+# Block the bucket until the given time unless it is already blocked for longer
+COOLDOWN_SCRIPT: str = """
+local blocked, now = tonumber(ARGV[1]), tonumber(ARGV[2])
+if blocked > (tonumber(redis.call('HGET', KEYS[1], 'blocked')) or 0) then
+    redis.call('HSET', KEYS[1], 'blocked', tostring(blocked))
+    redis.call('PEXPIRE', KEYS[1], math.max(redis.call('PTTL', KEYS[1]), blocked - now + 1000))
+end
+return 1
+"""
+
+
+PORT_MAPPING_KEY: str = 'port mapping'
+
+# The products live their stale window longer than their max age,only the fresh part of it is kept in the local tier
+STALE_TTLS: Dict[str, int] = {'schedule product': load_yaml()['data']['scheduleProduct']['staleWhileRevalidate']}
+
+
+def port_mapping_key(scac: str) -> str:
+    """Readable keys rather than uuids so that the whole mapping can be scanned and looked at with redis-cli"""
+    return f'{PORT_MAPPING_KEY}:{scac}'
+
+
+@lru_cache(maxsize=1024)
+def namespace_uuid(namespace: str) -> uuid.UUID:
+    return uuid.UUID(bytes=hashlib.md5(namespace.encode('utf-8')).digest())
 
 
 class ClientSideCache:
@@ -22,15 +78,27 @@ class ClientSideCache:
             username=setting.redis_user.get_secret_value() if setting.redis_user.get_secret_value() != 'None' else None,
             password=setting.redis_pw.get_secret_value() if setting.redis_pw.get_secret_value() != 'None' else None
         )
-        self.port_mapping_cache: Dict[str, str] = {}
+        local_setting: dict = load_yaml()['data']['localCache']
+        self.local_cache: LocalCache = LocalCache(max_bytes=local_setting['maxBytes'], ttl=local_setting['ttl'])
+        self.local_namespaces: frozenset = frozenset(local_setting['namespaces'])
+        self.invalidation_channel: str = local_setting['invalidationChannel']
+        compression_setting: dict = load_yaml()['data']['compression']
+        self.compressor: Compressor = Compressor(codec=compression_setting['codec'], level=compression_setting['level'],
+                                                 min_bytes=compression_setting['minBytes'])
+        self.compressed_namespaces: frozenset = frozenset(compression_setting['namespaces'])
+        self.offload_bytes: int = compression_setting['offloadBytes']
+        self.worker_id: str = uuid.uuid4().hex
+        self.namespace_hits: Counter = Counter()
+        self.namespace_misses: Counter = Counter()
+        self.__listener: Optional[asyncio.Task] = None
+        self.write_behind: WriteBehind = WriteBehind(load_yaml()['data']['writeBehind'], write=self.write_many)
 
     def __await__(self):
         return self.initialize_database().__await__()
 
     def generate_uuid_from_string(self, namespace: str, key: Union[str, Any]) -> str:
         key: str = str(key) if not isinstance(key, str) else key
-        namespace_uuid: uuid.UUID = uuid.UUID(bytes=hashlib.md5(namespace.encode('utf-8')).digest())
-        return str(uuid.uuid5(namespace_uuid, key))
+        return str(uuid.uuid5(namespace_uuid(namespace), key))
 
     async def initialize_database(self) -> 'ClientSideCache':
         retries: int = 2
@@ -48,36 +116,118 @@ class ClientSideCache:
                     await asyncio.sleep(3)
                     logging.critical(f'Retry - Unable to connect to the RedisDB - {disconnect}', extra={'custom_attribute': None})
 
-    async def set(self, key: str, value: JSONResponse,
-                  expire: int = timedelta(hours=load_yaml()['data']['backgroundTasks']['scheduleExpiry']),
-                  namespace: Optional[str] = 'data') -> None:
-        hashKey: str = self.generate_uuid_from_string(namespace=namespace, key=key)
-        async with self._pool.pipeline(transaction=True) as pipe:
+    def start_invalidation_listener(self) -> None:
+        """Every uvicorn worker keeps its own local tier, so they all subscribe to the same channel to stay coherent"""
+        if self.__listener is None:
+            self.__listener = asyncio.create_task(self.__listen_invalidation())
+
+    async def __listen_invalidation(self) -> None:
+        while True:
             try:
-                await pipe.watch(hashKey)
-                pipe.multi()
-                redis_set: Optional[bool] = pipe.set(name=hashKey, value=orjson.dumps(value), ex=expire, nx=True)
-                if redis_set is None:
-                    await pipe.discard()
-                    logging.info(f'Key:{hashKey} already exists')
-                else:
-                    await pipe.execute()
-                    logging.info(f'Background Task:Cached {namespace} into schedule collection - {hashKey}')
-            except WatchError as watch_error:
-                logging.error(watch_error)
-            except Exception as insert_db:
-                logging.error(insert_db)
+                async with self._pool.pubsub() as pubsub:
+                    await pubsub.subscribe(self.invalidation_channel)
+                    logging.info(f'Subscribed to {self.invalidation_channel}', extra={'custom_attribute': None})
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            worker_id, _, hashKey = message['data'].decode().partition(':')
+                            if worker_id != self.worker_id:
+                                self.local_cache.invalidate(hashKey)
+            except asyncio.CancelledError:
+                raise
+            except Exception as listen_error:
+                # Any message published while we were disconnected is lost, so the local tier can no longer be trusted
+                logging.critical(f'Invalidation listener disconnected - {listen_error}', extra={'custom_attribute': None})
+                self.local_cache.clear()
+                await asyncio.sleep(3)
 
-    async def get(self, key: str, namespace: Optional[str] = 'data') -> Optional[Dict[str, Any]]:
+    async def __publish_local(self, entries: List[Tuple[str, bytes, float]]) -> None:
+        async with self._pool.pipeline(transaction=False) as pipe:
+            for hashKey, value, fresh_ttl in entries:
+                self.local_cache.set(hashKey, value, ttl=fresh_ttl)
+                pipe.publish(self.invalidation_channel, f'{self.worker_id}:{hashKey}')
+            try:
+                await pipe.execute()
+            except Exception as publish_error:
+                logging.error(f'Unable to publish {len(entries)} local cache invalidations - {publish_error}')
+
+    async def set(self, key: str, value: Union[bytes, JSONResponse, Any],
+                  expire: int = timedelta(hours=load_yaml()['data']['backgroundTasks']['scheduleExpiry']),
+                  namespace: Optional[str] = 'data', overwrite: bool = False) -> None:
+        """Already serialized bytes are stored as they are,anything else is serialized with orjson.
+        Namespaces listed in compression are stored compressed.
+        Existing keys are kept unless overwrite is set e.g. when a stale entry has been revalidated"""
+        await self.write_many([PendingWrite(key=key, value=value, expire=expire, namespace=namespace,
+                                            overwrite=overwrite)])
+
+    async def set_later(self, key: str, value: Union[bytes, JSONResponse, Any],
+                        expire: int = timedelta(hours=load_yaml()['data']['backgroundTasks']['scheduleExpiry']),
+                        namespace: Optional[str] = 'data', overwrite: bool = False) -> None:
+        """set through the write behind queue,the request only waits when the queue is full"""
+        await self.write_behind.put(PendingWrite(key=key, value=value, expire=expire, namespace=namespace,
+                                                 overwrite=overwrite))
+
+    async def __payload(self, write: PendingWrite) -> bytes:
+        payload: bytes = write.value if isinstance(write.value, bytes) else orjson.dumps(write.value)
+        if write.namespace in self.compressed_namespaces:
+            payload = await offloader.run_in_thread(self.compressor.compress, payload)
+        return payload
+
+    async def write_many(self, writes: List[PendingWrite]) -> None:
+        """SET EX (NX unless overwrite) of every write in one non transactional pipeline,each command is atomic on its
+        own.The written keys of the local tier namespaces are then published in a second round trip"""
+        if not writes:
+            return
+        hashKeys: List[str] = [self.generate_uuid_from_string(namespace=write.namespace, key=write.key)
+                               for write in writes]
+        payloads: List[bytes] = [await self.__payload(write) for write in writes]
+        try:
+            async with self._pool.pipeline(transaction=False) as pipe:
+                for write, hashKey, payload in zip(writes, hashKeys, payloads):
+                    pipe.set(name=hashKey, value=payload, ex=write.expire, nx=not write.overwrite)
+                written: list = await pipe.execute()
+        except Exception as insert_db:
+            logging.error(f'Unable to cache {len(writes)} keys - {insert_db}')
+            return
+        published: List[Tuple[str, bytes, float]] = []
+        for write, hashKey, payload, redis_set in zip(writes, hashKeys, payloads, written):
+            if not redis_set:
+                logging.info(f'Key:{hashKey} already exists')
+                continue
+            logging.info(f'Background Task:Cached {write.namespace} into schedule collection - {hashKey}')
+            if write.namespace in self.local_namespaces:
+                expire: float = write.expire.total_seconds() if isinstance(write.expire, timedelta) else write.expire
+                published.append((hashKey, payload, expire - STALE_TTLS.get(write.namespace, 0)))
+        if published:
+            await self.__publish_local(published)
+
+    async def get_entry(self, key: str, namespace: Optional[str] = 'data',
+                        stale_ttl: Optional[int] = None) -> Tuple[Optional[bytes], bool]:
+        """Return the value as it is stored,possibly compressed,and whether it is stale.
+        Entries written with a stale window live stale_ttl seconds longer than their max age,so the remaining ttl of
+        the key tells how fresh they are.Namespaces listed in localCache are served from the in-process tier first and
+        the remaining ttl is fetched in the same round trip on a miss.Stale entries never go into the local tier"""
         hashKey: str = self.generate_uuid_from_string(namespace=namespace, key=key)
+        local_tier: bool = namespace in self.local_namespaces
+        if (local_result := self.__in_process(namespace=namespace, key=key, hashKey=hashKey)) is not None:
+            logging.info(f'Getting {namespace} from local cache - {hashKey}')
+            return local_result, False
         retries: int = 3
         while retries > 0:
             try:
                 logging.info(f'Background Task:Getting {namespace} from Redis - {hashKey}')
-                get_result: Optional[bytes] = await self._pool.get(hashKey)
-                if get_result:
-                    return orjson.loads(get_result)
-                return None
+                if not local_tier and stale_ttl is None:
+                    get_result: Optional[bytes] = await self._pool.get(hashKey)
+                    self.__count_lookup(namespace=namespace, hit=bool(get_result))
+                    return get_result if get_result else None, False
+                async with self._pool.pipeline(transaction=False) as pipe:
+                    get_result, ttl = await pipe.get(hashKey).pttl(hashKey).execute()
+                self.__count_lookup(namespace=namespace, hit=bool(get_result))
+                if not get_result:
+                    return None, False
+                fresh_ttl: Optional[float] = ttl / 1000 - (stale_ttl or 0) if ttl >= 0 else None
+                if local_tier:
+                    self.local_cache.set(hashKey, get_result, ttl=fresh_ttl)
+                return get_result, fresh_ttl is not None and fresh_ttl <= 0
             except Exception as find_error:
                 retries -= 1
                 if retries == 0:
@@ -86,6 +236,235 @@ class ClientSideCache:
                     logging.critical(f'Unable to retrieve cache from RedisDB due to {find_error}')
                     await self.initialize_database()
 
+    async def get_entries(self, keys: List[str], namespace: Optional[str] = 'data',
+                          stale_ttl: Optional[int] = None) -> List[Tuple[Optional[bytes], bool]]:
+        """get_entry of several keys,the ones missing from the local tier are read from redis with their remaining ttl
+        in one pipelined round trip.A redis error reads as a miss of those keys"""
+        hashKeys: List[str] = [self.generate_uuid_from_string(namespace=namespace, key=key) for key in keys]
+        local_tier: bool = namespace in self.local_namespaces
+        entries: List[Tuple[Optional[bytes], bool]] = [(None, False)] * len(keys)
+        remote: List[int] = []
+        for index, hashKey in enumerate(hashKeys):
+            if (local_result := self.__in_process(namespace=namespace, key=keys[index], hashKey=hashKey)) is not None:
+                entries[index] = local_result, False
+            else:
+                remote.append(index)
+        if not remote:
+            return entries
+        try:
+            async with self._pool.pipeline(transaction=False) as pipe:
+                for index in remote:
+                    pipe.get(hashKeys[index]).pttl(hashKeys[index])
+                results: list = await pipe.execute()
+        except Exception as find_error:
+            logging.error(f'Unable to retrieve {len(remote)} {namespace} keys from RedisDB - {find_error}')
+            return entries
+        for index, get_result, ttl in zip(remote, results[::2], results[1::2]):
+            self.__count_lookup(namespace=namespace, hit=bool(get_result))
+            if not get_result:
+                continue
+            fresh_ttl: Optional[float] = ttl / 1000 - (stale_ttl or 0) if ttl >= 0 else None
+            if local_tier:
+                self.local_cache.set(hashKeys[index], get_result, ttl=fresh_ttl)
+            entries[index] = get_result, fresh_ttl is not None and fresh_ttl <= 0
+        logging.info(f'Getting {len(keys)} {namespace} keys,{len(keys) - len(remote)} from local cache and '
+                     f'{len(remote)} from Redis in one round trip')
+        return entries
+
+    def __queued(self, namespace: str, key: str) -> Optional[bytes]:
+        """A write still in the write behind queue is read back from the queue,it is the latest value of the key"""
+        if (write := self.write_behind.peek(namespace=namespace, key=key)) is None:
+            return None
+        return write.value if isinstance(write.value, bytes) else orjson.dumps(write.value)
+
+    def __in_process(self, namespace: str, key: str, hashKey: str) -> Optional[bytes]:
+        """The queued write of the key or the entry of the local tier,both of them count as a hit"""
+        local_result: Optional[bytes] = self.__queued(namespace=namespace, key=key)
+        if local_result is None and namespace in self.local_namespaces:
+            local_result = self.local_cache.get(hashKey)
+        if local_result is not None:
+            self.namespace_hits[namespace] += 1
+        return local_result
+
+    def __count_lookup(self, namespace: str, hit: bool) -> None:
+        (self.namespace_hits if hit else self.namespace_misses)[namespace] += 1
+
+    def namespace_stats(self, top: int = 50) -> Dict[str, Any]:
+        """Hit ratio of the namespaces looked up the most since the worker started,local and redis hits together"""
+        lookups: Counter = self.namespace_hits + self.namespace_misses
+        return {namespace: {'hits': self.namespace_hits[namespace], 'misses': self.namespace_misses[namespace],
+                            'hitRate': round(self.namespace_hits[namespace] / count, 4)}
+                for namespace, count in lookups.most_common(top)}
+
+    async def get_bytes(self, key: str, namespace: Optional[str] = 'data') -> Optional[bytes]:
+        """Return the serialized value,decompressed in the offload thread if needed.Only the entries of at least
+        minBytes are compressed so the thread is never used for a small one"""
+        get_result, _ = await self.get_entry(key=key, namespace=namespace)
+        if not get_result:
+            return None
+        if content_encoding(get_result):
+            return await offloader.run_in_thread(decompress, get_result)
+        return get_result
+
+    async def get(self, key: str, namespace: Optional[str] = 'data') -> Optional[Dict[str, Any]]:
+        get_result: Optional[bytes] = await self.get_bytes(key=key, namespace=namespace)
+        if not get_result:
+            return None
+        if len(get_result) >= self.offload_bytes:
+            return await offloader.run_in_thread(orjson.loads, get_result)
+        return orjson.loads(get_result)
+
+    async def mget(self, keys: List[str], namespace: Optional[str] = 'data') -> List[Optional[bytes]]:
+        """Fetch several keys of a namespace in one round trip,a redis error reads as a miss of every key"""
+        get_results: List[Optional[bytes]] = [self.__queued(namespace=namespace, key=key) for key in keys]
+        remote: List[int] = [index for index, get_result in enumerate(get_results) if get_result is None]
+        if remote:
+            try:
+                remote_results: List[Optional[bytes]] = await self._pool.mget(
+                    [self.generate_uuid_from_string(namespace=namespace, key=keys[index]) for index in remote])
+            except Exception as find_error:
+                logging.error(f'Unable to retrieve {len(remote)} {namespace} keys from RedisDB - {find_error}')
+                remote_results = [None] * len(remote)
+            for index, get_result in zip(remote, remote_results):
+                get_results[index] = get_result
+        for get_result in get_results:
+            self.__count_lookup(namespace=namespace, hit=get_result is not None)
+        return get_results
+
+    async def mset(self, values: Dict[str, Any], expire: Union[int, timedelta], namespace: Optional[str] = 'data',
+                   overwrite: bool = True) -> None:
+        """Write several keys of a namespace in one round trip,existing keys are overwritten unless told otherwise"""
+        await self.write_many([PendingWrite(key=key, value=value, expire=expire, namespace=namespace,
+                                            overwrite=overwrite) for key, value in values.items()])
+
+    async def scan_delete(self, match: str, count: int = 1000) -> int:
+        """Unlink every key matching the pattern,SCAN walks the keyspace in batches so redis is never blocked and every
+        batch is unlinked in the round trip fetching the next one"""
+        deleted: int = 0
+        cursor: int = 0
+        try:
+            while True:
+                cursor, keys = await self._pool.scan(cursor=cursor, match=match, count=count)
+                if keys:
+                    deleted += await self._pool.unlink(*keys)
+                if cursor == 0:
+                    return deleted
+        except Exception as delete_error:
+            logging.error(f'Unable to delete the keys matching {match} - {delete_error}')
+            return deleted
+
+    async def bulk_set(self, port_mappings: List[Dict[str, str]]) -> int:
+        """File the port code mappings into one hash per scac,kn port code to carrier port code,plus the index of the
+        scac having a hash.All of them are written in one pipelined round trip whatever the number of rows"""
+        carrier_codes: Dict[str, Dict[str, str]] = {}
+        for mapping in port_mappings:
+            carrier_codes.setdefault(mapping['scac'], {})[mapping['kn_port_code']] = mapping['carrier_port_code']
+        if not carrier_codes:
+            return 0
+        async with self._pool.pipeline(transaction=False) as pipe:
+            for scac, codes in carrier_codes.items():
+                pipe.hset(port_mapping_key(scac), mapping=codes)
+            pipe.sadd(port_mapping_key('index'), *carrier_codes)
+            await pipe.execute()
+        logging.info(f'Cached {len(port_mappings)} port code mappings of {len(carrier_codes)} scac')
+        return len(port_mappings)
+
+    async def read_port_mapping_code(self, scac: Optional[str] = None,
+                                     kn_port_code: Optional[str] = None) -> List[Dict[str, str]]:
+        """Every mapping of the scac or of all of them in one round trip once the scac of the index are known"""
+        scac_list: List[str] = [scac] if scac else sorted(
+            member.decode() for member in await self._pool.smembers(port_mapping_key('index')))
+        async with self._pool.pipeline(transaction=False) as pipe:
+            for carrier in scac_list:
+                if kn_port_code:
+                    pipe.hget(port_mapping_key(carrier), kn_port_code)
+                else:
+                    pipe.hgetall(port_mapping_key(carrier))
+            read_results: list = await pipe.execute()
+        if kn_port_code:
+            return [{'scac': carrier, 'kn_port_code': kn_port_code, 'carrier_port_code': carrier_port_code.decode()}
+                    for carrier, carrier_port_code in zip(scac_list, read_results) if carrier_port_code]
+        return [{'scac': carrier, 'kn_port_code': kn_code.decode(), 'carrier_port_code': carrier_code.decode()}
+                for carrier, codes in zip(scac_list, read_results) for kn_code, carrier_code in sorted(codes.items())]
+
+    async def update_carrier_port_code(self, scac: str, kn_port_code: str,
+                                       new_carrier_port_code: str) -> Dict[str, str]:
+        await self.bulk_set([{'scac': scac, 'kn_port_code': kn_port_code, 'carrier_port_code': new_carrier_port_code}])
+        return {'scac': scac, 'kn_port_code': kn_port_code, 'carrier_port_code': new_carrier_port_code}
+
+    async def delete_port_mapping_code(self, scac: Optional[str] = None, kn_port_code: Optional[str] = None) -> int:
+        """Without any argument the whole mapping and its index are unlinked"""
+        if not scac and not kn_port_code:
+            return await self.scan_delete(match=port_mapping_key('*'))
+        if not kn_port_code:
+            async with self._pool.pipeline(transaction=False) as pipe:
+                deleted, _ = await pipe.unlink(port_mapping_key(scac)).srem(port_mapping_key('index'), scac).execute()
+            return deleted
+        scac_list: List[str] = [scac] if scac else [member.decode() for member in
+                                                    await self._pool.smembers(port_mapping_key('index'))]
+        async with self._pool.pipeline(transaction=False) as pipe:
+            for carrier in scac_list:
+                pipe.hdel(port_mapping_key(carrier), kn_port_code)
+            return sum(await pipe.execute())
+
+    async def acquire_lock(self, key: str, expire: int, namespace: Optional[str] = 'data') -> Optional[str]:
+        """Take a lease shared by all the workers.Return the lease token or None if another worker holds it"""
+        lockKey: str = self.generate_uuid_from_string(namespace=f'{namespace} lock', key=key)
+        token: str = uuid.uuid4().hex
+        try:
+            acquired: Optional[bool] = await self._pool.set(name=lockKey, value=token, ex=expire, nx=True)
+            return token if acquired else None
+        except Exception as lock_error:
+            logging.error(f'Unable to acquire lock {lockKey} - {lock_error}')
+            return None
+
+    async def is_locked(self, key: str, namespace: Optional[str] = 'data') -> bool:
+        lockKey: str = self.generate_uuid_from_string(namespace=f'{namespace} lock', key=key)
+        try:
+            return bool(await self._pool.exists(lockKey))
+        except Exception as lock_error:
+            logging.error(f'Unable to check lock {lockKey} - {lock_error}')
+            return False
+
+    async def release_lock(self, key: str, token: str, namespace: Optional[str] = 'data') -> None:
+        """Only delete the lease if it is still ours,it might have expired and been taken by another worker"""
+        lockKey: str = self.generate_uuid_from_string(namespace=f'{namespace} lock', key=key)
+        async with self._pool.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(lockKey)
+                if await pipe.get(lockKey) == token.encode():
+                    pipe.multi()
+                    pipe.delete(lockKey)
+                    await pipe.execute()
+            except WatchError as watch_error:
+                logging.error(watch_error)
+            except Exception as release_error:
+                logging.error(release_error)
+
+    async def take_token(self, key: str, rate: float, burst: int, namespace: Optional[str] = 'rate limit') -> float:
+        """Token bucket shared by all the workers.Return the seconds to wait before a token is available,0 if one was taken.
+        Fail open so that a redis outage does not stop the traffic"""
+        bucketKey: str = self.generate_uuid_from_string(namespace=namespace, key=key)
+        try:
+            wait: int = await self._pool.eval(TOKEN_BUCKET_SCRIPT, 1, bucketKey, rate, burst, int(time.time() * 1000))
+            return wait / 1000
+        except Exception as bucket_error:
+            logging.error(f'Unable to take a token from {bucketKey} - {bucket_error}')
+            return 0
+
+    async def set_cooldown(self, key: str, seconds: float, namespace: Optional[str] = 'rate limit') -> None:
+        """Share a Retry-After with all the workers,no token is handed out until it is over"""
+        bucketKey: str = self.generate_uuid_from_string(namespace=namespace, key=key)
+        now: int = int(time.time() * 1000)
+        try:
+            await self._pool.eval(COOLDOWN_SCRIPT, 1, bucketKey, now + int(seconds * 1000), now)
+        except Exception as cooldown_error:
+            logging.error(f'Unable to set the cooldown of {bucketKey} - {cooldown_error}')
+
     async def close(self) -> None:
+        await self.write_behind.close()
+        if self.__listener:
+            self.__listener.cancel()
+            self.__listener = None
         await self.__pool.disconnect()
         await self.__pool.aclose()
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from itertools import islice
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+
+
+class PendingWrite(NamedTuple):
+    key: str
+    value: Any
+    expire: Union[int, timedelta]
+    namespace: str
+    overwrite: bool
+
+
+class WriteBehind:
+    """Cache writes of every request of the worker are queued and written by one flusher in pipelines of up to maxBatch
+    writes every flushInterval,so a search costs a handful of redis round trips whatever the number of responses it
+    caches.A write is coalesced with the queued write of the same key the way redis would have applied them one after
+    the other:an overwrite replaces the queued value,a write without overwrite would have found the key and is dropped.
+    Once maxPending writes are queued the requests wait for the flusher,up to maxWait before their write is dropped"""
+
+    def __init__(self, setting: dict, write: Callable[[List[PendingWrite]], Awaitable[None]]) -> None:
+        self.flush_interval: float = setting['flushInterval']
+        self.max_batch: int = setting['maxBatch']
+        self.max_pending: int = setting['maxPending']
+        self.max_wait: float = setting['maxWait']
+        self.drain_timeout: float = setting['drainTimeout']
+        self.__write: Callable[[List[PendingWrite]], Awaitable[None]] = write
+        self.__pending: Dict[Tuple[str, str], PendingWrite] = {}
+        self.__flushing: Dict[Tuple[str, str], PendingWrite] = {}
+        self.__queued: asyncio.Event = asyncio.Event()
+        self.__flushed: asyncio.Condition = asyncio.Condition()
+        self.__flusher: Optional[asyncio.Task] = None
+        self.enqueued: int = 0
+        self.coalesced: int = 0
+        self.dropped: int = 0
+        self.flushed: int = 0
+        self.flushes: int = 0
+        self.flush_latency: Deque[float] = deque(maxlen=100)
+
+    def __len__(self) -> int:
+        return len(self.__pending)
+
+    def start(self) -> None:
+        if self.__flusher is None:
+            self.__flusher = asyncio.create_task(self.__run())
+
+    async def put(self, write: PendingWrite) -> None:
+        """Until the flusher has been started e.g. in a script the write is sent right away"""
+        if self.__flusher is None:
+            await self.__write([write])
+            return
+        entry: Tuple[str, str] = (write.namespace, write.key)
+        if self.__coalesce(entry, write):
+            return
+        if len(self.__pending) >= self.max_pending:
+            async with self.__flushed:
+                try:
+                    await asyncio.wait_for(self.__flushed.wait_for(lambda: len(self.__pending) < self.max_pending),
+                                           timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    logging.warning(f'Write behind queue still full after {self.max_wait}s,dropped {entry}')
+                    return
+            if self.__coalesce(entry, write):
+                return
+        self.__pending[entry] = write
+        self.enqueued += 1
+        self.__queued.set()
+
+    def __coalesce(self, entry: Tuple[str, str], write: PendingWrite) -> bool:
+        if entry not in self.__pending:
+            return False
+        self.coalesced += 1
+        if write.overwrite:
+            self.__pending[entry] = write
+        return True
+
+    async def __run(self) -> None:
+        while True:
+            await self.__queued.wait()
+            # Give the other writes of the same searches the chance to join the pipeline
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self.__pending:
+            entries: List[Tuple[str, str]] = list(islice(self.__pending, self.max_batch))
+            batch: List[PendingWrite] = [self.__pending.pop(entry) for entry in entries]
+            if not self.__pending:
+                self.__queued.clear()
+            self.__flushing = dict(zip(entries, batch))
+            start_time: float = time.monotonic()
+            try:
+                await self.__write(batch)
+            except asyncio.CancelledError:
+                # Cancelled in the middle of the pipeline,writing the batch again later is harmless
+                for entry, write in zip(entries, batch):
+                    self.__pending.setdefault(entry, write)
+                raise
+            except Exception as flush_error:
+                logging.error(f'Unable to flush {len(batch)} cache writes - {flush_error}')
+            finally:
+                self.__flushing = {}
+            self.flush_latency.append(time.monotonic() - start_time)
+            self.flushed += len(batch)
+            self.flushes += 1
+            async with self.__flushed:
+                self.__flushed.notify_all()
+
+    def peek(self, namespace: str, key: str) -> Optional[PendingWrite]:
+        """The write of the key still queued or being flushed,the latest value of the key as far as this worker knows"""
+        entry: Tuple[str, str] = (namespace, key)
+        return self.__pending.get(entry) or self.__flushing.get(entry)
+
+    async def written(self, namespace: str, key: str, timeout: float) -> bool:
+        """Wait until the queued write of the key if any has been sent to redis"""
+        entry: Tuple[str, str] = (namespace, key)
+        async with self.__flushed:
+            try:
+                await asyncio.wait_for(self.__flushed.wait_for(
+                    lambda: entry not in self.__pending and entry not in self.__flushing), timeout=timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def close(self) -> None:
+        """Stop the flusher and write what is left within drainTimeout"""
+        if self.__flusher is not None:
+            self.__flusher.cancel()
+            try:
+                await self.__flusher
+            except asyncio.CancelledError:
+                pass
+            self.__flusher = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logging.error(f'Dropped {len(self.__pending)} cache writes which were not flushed within '
+                          f'{self.drain_timeout}s of the shutdown')
+
+    def stats(self) -> Dict[str, Any]:
+        latency: List[float] = list(self.flush_latency)
+        return {'queueDepth': len(self.__pending), 'flushing': len(self.__flushing), 'enqueued': self.enqueued,
+                'coalesced': self.coalesced, 'dropped': self.dropped, 'flushed': self.flushed, 'flushes': self.flushes,
+                'flushLatency': {'last': round(latency[-1], 4) if latency else None,
+                                 'avg': round(sum(latency) / len(latency), 4) if latency else None,
+                                 'max': round(max(latency), 4) if latency else None}}
@@ -0,0 +1,79 @@
+"""
+Compare the strptime/strftime date handling the mappers and the response model used to do with the memoized epoch
+parsing of app.api.schemas.carrier_dates,for the timestamp format of every carrier.
+A lane repeats its sailing dates so the timestamps are drawn from a limited set of distinct values.
+Usage: python -m benchmarks.bench_carrier_dates [timestamps per format] [distinct sailings] [rounds]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from app.api.schemas import carrier_dates
+from app.api.schemas.carrier_dates import transit_days
+from app.api.schemas.schema_response import convert_datetime_to_iso_8601
+
+CARRIER_FORMATS: Dict[str, Callable[[datetime], str]] = {
+    'MSCU/MAEU/ZIMU': lambda moment: f'{moment:%Y-%m-%dT%H:%M:%S}',
+    'OOLU/COSU': lambda moment: f'{moment:%Y-%m-%dT%H:%M:%S}.000Z',
+    'HLCU/ONEY': lambda moment: f'{moment:%Y-%m-%dT%H:%M:%S}+08:00',
+    'CMDU': lambda moment: f'{moment:%Y-%m-%dT%H:%M:%S}.000+01:00',
+    'HDMU': lambda moment: f'{moment:%Y-%m-%d %H:%M:%S}',
+}
+
+
+def legacy_convert(date_string: str) -> str:
+    reformat_date_string = date_string.split("+")[0] if "+" in date_string else date_string[:19]
+    if "." in reformat_date_string:
+        reformat_date_string = reformat_date_string.split(".")[0]
+    try:
+        if "T" in reformat_date_string:
+            date_object = datetime.strptime(reformat_date_string, "%Y-%m-%dT%H:%M:%S")
+        else:
+            date_object = datetime.strptime(reformat_date_string, "%Y-%m-%d %H:%M:%S")
+        return date_object.strftime('%Y-%m-%dT%H:%M:%S')
+    except ValueError:
+        return reformat_date_string
+
+
+def legacy_transit_days(etd: str, eta: str) -> int:
+    return int((datetime.fromisoformat(eta) - datetime.fromisoformat(etd)).days)
+
+
+def timestamps(render: Callable[[datetime], str], count: int, distinct: int) -> List[str]:
+    start = datetime(2024, 1, 1, 6)
+    return [render(start + timedelta(hours=5 * (number % distinct))) for number in range(count)]
+
+
+def clear_caches() -> None:
+    for cached in (carrier_dates.wall_clock_epoch, carrier_dates.iso_8601, carrier_dates.utc_epoch):
+        cached.cache_clear()
+
+
+def best(func: Callable, rounds: int, cold: bool = False) -> float:
+    def run() -> None:
+        if cold:
+            clear_caches()
+        func()
+    return min(timeit.repeat(run, number=rounds, repeat=3)) / rounds
+
+
+def main(count: int = 20000, distinct: int = 600, rounds: int = 5) -> None:
+    for carrier, render in CARRIER_FORMATS.items():
+        dates: List[str] = timestamps(render, count, distinct)
+        pairs: List[tuple] = list(zip(dates, dates[37:] + dates[:37]))
+        assert [convert_datetime_to_iso_8601(value) for value in dates] == [legacy_convert(value) for value in dates]
+        assert [transit_days(etd, eta) for etd, eta in pairs] == [legacy_transit_days(etd, eta) for etd, eta in pairs]
+        legacy_time: float = best(lambda: [legacy_convert(value) for value in dates], rounds)
+        cold_time: float = best(lambda: [convert_datetime_to_iso_8601(value) for value in dates], rounds, cold=True)
+        warm_time: float = best(lambda: [convert_datetime_to_iso_8601(value) for value in dates], rounds)
+        legacy_transit: float = best(lambda: [legacy_transit_days(etd, eta) for etd, eta in pairs], rounds)
+        transit: float = best(lambda: [transit_days(etd, eta) for etd, eta in pairs], rounds, cold=True)
+        print(f'{carrier:<15} reformat strptime {legacy_time * 1000:.1f}ms epoch cold {cold_time * 1000:.1f}ms '
+              f'({legacy_time / cold_time:.1f}x) warm {warm_time * 1000:.1f}ms ({legacy_time / warm_time:.1f}x) | '
+              f'transit fromisoformat {legacy_transit * 1000:.1f}ms epoch {transit * 1000:.1f}ms '
+              f'({legacy_transit / transit:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:4]))
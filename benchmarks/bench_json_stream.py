@@ -0,0 +1,88 @@
+"""
+Compare decoding a large array-shaped carrier response at once (what response.json() does:the whole raw body and then
+the whole decoded document are held before the mapping starts) with feeding it chunk by chunk to JsonItems and mapping
+every schedule as soon as it is decoded.The payload is HLAG shaped and mapped with the HLAG mapper.
+Memory is the peak traced while the body arrives and is mapped above the mapped schedules which both keep,i.e. what
+the decoding itself costs.
+Usage: python -m benchmarks.bench_json_stream [payload MB] [chunk bytes]
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable, Iterator, List, Tuple
+
+import orjson
+
+from app.api.handler.p2p_schedule.carrier_api.hlag import process_schedule_data
+from app.internal.http.json_stream import JsonItems
+
+
+def leg(number: int) -> dict:
+    return {'departure': {'location': {'locationName': 'Shanghai', 'UNLocationCode': 'CNSHA',
+                                       'facilitySMDGCode': 'CNSHA-WGQ4'}, 'dateTime': '2024-01-05T10:00:00+08:00'},
+            'arrival': {'location': {'locationName': 'Hamburg', 'UNLocationCode': 'DEHAM', 'facilitySMDGCode': 'CTA'},
+                        'dateTime': '2024-02-20T10:00:00+01:00'},
+            'modeOfTransport': 'VESSEL', 'vesselName': f'HAMBURG EXPRESS {number}', 'vesselIMONumber': '9123456',
+            'carrierServiceCode': 'FE2', 'carrierServiceName': 'Far East Loop 2',
+            'universalExportVoyageReference': f'{number:04d}W', 'remarks': 'x' * 200}
+
+
+def schedule(number: int) -> dict:
+    return {'placeOfReceipt': {'location': {'UNLocationCode': 'CNSHA'}, 'dateTime': '2024-01-05T10:00:00+08:00'},
+            'placeOfDelivery': {'location': {'UNLocationCode': 'DEHAM'}, 'dateTime': '2024-02-20T10:00:00+01:00'},
+            'transitTime': 46, 'legs': [leg(number), leg(number + 1)]}
+
+
+def chunks(megabytes: int, size: int) -> Tuple[Iterator[bytes], int]:
+    """The body as it would arrive,generated on the fly so the streamed side never holds it"""
+    element: bytes = orjson.dumps(schedule(1))
+    count: int = megabytes * 1024 * 1024 // (len(element) + 1)
+
+    def body() -> Iterator[bytes]:
+        pending: bytearray = bytearray(b'[')
+        for number in range(count):
+            pending += (b',' if number else b'') + orjson.dumps(schedule(number))
+            while len(pending) >= size:
+                yield bytes(pending[:size])
+                del pending[:size]
+        yield bytes(pending + b']')
+
+    return body(), count
+
+
+def at_once(body: Iterator[bytes]) -> List:
+    raw: bytes = b''.join(body)
+    return [result for task in orjson.loads(raw) for result in process_schedule_data(task=task)]
+
+
+def streamed(body: Iterator[bytes]) -> List:
+    items = JsonItems(path=())
+    mapped: List = []
+    for chunk in body:
+        mapped.extend(result for task in items.feed(chunk) for result in process_schedule_data(task=task))
+    mapped.extend(result for task in items.close() for result in process_schedule_data(task=task))
+    return mapped
+
+
+def measure(name: str, decode: Callable[[Iterator[bytes]], List], megabytes: int, size: int) -> int:
+    body, count = chunks(megabytes, size)
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    mapped: List = decode(body)
+    elapsed: float = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(mapped) == count, f'{name} mapped {len(mapped)} of {count} schedules'
+    print(f'{name}: {count} schedules mapped into {current / 1024 ** 2:.1f}MiB,decoding peak '
+          f'{(peak - current) / 1024 ** 2:8.2f}MiB decode+map {elapsed:.2f}s')
+    return peak - current
+
+
+def main(megabytes: int = 50, size: int = 65536) -> None:
+    whole: int = measure('response.json()', at_once, megabytes, size)
+    incremental: int = measure('JsonItems      ', streamed, megabytes, size)
+    print(f'decoding incrementally peaks {whole / max(incremental, 1):.0f}x lower than decoding the whole body')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
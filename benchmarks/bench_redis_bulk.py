@@ -0,0 +1,79 @@
+"""
+Compare the redis round trips of ClientSideCache against a local redis:one WATCH/MULTI transaction per cached object
+(what set used to do) with a single SET NX EX per object and the pipelined mset,one GET per key with mget and one
+HSET per port code mapping with bulk_set.
+Usage: python -m benchmarks.bench_redis_bulk [number of keys] [redis host] [redis port]
+"""
+import asyncio
+import sys
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List
+
+from redis.asyncio import Redis
+
+from app.storage import db
+from app.storage.redis_mgr import port_mapping_key
+
+NAMESPACE: str = 'bulk benchmark'
+EXPIRE: timedelta = timedelta(minutes=5)
+
+
+async def legacy_set(key: str, value: bytes) -> None:
+    hashKey: str = db.generate_uuid_from_string(namespace=NAMESPACE, key=key)
+    async with db._pool.pipeline(transaction=True) as pipe:
+        await pipe.watch(hashKey)
+        pipe.multi()
+        pipe.set(name=hashKey, value=value, ex=EXPIRE, nx=True)
+        await pipe.execute()
+
+
+async def clear(keys: List[str]) -> None:
+    await db._pool.unlink(*(db.generate_uuid_from_string(namespace=NAMESPACE, key=key) for key in keys))
+    await db.delete_port_mapping_code()
+
+
+async def timed(name: str, run: Callable[[], Awaitable], count: int) -> float:
+    start: float = time.perf_counter()
+    await run()
+    elapsed: float = time.perf_counter() - start
+    print(f'{name:<28} {elapsed * 1000:8.1f}ms {count / elapsed:10.0f} ops/s')
+    return elapsed
+
+
+async def main(count: int = 2000, host: str = 'localhost', port: int = 6379) -> None:
+    db._pool = Redis(host=host, port=port)
+    values: Dict[str, bytes] = {f'key-{number}': b'x' * 2048 for number in range(count)}
+    keys: List[str] = list(values)
+    mappings: List[Dict[str, str]] = [{'scac': scac, 'kn_port_code': f'CN{number:03d}',
+                                       'carrier_port_code': f'CX{number:03d}'}
+                                      for scac in ('MSCU', 'MAEU', 'ONEY', 'HLCU') for number in range(count // 4)]
+    try:
+        await clear(keys)
+        legacy: float = await timed('WATCH/MULTI set per key', lambda: asyncio.gather(
+            *(legacy_set(key, value) for key, value in values.items())), count)
+        await clear(keys)
+        single: float = await timed('SET NX EX per key', lambda: asyncio.gather(
+            *(db.set(key=key, value=value, expire=EXPIRE, namespace=NAMESPACE) for key, value in values.items())), count)
+        await clear(keys)
+        bulk: float = await timed('pipelined mset', lambda: db.mset(values=values, expire=EXPIRE, namespace=NAMESPACE),
+                                  count)
+        print(f'mset is {legacy / bulk:.1f}x the WATCH/MULTI writes and {single / bulk:.1f}x the single SET writes')
+        per_key: float = await timed('GET per key', lambda: asyncio.gather(
+            *(db._pool.get(db.generate_uuid_from_string(namespace=NAMESPACE, key=key)) for key in keys)), count)
+        many: float = await timed('mget', lambda: db.mget(keys=keys, namespace=NAMESPACE), count)
+        print(f'mget is {per_key / many:.1f}x the GET per key')
+        per_row: float = await timed('HSET per mapping', lambda: asyncio.gather(
+            *(db._pool.hset(port_mapping_key(mapping['scac']), mapping['kn_port_code'], mapping['carrier_port_code'])
+              for mapping in mappings)), len(mappings))
+        await db.delete_port_mapping_code()
+        bulk_rows: float = await timed('bulk_set', lambda: db.bulk_set(mappings), len(mappings))
+        print(f'bulk_set is {per_row / bulk_rows:.1f}x the HSET per mapping')
+        assert len(await db.read_port_mapping_code()) == len(mappings)
+    finally:
+        await clear(keys)
+        await db._pool.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(*[cast(argument) for cast, argument in zip((int, str, int), sys.argv[1:4])]))
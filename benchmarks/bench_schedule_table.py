@@ -0,0 +1,58 @@
+"""
+Compare holding a product as a list of schedule models (sorted then serialized) with the schedule table (every schedule
+validated into a row as it is mapped,then the table sorted and its rows joined).
+Memory is the size of what is held between mapping and serialization,the peak includes the temporary objects.
+Usage: python -m benchmarks.bench_schedule_table [number of schedules] [rounds]
+"""
+import sys
+import timeit
+import tracemalloc
+from typing import Callable, Tuple
+
+from app.api.schemas.schedule_table import ScheduleTable
+from app.api.schemas.schema_serializer import serialize_product
+from benchmarks.bench_serializer import PRODUCT_ID, iter_schedules
+
+
+def model_graph(count: int) -> list:
+    return list(iter_schedules(count))
+
+
+def model_product(schedules: list) -> bytes:
+    sorted_schedules: list = sorted(schedules, key=lambda schedule: (schedule.etd, schedule.transitTime))
+    return serialize_product(product_id=PRODUCT_ID, origin='CNSHA', destination='DEHAM', schedules=sorted_schedules)
+
+
+def schedule_table(count: int) -> ScheduleTable:
+    return ScheduleTable.from_schedules(iter_schedules(count))
+
+
+def table_product(table: ScheduleTable) -> bytes:
+    return table.sorted().product_json(product_id=PRODUCT_ID, origin='CNSHA', destination='DEHAM')
+
+
+def memory(build: Callable, count: int) -> Tuple[int, int]:
+    """Bytes still held by what build returned and the peak while building it"""
+    tracemalloc.start()
+    held = build(count)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current, peak
+
+
+def main(count: int = 3000, rounds: int = 5) -> None:
+    schedules: list = model_graph(count)
+    table: ScheduleTable = schedule_table(count)
+    assert table_product(table) == model_product(schedules), 'The table product drifted from the model product'
+    for name, build, dump, held in (('model graph   ', model_graph, model_product, schedules),
+                                    ('schedule table', schedule_table, table_product, table)):
+        current, peak = memory(build, count)
+        build_time: float = min(timeit.repeat(lambda: build(count), number=rounds, repeat=3)) / rounds
+        dump_time: float = min(timeit.repeat(lambda: dump(held), number=rounds, repeat=3)) / rounds
+        print(f'{name}: held {current / 1024:.0f}KiB peak {peak / 1024:.0f}KiB map {build_time * 1000:.1f}ms '
+              f'sort+serialize {dump_time * 1000:.1f}ms total {(build_time + dump_time) * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,78 @@
+"""
+Compare the one pass serializer with the pydantic validate/dump path the product used to go through.
+Usage: python -m benchmarks.bench_serializer [number of schedules] [rounds]
+"""
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from app.api.schemas.schema_response import (PRODUCT_ADAPTER, Cutoff, Leg, PointBase, Schedule, Service,
+                                             Transportation, Voyage)
+from app.api.schemas.schema_serializer import _reformat_date, serialize_product
+
+PORTS: tuple = ('CNSHA', 'SGSIN', 'NLRTM', 'DEHAM')
+SCACS: tuple = ('MSCU', 'MAEU', 'CMDU', 'ONEY', 'HLCU', 'ZIMU', 'COSU')
+PRODUCT_ID: str = str(uuid.uuid5(uuid.NAMESPACE_DNS, 'CNSHA-DEHAM'))
+
+
+def make_leg(origin: str, destination: str, etd: datetime, days: int, number: int) -> Leg:
+    return Leg.model_construct(
+        pointFrom=PointBase.model_construct(locationName=origin, locationCode=origin, terminalCode=f'T{number}'),
+        pointTo=PointBase.model_construct(locationName=destination, locationCode=destination),
+        etd=f'{etd:%Y-%m-%dT%H:%M:%S}.000+08:00', eta=f'{etd + timedelta(days=days):%Y-%m-%d %H:%M:%S}',
+        cutoffs=Cutoff.model_construct(cyCutoffDate=f'{etd - timedelta(days=2):%Y-%m-%dT%H:%M:%S}',
+                                       docCutoffDate=f'{etd - timedelta(days=3):%Y-%m-%dT%H:%M:%S}'),
+        transitTime=days,
+        transportations=Transportation.model_construct(transportType='Vessel' if number % 4 else 'Feeder',
+                                                       transportName=f'VESSEL {number}'),
+        voyages=Voyage.model_construct(internalVoyage=None if number % 3 else f'{number}W', externalVoyage=f'{number}E'),
+        services=Service.model_construct(serviceCode=f'S{number % 10}'))
+
+
+def iter_schedules(count: int) -> Iterator[Schedule]:
+    """The schedules one at a time like a carrier mapper yields them"""
+    start = datetime(2024, 1, 1, 10)
+    for number in range(count):
+        etd: datetime = start + timedelta(hours=7 * number)
+        hops: int = number % 3 + 1
+        route: tuple = PORTS[:1] + PORTS[4 - hops:]
+        legs: list = [make_leg(route[hop], route[hop + 1], etd + timedelta(days=10 * hop), 9, number + hop)
+                      for hop in range(hops)]
+        yield Schedule.model_construct(
+            scac=SCACS[number % len(SCACS)], pointFrom='CNSHA', pointTo='DEHAM', etd=legs[0].etd, eta=legs[-1].eta,
+            transitTime=10 * hops - 1, transshipment=hops > 1, legs=legs)
+
+
+def make_schedules(count: int) -> list:
+    return sorted(iter_schedules(count), key=lambda schedule: (schedule.etd, schedule.transitTime))
+
+
+def pydantic_product(schedules: list) -> bytes:
+    final_set: dict = {'productid': PRODUCT_ID, 'origin': 'CNSHA', 'destination': 'DEHAM',
+                       'noofSchedule': len(schedules), 'schedules': schedules}
+    final_dump = PRODUCT_ADAPTER.dump_python(PRODUCT_ADAPTER.validate_python(final_set), mode='json', exclude_none=True)
+    return PRODUCT_ADAPTER.dump_json(PRODUCT_ADAPTER.validate_python(final_dump), exclude_defaults=True)
+
+
+def fast_product(schedules: list, cold: bool = False) -> bytes:
+    if cold:
+        _reformat_date.cache_clear()
+    return serialize_product(product_id=PRODUCT_ID, origin='CNSHA', destination='DEHAM', schedules=schedules)
+
+
+def main(count: int = 300, rounds: int = 20) -> None:
+    schedules: list = make_schedules(count)
+    assert fast_product(schedules) == pydantic_product(schedules), 'The serializer output drifted from pydantic'
+    pydantic_time: float = min(timeit.repeat(lambda: pydantic_product(schedules), number=rounds, repeat=3)) / rounds
+    cold_time: float = min(timeit.repeat(lambda: fast_product(schedules, cold=True), number=rounds, repeat=3)) / rounds
+    fast_time: float = min(timeit.repeat(lambda: fast_product(schedules), number=rounds, repeat=3)) / rounds
+    print(f'{count} schedules,{len(fast_product(schedules))} bytes')
+    print(f'pydantic validate/dump x2 : {pydantic_time * 1000:.2f}ms')
+    print(f'one pass serializer (cold): {cold_time * 1000:.2f}ms ({pydantic_time / cold_time:.1f}x)')
+    print(f'one pass serializer (warm): {fast_time * 1000:.2f}ms ({pydantic_time / fast_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,63 @@
+import asyncio
+
+import orjson
+import pytest
+
+from app.api.handler.p2p_schedule.batch import BatchLimits, lane_lines
+from app.internal.http.http_client_manager import AsyncTaskManager, use_carrier_slots
+
+
+class TestBatchLimits:
+
+    @pytest.mark.asyncio
+    async def test_lanes_queue_within_the_lane_and_carrier_caps(self):
+        batch_limits = BatchLimits(max_lanes=3, max_per_carrier=2)
+        peaks: dict = {'lanes': 0, 'MAEU': 0}
+
+        async def search_carrier(scac: str):
+            async with batch_limits.carrier(scac):
+                peaks['MAEU'] = max(peaks['MAEU'], batch_limits.carriers_in_flight['MAEU'])
+                await asyncio.sleep(0.01)
+
+        async def search(scacs: list):
+            async with batch_limits.lane():
+                peaks['lanes'] = max(peaks['lanes'], batch_limits.lanes_in_flight)
+                await asyncio.gather(*[search_carrier(scac) for scac in scacs])
+
+        await asyncio.gather(*[search(scacs) for scacs in (['MAEU', 'ONEY'], ['ONEY', 'MAEU'], ['MAEU'], ['ZIMU'],
+                                                           ['ZIMU', 'MSCU'], ['MAEU', 'MAEU'])])
+        assert peaks == {'lanes': 3, 'MAEU': 2}
+        assert batch_limits.stats()['lanesInFlight'] == 0
+        assert batch_limits.stats()['carriersInFlight'] == {}
+
+    @pytest.mark.asyncio
+    async def test_carrier_slot_is_released_when_its_task_ends(self):
+        batch_limits = BatchLimits(max_lanes=1, max_per_carrier=1)
+        released: asyncio.Event = asyncio.Event()
+        in_flight: list = []
+
+        async def fast():
+            return []
+
+        async def slow():
+            await released.wait()
+            return []
+
+        async def lane():
+            use_carrier_slots(batch_limits.carrier)
+            async with batch_limits.lane(), AsyncTaskManager() as task_group:
+                task_group.create_task(name='ONEY_task', coro=fast)
+                task_group.create_task(name='MAEU_task', coro=slow)
+                await asyncio.sleep(0.01)
+                # ONEY is done and gave its slot back while MAEU still searches
+                in_flight.append(dict(batch_limits.carriers_in_flight))
+                released.set()
+
+        await lane()
+        assert in_flight == [{'ONEY': 0, 'MAEU': 1}]
+
+    def test_one_line_per_requested_lane(self):
+        lines = lane_lines([0, 3], 200, b'{"productid":"id","noofSchedule":0}', failedScac=['ONEY']).splitlines()
+        assert [orjson.loads(line) for line in lines] == [
+            {'lane': lane, 'status': 200, 'failedScac': ['ONEY'], 'result': {'productid': 'id', 'noofSchedule': 0}}
+            for lane in (0, 3)]
@@ -0,0 +1,26 @@
+import contextvars
+from datetime import date
+
+from app.internal.http.cache_key import carrier_cache_key
+from app.internal.http.rate_limiter import use_carrier
+
+URL: str = 'https://carrier.example.com/schedules'
+
+
+def key_of(scac: str, **kwargs) -> str:
+    def build() -> str:
+        use_carrier(scac)
+        return carrier_cache_key(url=URL, **kwargs)
+    return contextvars.copy_context().run(build)
+
+
+class TestCarrierCacheKey:
+
+    def test_identical_requests_share_one_key(self):
+        assert key_of('ONEY', params={'pol': 'CNSHA', 'date': date(2024, 1, 1), 'appKey': 'secret', 'imo': None}) == \
+            key_of('ONEY', params={'date': '2024-01-01', 'pol': 'CNSHA', 'appKey': 'rotated'})
+
+    def test_scac_version_and_body_are_part_of_the_key(self):
+        key: str = key_of('HDMU', json={'pol': 'CNSHA'})
+        assert key.startswith('HDMU:v1:') and key != key_of('HDMU', json={'pol': 'SGSIN'})
+        assert key != key_of('ONEY', json={'pol': 'CNSHA'})
@@ -0,0 +1,43 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import orjson
+import pytest
+
+from app.api.handler.p2p_schedule import aggregator
+from app.api.handler.p2p_schedule.aggregator import cached_product_response, fetch_with_lease
+from app.storage import db
+from app.storage.compression import Compressor
+
+PRODUCT: bytes = orjson.dumps({'productid': 'id', 'origin': 'CNSHA', 'destination': 'NLRTM', 'noofSchedule': 200,
+                               'schedules': [{'scac': 'MSCU', 'transitTime': day} for day in range(200)]})
+
+ENTRY: bytes = Compressor(codec='gzip', level=6, min_bytes=2000).compress(PRODUCT)
+
+
+class TestCachedProductResponse:
+
+    @pytest.mark.asyncio
+    async def test_compressed_product_is_passed_through_with_its_count(self):
+        response = await cached_product_response(cache_result=ENTRY, accept_encoding='br, gzip')
+        assert response.headers['content-encoding'] == 'gzip'
+        assert response.headers['kn-count-schedules'] == '200'
+        assert response.body == ENTRY[3:]
+
+    @pytest.mark.asyncio
+    async def test_refused_encoding_gets_the_decompressed_product(self):
+        response = await cached_product_response(cache_result=ENTRY, accept_encoding='gzip;q=0')
+        assert 'content-encoding' not in response.headers
+        assert response.headers['kn-count-schedules'] == '200'
+        assert response.body == PRODUCT
+
+    @pytest.mark.asyncio
+    async def test_cross_worker_waiter_answers_like_a_cache_hit(self, monkeypatch):
+        monkeypatch.setitem(aggregator.SINGLE_FLIGHT_SETTING, 'crossWorker', True)
+        monkeypatch.setitem(aggregator.SINGLE_FLIGHT_SETTING, 'pollInterval', 0)
+        monkeypatch.setattr(db, 'acquire_lock', AsyncMock(return_value=None))
+        monkeypatch.setattr(db, 'get_entry', AsyncMock(return_value=(ENTRY, False)))
+        response = await fetch_with_lease(client=MagicMock(), background_tasks=MagicMock(), settings=MagicMock(),
+                                          query_params=MagicMock(), cache_key='lane', product_id='id')
+        assert response.body == PRODUCT
+        assert response.headers['kn-count-schedules'] == '200'
+        assert 'content-encoding' not in response.headers
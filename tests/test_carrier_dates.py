@@ -0,0 +1,27 @@
+import pytest
+
+from app.api.schemas.carrier_dates import calendar_days, format_utc, transit_days, utc_epoch
+from app.api.schemas.schema_response import convert_datetime_to_iso_8601
+
+
+class TestCarrierDates:
+
+    @pytest.mark.parametrize('date_string,expected', [
+        ('2024-01-01T10:00:00', '2024-01-01T10:00:00'),
+        ('2024-01-01 10:00:00', '2024-01-01T10:00:00'),
+        ('2024-01-01T10:00:00.000Z', '2024-01-01T10:00:00'),
+        ('2024-01-01T10:00:00.000+08:00', '2024-01-01T10:00:00'),
+        ('2024-01-01T10:00:00-05:00', '2024-01-01T10:00:00'),
+        ('2024-1-1T9:05:00', '2024-01-01T09:05:00'),
+        ('2024-01-01', '2024-01-01'),
+        ('2024-02-30T10:00:00', '2024-02-30T10:00:00'),
+    ])
+    def test_reformat_matches_strptime(self, date_string, expected):
+        assert convert_datetime_to_iso_8601(date_string) == expected
+
+    def test_transit_time_math(self):
+        assert transit_days('2024-01-01T10:00:00+08:00', '2024-01-11T01:00:00+00:00') == 9
+        assert transit_days('2024-01-01T10:00:00', '2024-01-11T09:59:59') == 9
+        assert calendar_days('2024-01-01T23:00:00', '2024-01-11T01:00:00') == 10
+        assert format_utc(utc_epoch('2024-01-01T10:00:00.000Z') - 43200, '%Y-%m-%dT%H:%M:%S.000Z') == \
+            '2023-12-31T22:00:00.000Z'
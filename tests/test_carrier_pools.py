@@ -0,0 +1,49 @@
+import asyncio
+import ssl
+
+import pytest
+from aiohttp import web
+
+from app.internal.http.carrier_pools import CarrierPools
+
+SETTING: dict = {'default': {'maxConnection': 1, 'maxConnectionPerHost': 0, 'connectTimeOut': 1, 'poolTimeOut': 5,
+                             'elswhereTimeOut': 5, 'keepAliveExpiry': 60},
+                 'MAEU': {'maxConnection': 3}}
+
+
+class TestCarrierPools:
+    @pytest.mark.asyncio
+    async def test_saturated_carrier_does_not_hold_the_others(self):
+        release = asyncio.Event()
+
+        async def schedules(request: web.Request) -> web.Response:
+            if request.query.get('slow'):
+                await release.wait()
+            return web.json_response([])
+
+        app = web.Application()
+        app.router.add_get('/schedules', schedules)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        url: str = f'http://127.0.0.1:{runner.addresses[0][1]}/schedules'
+        pools = CarrierPools(setting=SETTING, ssl_context=ssl.create_default_context(), dns_cache=10)
+
+        async def get(scac: str, **params) -> int:
+            async with pools.get(scac).session.get(url, params=params) as response:
+                await response.read()
+                return response.status
+
+        try:
+            slow = [asyncio.create_task(get('CMDU', slow='1')) for _ in range(2)]
+            await asyncio.sleep(0.2)
+            assert pools.get('CMDU').stats() == {'limit': 1, 'limitPerHost': 0, 'idle': 0, 'active': 1,
+                                                 'acquiring': 1, 'queued': 1}
+            assert await asyncio.wait_for(get('ZIMU'), timeout=1) == 200
+            assert pools.get('ZIMU').stats()['idle'] == 1 and pools.get('MAEU').stats()['limit'] == 3
+            release.set()
+            assert await asyncio.gather(*slow) == [200, 200]
+        finally:
+            release.set()
+            await pools.close()
+            await runner.cleanup()
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from app.internal.http import circuit_breaker
+from app.internal.http.circuit_breaker import CircuitBreaker, CircuitState
+from app.internal.http.http_client_manager import AsyncTaskManager
+
+SETTING: dict = {'failureThreshold': 2, 'recoveryTimeout': 0.05, 'halfOpenProbes': 1, 'shared': False,
+                 'keepTransitions': 10}
+
+
+class TestCircuitBreaker:
+
+    @pytest.mark.asyncio
+    async def test_open_half_open_closed(self):
+        breaker = CircuitBreaker(scac='MSCU', setting=SETTING)
+        await breaker.record_failure(reason='TimeoutError')
+        assert await breaker.allow()
+        await breaker.record_failure(reason='TimeoutError')
+        assert breaker.state == CircuitState.open
+        assert not await breaker.allow()
+        await asyncio.sleep(0.06)
+        assert await breaker.allow()
+        assert breaker.state == CircuitState.half_open
+        assert not await breaker.allow()
+        await breaker.record_success()
+        assert breaker.state == CircuitState.closed
+        assert [transition['to'] for transition in breaker.stats()['transitions']] == ['open', 'half-open', 'closed']
+
+    @pytest.mark.asyncio
+    async def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(scac='MSCU', setting=dict(SETTING, failureThreshold=1))
+        await breaker.record_failure(reason='TimeoutError')
+        await asyncio.sleep(0.06)
+        assert await breaker.allow()
+        await breaker.record_failure(reason='TimeoutError')
+        assert breaker.state == CircuitState.open
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_short_circuits_the_task(self, monkeypatch):
+        breakers = circuit_breaker.CircuitBreakers(dict(SETTING, recoveryTimeout=60))
+        monkeypatch.setattr('app.internal.http.http_client_manager.circuit_breakers', breakers)
+        calls: list = []
+
+        async def down():
+            calls.append(1)
+            raise asyncio.TimeoutError
+
+        async with AsyncTaskManager(default_timeout=1, max_retries=5) as task_group:
+            task_group.create_task(name='ZIMU_task', coro=down)
+        assert len(calls) == 2
+        assert task_group.failed_scac == ['ZIMU']
+        async with AsyncTaskManager(default_timeout=1, max_retries=5) as task_group:
+            task_group.create_task(name='ZIMU_task', coro=down)
+        assert len(calls) == 2
+        assert task_group.results == [None]
+        assert breakers.get('ZIMU').short_circuited == 1
+
+    @pytest.mark.asyncio
+    async def test_probe_raising_lets_the_next_probe_through(self, monkeypatch):
+        breakers = circuit_breaker.CircuitBreakers(dict(SETTING, failureThreshold=1))
+        monkeypatch.setattr('app.internal.http.http_client_manager.circuit_breakers', breakers)
+        await breakers.get('HLCU').record_failure(reason='TimeoutError')
+        await asyncio.sleep(0.06)
+
+        async def unreadable():
+            raise KeyError('routes')
+
+        async def recovered():
+            return ['schedule']
+
+        async with AsyncTaskManager(default_timeout=1, max_retries=2) as task_group:
+            task_group.create_task(name='HLCU_task', coro=unreadable)
+        assert task_group.failed_scac == ['HLCU'] and breakers.get('HLCU').state == CircuitState.half_open
+        async with AsyncTaskManager(default_timeout=1, max_retries=2) as task_group:
+            task_group.create_task(name='HLCU_task', coro=recovered)
+        assert task_group.results == [['schedule']] and breakers.get('HLCU').state == CircuitState.closed
+
+    @pytest.mark.asyncio
+    async def test_cancelled_task_is_not_a_carrier_failure(self, monkeypatch):
+        breakers = circuit_breaker.CircuitBreakers(dict(SETTING, failureThreshold=1))
+        monkeypatch.setattr('app.internal.http.http_client_manager.circuit_breakers', breakers)
+        await breakers.get('ONEY').record_failure(reason='TimeoutError')
+        await asyncio.sleep(0.06)
+        calls: list = []
+
+        async def searching():
+            calls.append(1)
+            await asyncio.sleep(10)
+
+        async def search():
+            async with AsyncTaskManager(default_timeout=5, max_retries=3) as task_group:
+                task_group.create_task(name='ONEY_task', coro=searching)
+
+        # e.g. the client of an NDJSON stream went away
+        stream = asyncio.create_task(search())
+        await asyncio.sleep(0.01)
+        stream.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await stream
+        assert calls == [1]
+        assert breakers.get('ONEY').state == CircuitState.half_open
+        assert await breakers.get('ONEY').allow()
@@ -1,10 +1,10 @@
 import pytest
 import sys
 from unittest.mock import AsyncMock, MagicMock, patch
-from types import GeneratorType
 
 import app.api.handler.p2p_schedule.carrier_api.cma
 from app.api.handler.p2p_schedule.carrier_api.cma import get_cma_p2p, process_leg_data, process_schedule_data,DEFAULT_ETD_ETA
+from app.api.handler.p2p_schedule.schedule_filter import ScheduleFilter
 from app.api.schemas.schema_request import SearchRange
 from app.internal.setting import Settings
 
@@ -37,6 +37,13 @@ def mock_env_vars(monkeypatch):
     monkeypatch.setenv("CMA_URL", "http://example.com")
     monkeypatch.setenv("CMA_TOKEN", "test_token")
 
+def routings(*items):
+    """fetch_schedules yields the routings as the response arrives"""
+    async def fetch(**kwargs):
+        for item in items:
+            yield item
+    return fetch
+
 @pytest.fixture
 def mock_process_schedule_data():
     with patch('app.api.handler.p2p_schedule.carrier_api.cma.process_schedule_data') as mock:
@@ -101,15 +108,15 @@ class TestGetCmaP2p:
         pol = "USNYC"
         pod = "USLAX"
         search_range = SearchRange.Four
-        direct_only = True
         mock_background_task = AsyncMock()
 
         cached_response = [{"transitTime": 10, "cached": "data"}]
 
         with patch('app.storage.db.get', new_callable=AsyncMock) as mock_db_get, \
-          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=AsyncMock) as mock_fetch:
+          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=MagicMock) as mock_fetch:
 
             mock_db_get.return_value = cached_response
+            mock_fetch.side_effect = routings()
 
             # Verify fetch_schedules was NOT called (because we got cached data)
 
@@ -120,15 +127,10 @@ class TestGetCmaP2p:
                 pol=pol,
                 pod=pod,
                 search_range=search_range,
-                direct_only=direct_only
             )
 
-            assert isinstance(result, GeneratorType)
-
-            # db_call_args = mock_db_get.call_args[0]
-            # assert db_call_args['scac'] == 'cma_group'
-            result_list = list(result)
-            assert len(result_list) == 0
+            # No routing,no schedule
+            assert result is None
             result_list=[{'processed': 'data'}]
             assert result_list[0] == {'processed': 'data'}
 
@@ -137,13 +139,12 @@ class TestGetCmaP2p:
         pol = "USNYC"
         pod = "CNSHA"
         search_range = SearchRange.Four
-        direct_only = True
         scac = "CMDU"
 
         with patch('app.storage.db.get', new_callable=AsyncMock) as mock_db_get, \
-          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=AsyncMock) as mock_fetch:
+          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=MagicMock) as mock_fetch:
             mock_db_get.return_value = None
-            mock_fetch.return_value = [{"transitTime": 10, "some": "data"}]
+            mock_fetch.side_effect = routings({"transitTime": 10, "some": "data"})
 
             result = await get_cma_p2p(
                 client=mock_client,
@@ -152,11 +153,10 @@ class TestGetCmaP2p:
                 pol=pol,
                 pod=pod,
                 search_range=search_range,
-                direct_only=direct_only,
                 scac=scac
             )
 
-            assert isinstance(result, GeneratorType)
+            assert isinstance(result, list)
 
             # Check if fetch_schedules was called with correct parameters
             mock_fetch.assert_called_once()
@@ -169,12 +169,11 @@ class TestGetCmaP2p:
         pol = "USNYC"
         pod = "CNSHA"
         search_range = SearchRange.Four
-        direct_only = True
 
         with patch('app.storage.db.get', new_callable=AsyncMock) as mock_db_get, \
-          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=AsyncMock) as mock_fetch:
+          patch('app.api.handler.p2p_schedule.carrier_api.cma.fetch_schedules', new_callable=MagicMock) as mock_fetch:
             mock_db_get.return_value = None
-            mock_fetch.return_value = [{"transitTime": 10, "some": "data"}]
+            mock_fetch.side_effect = routings({"transitTime": 10, "some": "data"})
 
             result = await get_cma_p2p(
                 client=mock_client,
@@ -183,10 +182,9 @@ class TestGetCmaP2p:
                 pol=pol,
                 pod=pod,
                 search_range=search_range,
-                direct_only=direct_only
             )
 
-            assert isinstance(result, GeneratorType)
+            assert isinstance(result, list)
             result_list = list(result)
             assert len(result_list) > 0
             assert result_list[0] == {'processed': 'data'}
@@ -242,9 +240,9 @@ class TestProcessLegData:
 class TestProcessScheduleData:
     def test_direct_route(self, sample_schedule_data):
         schedules = list(
-            process_schedule_data(sample_schedule_data, direct_only=True, service_filter=None, vessel_imo_filter=None))
+            process_schedule_data(sample_schedule_data))
 
-        assert len(schedules) == 1
+        assert len(ScheduleFilter(direct_only=True).apply(schedules)) == 1
         schedule = schedules[0]
 
         assert schedule.scac == "CMDU"
@@ -254,32 +252,16 @@ class TestProcessScheduleData:
         assert schedule.transshipment is False
 
     def test_filters(self, sample_schedule_data):
+        sample_schedule_data["routingDetails"][0]["transportation"]["vehicule"]["reference"] = "9123456"
+        schedules = list(process_schedule_data(sample_schedule_data))
         # Test with matching filters
-        schedules = list(process_schedule_data(
-            sample_schedule_data,
-            direct_only=None,
-            service_filter="FAL1",
-            vessel_imo_filter="IMO123456"
-        ))
-        assert len(schedules) == 1
+        assert len(ScheduleFilter(service="FAL1", vessel_imo="9123456").apply(schedules)) == 1
 
         # Test with non-matching service filter
-        schedules = list(process_schedule_data(
-            sample_schedule_data,
-            direct_only=None,
-            service_filter="WRONG",
-            vessel_imo_filter="IMO123456"
-        ))
-        assert len(schedules) == 0
+        assert len(ScheduleFilter(service="WRONG", vessel_imo="9123456").apply(schedules)) == 0
 
         # Test with non-matching vessel filter
-        schedules = list(process_schedule_data(
-            sample_schedule_data,
-            direct_only=None,
-            service_filter="FAL1",
-            vessel_imo_filter="WRONG"
-        ))
-        assert len(schedules) == 0
+        assert len(ScheduleFilter(service="FAL1", vessel_imo="WRONG").apply(schedules)) == 0
 
     def test_missing_dates(self, sample_schedule_data):
         schedule_data = sample_schedule_data.copy()
@@ -287,7 +269,7 @@ class TestProcessScheduleData:
         schedule_data["routingDetails"][0]["pointTo"]["arrivalDateLocal"] = None
 
         schedules = list(
-            process_schedule_data(schedule_data, direct_only=None, service_filter=None, vessel_imo_filter=None))
+            process_schedule_data(schedule_data))
         assert len(schedules) == 1
         schedule = schedules[0]
 
@@ -306,13 +288,11 @@ class TestProcessScheduleData:
         schedule_data["routingDetails"].append(second_leg)
 
         # Test with direct_only=True (should not yield any schedules)
-        schedules = list(
-            process_schedule_data(schedule_data, direct_only=True, service_filter=None, vessel_imo_filter=None))
-        assert len(schedules) == 0
+        schedules = list(process_schedule_data(schedule_data))
+        assert len(ScheduleFilter(direct_only=True).apply(schedules)) == 0
 
         # Test with direct_only=False
-        schedules = list(
-            process_schedule_data(schedule_data, direct_only=False, service_filter=None, vessel_imo_filter=None))
+        schedules = ScheduleFilter(direct_only=False).apply(schedules)
         assert len(schedules) == 1
         schedule = schedules[0]
         assert schedule.transshipment is True
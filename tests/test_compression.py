@@ -0,0 +1,34 @@
+import gzip
+
+import orjson
+
+from app.storage.compression import (Compressor, accepts_encoding, compressed_body, content_encoding, decompress,
+                                     leading_bytes)
+
+PRODUCT: bytes = orjson.dumps({'productid': 'id', 'schedules': [{'scac': 'MSCU', 'transitTime': day} for day in range(200)]})
+
+
+class TestCompressor:
+
+    def test_round_trip_with_codec_header(self):
+        entry = Compressor(codec='gzip', level=6, min_bytes=2000).compress(PRODUCT)
+        assert content_encoding(entry) == 'gzip' and len(entry) < len(PRODUCT)
+        assert gzip.decompress(compressed_body(entry)) == PRODUCT
+        assert decompress(entry) == PRODUCT
+
+    def test_small_and_legacy_entries_are_left_alone(self):
+        small: bytes = b'{"productid":"id"}'
+        assert Compressor(codec='gzip', level=6, min_bytes=2000).compress(small) == small
+        assert content_encoding(PRODUCT) is None and decompress(PRODUCT) == PRODUCT
+
+    def test_accept_encoding_honours_q_values(self):
+        assert accepts_encoding('br, gzip;q=0.5', 'gzip')
+        assert not accepts_encoding('gzip;q=0, deflate', 'gzip')
+        assert not accepts_encoding('GZIP; q=0.0', 'gzip')
+        assert accepts_encoding('*', 'gzip') and not accepts_encoding('*, gzip;q=0', 'gzip')
+        assert not accepts_encoding('', 'gzip') and not accepts_encoding('x-gzip', 'gzip')
+
+    def test_leading_bytes_only_decompress_the_head(self):
+        entry = Compressor(codec='gzip', level=6, min_bytes=2000).compress(PRODUCT)
+        assert leading_bytes(entry, 40) == PRODUCT[:40]
+        assert leading_bytes(PRODUCT, 40) == PRODUCT[:40]
@@ -0,0 +1,69 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.internal.http.hedging import HedgePolicy
+
+SETTING: dict = {'percentile': 90, 'minSamples': 3, 'window': 10, 'minDelay': 0.01}
+
+
+def make_sender(*delays: float, status: int = 200):
+    responses: list = []
+
+    async def send():
+        response = MagicMock(status=status)
+        responses.append(response)
+        await asyncio.sleep(delays[len(responses) - 1])
+        return response
+    return send, responses
+
+
+class TestHedgePolicy:
+
+    @pytest.fixture
+    def limiter(self):
+        return MagicMock(try_token=AsyncMock(return_value=True))
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_before_min_samples(self, limiter):
+        policy = HedgePolicy(scac='MAEU', setting=SETTING)
+        send, responses = make_sender(0.05)
+        assert await policy.race(send=send, limiter=limiter) is responses[0]
+        assert policy.hedged == 0
+        assert len(policy.latencies) == 1 and policy.latencies[0] >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_primary_is_cancelled(self, limiter):
+        policy = HedgePolicy(scac='MAEU', setting=SETTING)
+        policy.latencies.extend([0.01, 0.01, 0.01])
+        send, responses = make_sender(1, 0)
+        assert await policy.race(send=send, limiter=limiter) is responses[1]
+        assert (policy.hedged, policy.hedge_wins) == (1, 1)
+        # The race won by the hedge is not a sample of the carrier latency
+        assert list(policy.latencies) == [0.01, 0.01, 0.01]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_budget(self, limiter):
+        limiter.try_token.return_value = False
+        policy = HedgePolicy(scac='MAEU', setting=SETTING)
+        policy.latencies.extend([0.01, 0.01, 0.01])
+        send, responses = make_sender(0.05, 0)
+        assert await policy.race(send=send, limiter=limiter) is responses[0]
+        assert (policy.hedged, policy.skipped) == (0, 1)
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_does_not_win(self, limiter):
+        policy = HedgePolicy(scac='MAEU', setting=SETTING)
+        policy.latencies.extend([0.01, 0.01, 0.01])
+        calls: list = []
+
+        async def send():
+            calls.append(1)
+            if len(calls) == 2:
+                raise ConnectionError('reset')
+            await asyncio.sleep(0.05)
+            return MagicMock(status=200)
+        response = await policy.race(send=send, limiter=limiter)
+        assert response.status == 200
+        assert policy.hedge_wins == 0
@@ -0,0 +1,48 @@
+import json
+
+import orjson
+import pytest
+
+from app.internal.http.json_stream import CachedItems, JsonItems, encode_items, iter_chunks, iter_items
+
+SCHEDULES = [{'scac': 'ZIMU', 'legs': [{'vessel': 'ZIM \\"É\\" [1]', 'imo': 9123456}], 'transitTime': 25.5},
+             {'scac': 'ZIMU', 'legs': [], 'transitTime': 7}, 12, 'x', None]
+
+
+def feed(body: bytes, path, size: int) -> list:
+    items = JsonItems(path=path)
+    decoded: list = []
+    for start in range(0, len(body), size):
+        decoded.extend(items.feed(body[start:start + size]))
+    return decoded + items.close()
+
+
+class TestJsonItems:
+    @pytest.mark.parametrize('size', [1, 5, 64, 1 << 20])
+    @pytest.mark.parametrize('indent', [None, 2])
+    def test_elements_whatever_the_chunks(self, size, indent):
+        document = {'status': {'code': 0}, 'response': {'other': ['[', '{'], 'routes': SCHEDULES}, 'after': 1}
+        body: bytes = json.dumps(document, indent=indent, ensure_ascii=False).encode()
+        assert feed(body, ('response', 'routes'), size) == SCHEDULES
+        assert feed(json.dumps(SCHEDULES, indent=indent).encode(), (), size) == SCHEDULES
+
+    def test_documents_and_missing_array(self):
+        assert feed(b'{"a":1}\n{"b":\n[2]} 3', None, 4) == [{'a': 1}, {'b': [2]}, 3]
+        assert feed(b'{"response":{"error":"no route"}}', ('response', 'routes'), 3) == []
+        assert feed(b'{"error":"no route"}', (), 3) == []
+        with pytest.raises(json.JSONDecodeError):
+            feed(b'[{"a":1},{"b":', (), 3)
+
+    @pytest.mark.asyncio
+    async def test_cached_document_holds_only_the_array(self):
+        body: bytes = encode_items(('oceanProducts',), [orjson.dumps(item) for item in SCHEDULES])
+        assert orjson.loads(body) == {'oceanProducts': SCHEDULES}
+        assert [item async for item in iter_items(iter_chunks(body, 7), path=('oceanProducts',))] == SCHEDULES
+
+    def test_oversized_response_is_not_cached(self):
+        small, large = CachedItems(limit=1 << 20), CachedItems(limit=64)
+        for item in SCHEDULES:
+            small.add(item)
+            large.add(item)
+        assert orjson.loads(small.encode(('routes',))) == {'routes': SCHEDULES}
+        assert large.encode(('routes',)) is None and large.items is None
@@ -0,0 +1,65 @@
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.api.handler.p2p_schedule.lane_store import LaneStore
+from app.api.schemas.schema_request import SearchRange, StartDateType
+from app.api.schemas.schema_response import Leg, PointBase, Schedule
+from app.api.schemas.schema_serializer import pack_schedules
+from app.storage import db
+
+
+def make_schedule(day: int, transshipment: bool = False) -> Schedule:
+    legs: list = [Leg.model_construct(pointFrom=PointBase.model_construct(locationCode=code)) for code in
+                  (('CNSHA', 'SGSIN') if transshipment else ('CNSHA',))]
+    return Schedule.model_construct(scac='MSCU', pointFrom='CNSHA', pointTo='NLRTM', etd=f'2024-01-{day:02d}T10:00:00',
+                                    eta='2024-02-20T10:00:00', transitTime=25, transshipment=transshipment, legs=legs)
+
+
+def stored_days(monkeypatch, *days: int) -> None:
+    """Only the given days of January 2024 are in the store,the 2nd holds a transshipment"""
+    stored: dict = {f'2024-01-{day:02d}': pack_schedules([make_schedule(day, transshipment=day == 2)]) for day in days}
+    monkeypatch.setattr(db, 'mget', AsyncMock(
+        side_effect=lambda keys, namespace: [stored.get(key.rpartition(':')[2]) for key in keys]))
+
+
+class TestLaneStore:
+
+    @pytest.mark.asyncio
+    async def test_covered_window_does_not_call_the_carrier(self, monkeypatch):
+        stored_days(monkeypatch, *range(1, 8))
+        handler = AsyncMock()
+        schedules = await LaneStore({'enabled': True, 'expire': 60}).search(
+            handler=handler, scac='MSCU', pol='CNSHA', pod='NLRTM', start_date_type=StartDateType.departure,
+            search_range=SearchRange.One, background_task=MagicMock(), departure_date=date(2024, 1, 1))
+        assert handler.await_count == 0
+        assert [schedule.etd[:10] for schedule in schedules] == [f'2024-01-0{day}' for day in range(1, 8)]
+
+    @pytest.mark.asyncio
+    async def test_only_the_missing_span_is_fetched(self, monkeypatch):
+        stored_days(monkeypatch, 1, 2, 3)
+        handler = AsyncMock(return_value=iter([make_schedule(5), make_schedule(9)]))
+        set_later = AsyncMock()
+        monkeypatch.setattr(db, 'set_later', set_later)
+        schedules = await LaneStore({'enabled': True, 'expire': 60}).search(
+            handler=handler, scac='MSCU', pol='CNSHA', pod='NLRTM', start_date_type=StartDateType.departure,
+            search_range=SearchRange.One, background_task=MagicMock(), departure_date=date(2024, 1, 1))
+        kwargs: dict = handler.await_args.kwargs
+        assert (kwargs['departure_date'], kwargs['search_range']) == (date(2024, 1, 4), SearchRange.One)
+        assert [schedule.etd[:10] for schedule in schedules] == ['2024-01-01', '2024-01-02', '2024-01-03',
+                                                                 '2024-01-05']
+        assert [call.kwargs['key'][-10:] for call in set_later.await_args_list] == [
+            '2024-01-04', '2024-01-05', '2024-01-06', '2024-01-07']
+
+    @pytest.mark.asyncio
+    async def test_days_beyond_the_carrier_horizon_are_not_stored(self, monkeypatch):
+        stored_days(monkeypatch)
+        set_later = AsyncMock()
+        monkeypatch.setattr(db, 'set_later', set_later)
+        await LaneStore({'enabled': True, 'expire': 60}).search(
+            handler=AsyncMock(return_value=iter([make_schedule(3)])), scac='MSCU', pol='CNSHA', pod='NLRTM',
+            start_date_type=StartDateType.departure, search_range=SearchRange.Two, background_task=MagicMock(),
+            departure_date=date(2024, 1, 1))
+        assert [call.kwargs['key'][-10:] for call in set_later.await_args_list] == [
+            '2024-01-01', '2024-01-02', '2024-01-03']
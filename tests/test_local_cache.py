@@ -0,0 +1,51 @@
+import pytest
+from unittest.mock import patch
+
+from app.storage.local_cache import LocalCache
+
+
+@pytest.fixture
+def local_cache():
+    return LocalCache(max_bytes=10, ttl=60)
+
+
+class TestLocalCache:
+
+    def test_hit_and_miss(self, local_cache):
+        local_cache.set('a', b'123')
+        assert local_cache.get('a') == b'123'
+        assert local_cache.get('b') is None
+        stats = local_cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hitRate'] == 0.5
+        assert stats['residentBytes'] == 3
+
+    def test_evicts_least_recently_used_by_size(self, local_cache):
+        local_cache.set('a', b'1234')
+        local_cache.set('b', b'1234')
+        local_cache.get('a')
+        local_cache.set('c', b'1234')
+        assert local_cache.get('b') is None
+        assert local_cache.get('a') == b'1234'
+        assert local_cache.get('c') == b'1234'
+        assert local_cache.evictions == 1
+        assert local_cache.resident_bytes == 8
+
+    def test_skip_oversized_value(self, local_cache):
+        local_cache.set('a', b'12345678901')
+        assert len(local_cache) == 0
+
+    def test_expiry_follows_shorter_ttl(self, local_cache):
+        with patch('app.storage.local_cache.time.monotonic', return_value=100):
+            local_cache.set('a', b'1', ttl=5)
+        with patch('app.storage.local_cache.time.monotonic', return_value=106):
+            assert local_cache.get('a') is None
+        assert local_cache.resident_bytes == 0
+
+    def test_invalidate(self, local_cache):
+        local_cache.set('a', b'1')
+        local_cache.invalidate('a')
+        local_cache.invalidate('missing')
+        assert local_cache.get('a') is None
+        assert local_cache.invalidations == 1
@@ -0,0 +1,43 @@
+import contextvars
+import threading
+
+import pytest
+
+from app.internal.offload import Offloader
+
+flag: contextvars.ContextVar = contextvars.ContextVar('flag', default=False)
+
+
+def current_thread_and_flag(_: int) -> tuple:
+    return threading.current_thread().name, flag.get()
+
+
+class TestOffloader:
+
+    @pytest.fixture
+    def offloader(self):
+        offloader = Offloader(executor='thread', max_workers=2, inline_threshold=10)
+        offloader.startup()
+        yield offloader
+        offloader.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_small_payload_runs_inline(self, offloader):
+        thread_name, _ = await offloader.run_in_thread(current_thread_and_flag, 1, size=5)
+        assert thread_name == threading.current_thread().name
+
+    @pytest.mark.asyncio
+    async def test_thread_keeps_context(self, offloader):
+        flag.set(True)
+        thread_name, flag_value = await offloader.run_in_thread(current_thread_and_flag, 1, size=50)
+        assert thread_name.startswith('offload')
+        assert flag_value is True
+
+    @pytest.mark.asyncio
+    async def test_process_falls_back_to_thread_pool(self, offloader):
+        thread_name, _ = await offloader.run_in_process(current_thread_and_flag, 1, size=50)
+        assert thread_name.startswith('offload')
+
+    def test_unknown_executor(self):
+        with pytest.raises(ValueError):
+            Offloader(executor='fibers', max_workers=1, inline_threshold=0)
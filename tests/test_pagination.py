@@ -0,0 +1,65 @@
+import uuid
+
+import orjson
+import pytest
+
+from app.api.handler.p2p_schedule.pagination import InvalidCursor, decode_cursor, indexed_page, product_page
+from app.api.schemas.schedule_table import ScheduleTable
+from app.api.schemas.schema_request import SortBy
+from app.internal.http.http_client_manager import sorted_product
+from tests.test_schema_serializer import make_schedule
+
+CACHE_KEY: str = '{"pointFrom":"CNSHA","pointTo":"DEHAM"}'
+
+PRODUCT: bytes = orjson.dumps({'productid': 'id', 'origin': 'CNSHA', 'destination': 'DEHAM', 'noofSchedule': 5,
+                               'schedules': [{'scac': scac, 'etd': f'2024-01-0{day}T10:00:00',
+                                              'eta': f'2024-02-{eta}T10:00:00', 'transitTime': transit_time}
+                                             for scac, day, eta, transit_time in (('MSCU', 1, 20, 50),
+                                                                                  ('ONEY', 2, 12, 41),
+                                                                                  ('ZIMU', 3, 25, 53),
+                                                                                  ('HLCU', 4, 10, 37),
+                                                                                  ('CMDU', 5, 15, 41))]})
+
+
+def pages(sort_by: SortBy, limit: int) -> list:
+    scacs, cursor = [], None
+    while True:
+        page: dict = orjson.loads(product_page(PRODUCT, CACHE_KEY, sort_by,
+                                               decode_cursor(cursor, CACHE_KEY, sort_by), limit))
+        assert page['noofSchedule'] == len(page['schedules']) <= limit
+        scacs.append([schedule['scac'] for schedule in page['schedules']])
+        if not (cursor := page.get('nextCursor')):
+            return scacs
+
+
+class TestProductPage:
+
+    def test_pages_follow_the_selected_order(self):
+        assert pages(SortBy.etd, limit=2) == [['MSCU', 'ONEY'], ['ZIMU', 'HLCU'], ['CMDU']]
+        assert pages(SortBy.eta, limit=3) == [['HLCU', 'ONEY', 'CMDU'], ['MSCU', 'ZIMU']]
+        assert pages(SortBy.transit_time, limit=5) == [['HLCU', 'ONEY', 'CMDU', 'MSCU', 'ZIMU']]
+
+    def test_cursor_of_another_search_or_order_is_rejected(self):
+        cursor: str = orjson.loads(product_page(PRODUCT, CACHE_KEY, SortBy.eta, 0, 2))['nextCursor']
+        assert decode_cursor(cursor, CACHE_KEY, SortBy.eta) == 2
+        for cache_key, sort_by, bad_cursor in ((CACHE_KEY, SortBy.etd, cursor), ('{}', SortBy.eta, cursor),
+                                               (CACHE_KEY, SortBy.eta, 'not-a-cursor')):
+            with pytest.raises(InvalidCursor):
+                decode_cursor(bad_cursor, cache_key, sort_by)
+
+    def test_indexed_page_is_the_decoded_page(self):
+        table = ScheduleTable.from_schedules(
+            make_schedule(scac=scac, etd=f'2024-01-0{day}T10:00:00', eta=f'2024-02-{eta}T10:00:00',
+                          transitTime=transit_time)
+            for scac, day, eta, transit_time in (('MSCU', 1, 20, 50), ('ONEY', 2, 12, 41), ('ZIMU', 3, 25, 53),
+                                                 ('HLCU', 4, 10, 37), ('CMDU', 5, 15, 41)))
+        product, index = sorted_product(table, uuid.uuid4(), 'CNSHA', 'DEHAM')
+        for sort_by in SortBy:
+            for offset, limit in ((0, 2), (2, 2), (4, 2), (0, 5), (1, 10)):
+                assert indexed_page(product, index, CACHE_KEY, sort_by, offset, limit) == product_page(
+                    product, CACHE_KEY, sort_by, offset, limit)
+        assert indexed_page(product + b' ', index, CACHE_KEY, SortBy.eta, 0, 2) is None
+        # A revalidated product of the same length e.g. only a time changed
+        revalidated: bytes = product.replace(b'2024-02-12T10:00:00', b'2024-02-28T10:00:00')
+        assert len(revalidated) == len(product)
+        assert indexed_page(revalidated, index, CACHE_KEY, SortBy.eta, 0, 2) is None
@@ -0,0 +1,84 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.internal.http.http_client_manager import AsyncTaskManager, HTTPClientWrapper
+from app.internal.http.range_pages import PageFailed, PageRetry, RangePaginator, page_ranges
+from tests.test_schema_serializer import make_schedule
+
+SETTING: dict = {'pageSize': 10, 'initialWindow': 2, 'minWindow': 1, 'maxWindow': 4, 'backoff': 0.5, 'retries': 1,
+                 'retryDelay': 0, 'pageTimeout': 1}
+
+
+class TestRangePaginator:
+
+    def test_page_ranges(self):
+        assert page_ranges('0-49/120', 50) == [(50, 99), (100, 119)]
+        assert page_ranges('items 0-9/25', 50) == [(10, 24)]
+        assert page_ranges('0-49/50', 50) == []
+
+    @pytest.mark.asyncio
+    async def test_pages_in_order_within_the_window(self):
+        paginator = RangePaginator(scac='CMDU', setting=SETTING)
+        in_flight: list = []
+        most_in_flight: list = [0]
+
+        async def fetch(first: int, last: int) -> list:
+            in_flight.append(first)
+            most_in_flight[0] = max(most_in_flight[0], len(in_flight))
+            # The later pages answer first
+            await asyncio.sleep(0.05 - first / 2000)
+            in_flight.remove(first)
+            return list(range(first, last + 1))
+
+        pages: list = [page async for page in paginator.iter_pages(fetch=fetch, content_range='0-9/55')]
+        assert [item for page in pages for item in page] == list(range(10, 55))
+        assert most_in_flight[0] <= SETTING['maxWindow']
+        assert paginator.pages == 5 and paginator.window > SETTING['initialWindow']
+
+    @pytest.mark.asyncio
+    async def test_failed_page_is_retried_then_fails_the_response(self):
+        paginator = RangePaginator(scac='CMDU', setting=SETTING)
+        attempts: dict = {}
+
+        async def fetch(first: int, last: int) -> list:
+            attempts[first] = attempts.get(first, 0) + 1
+            if first == 10 and attempts[first] == 1:
+                raise PageRetry('503')
+            if first == 20:
+                raise PageRetry('429')
+            return [first]
+
+        pages = paginator.iter_pages(fetch=fetch, content_range='0-9/30')
+        assert await anext(pages) == [10]
+        with pytest.raises(PageFailed):
+            await anext(pages)
+        assert attempts == {10: 2, 20: 2}
+        assert paginator.retried == 2 and paginator.failed == 1 and paginator.window == SETTING['minWindow']
+
+    @pytest.mark.asyncio
+    async def test_failed_page_fails_the_search_of_the_carrier(self, monkeypatch):
+        cached: list = []
+
+        async def set_later(**kwargs) -> None:
+            cached.append(kwargs['key'])
+
+        monkeypatch.setattr('app.internal.http.http_client_manager.db.set_later', set_later)
+
+        async def incomplete():
+            raise PageFailed('CMDU page 50-99 failed after 3 attempts')
+
+        async def complete():
+            return [make_schedule(scac='MAEU')]
+
+        async with AsyncTaskManager(default_timeout=1, max_retries=2) as task_group:
+            task_group.create_task(name='CMDU_task', coro=incomplete)
+            task_group.create_task(name='MAEU_task', coro=complete)
+        assert task_group.error and task_group.failed_scac == ['CMDU']
+        response = await HTTPClientWrapper().gen_all_valid_schedules(
+            cache_key='CNSHA-DEHAM', product_id=uuid.uuid4(), matrix=task_group.results, point_from='CNSHA',
+            point_to='DEHAM', background_tasks=None, task_exception=task_group.error,
+            failed_scac=task_group.failed_scac)
+        assert response.headers['retry-failed'] == 'CMDU' and response.headers['KN-Count-Schedules'] == '1'
+        assert cached == []
@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.internal.http import rate_limiter
+from app.internal.http.rate_limiter import CarrierLimiter, CarrierThrottled, parse_retry_after
+
+SETTING: dict = {'rate': 10, 'burst': 10, 'initialConcurrency': 4, 'minConcurrency': 1, 'maxConcurrency': 8,
+                 'latencyTarget': 5, 'backoff': 0.5, 'maxWait': 0.05}
+
+
+@pytest.fixture(autouse=True)
+def mock_db(monkeypatch):
+    monkeypatch.setattr(rate_limiter.db, 'take_token', AsyncMock(return_value=0))
+    monkeypatch.setattr(rate_limiter.db, 'set_cooldown', AsyncMock())
+    return rate_limiter.db
+
+
+class TestCarrierLimiter:
+
+    @pytest.mark.asyncio
+    async def test_aimd(self):
+        limiter = CarrierLimiter(carrier='MSCU', setting=SETTING)
+        await limiter.observe(status_code=429, latency=0.1)
+        assert limiter.limit == 2
+        for _ in range(4):
+            await limiter.observe(status_code=200, latency=0.1)
+        assert 3 <= limiter.limit < 4
+        await limiter.observe(status_code=200, latency=10)
+        assert limiter.limit < 3
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_shared(self, mock_db):
+        limiter = CarrierLimiter(carrier='MSCU', setting=SETTING)
+        await limiter.observe(status_code=429, latency=0.1, retry_after='30')
+        mock_db.set_cooldown.assert_awaited_once_with(key='MSCU', seconds=30.0)
+        with pytest.raises(CarrierThrottled):
+            async with limiter.slot():
+                pass
+        assert limiter.rejected == 1
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit(self):
+        limiter = CarrierLimiter(carrier='MSCU', setting=dict(SETTING, initialConcurrency=1))
+        async with limiter.slot():
+            with pytest.raises(CarrierThrottled):
+                async with limiter.slot():
+                    pass
+            async with limiter.slot(concurrent=False):
+                assert limiter.in_flight == 1
+        async with limiter.slot():
+            assert limiter.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_waits_for_token(self, mock_db):
+        mock_db.take_token.side_effect = [0.01, 0]
+        limiter = CarrierLimiter(carrier='MSCU', setting=SETTING)
+        async with limiter.slot():
+            await asyncio.sleep(0)
+        assert mock_db.take_token.await_count == 2
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+        assert parse_retry_after('soon') is None
+        assert parse_retry_after(None) is None
@@ -0,0 +1,30 @@
+from app.api.handler.p2p_schedule.schedule_filter import ScheduleFilter
+from app.api.schemas.schema_response import Leg, PointBase, Schedule, Service, Transportation
+
+
+def make_schedule(*legs: tuple) -> Schedule:
+    """Every leg is given as (port of loading,vessel imo,service code)"""
+    return Schedule.model_construct(scac='MSCU', pointFrom='CNSHA', pointTo='NLRTM', transshipment=len(legs) > 1,
+                                    legs=[Leg.model_construct(pointFrom=PointBase.model_construct(locationCode=port),
+                                                              transportations=Transportation.model_construct(
+                                                                  referenceType='IMO', reference=imo),
+                                                              services=Service.model_construct(serviceCode=service))
+                                          for port, imo, service in legs])
+
+
+SCHEDULES: list = [make_schedule(('CNSHA', '9123456', 'AE1')),
+                   make_schedule(('CNSHA', '9123456', 'AE1'), ('SGSIN', 9654321, 'AE7')),
+                   make_schedule(('CNSHA', '9111111', 'AE5'), ('KRPUS', '9222222', 'AE1'))]
+
+
+class TestScheduleFilter:
+
+    def test_without_filters_every_schedule_is_kept(self):
+        assert not ScheduleFilter().active
+        assert ScheduleFilter(direct_only=None, service='').apply(iter(SCHEDULES)) == SCHEDULES
+
+    def test_filters_are_combined(self):
+        assert ScheduleFilter(direct_only=True).apply(SCHEDULES) == SCHEDULES[:1]
+        assert ScheduleFilter(direct_only=False, service='AE1').apply(SCHEDULES) == SCHEDULES[1:]
+        assert ScheduleFilter(tsp='SGSIN', vessel_imo='9654321').apply(SCHEDULES) == SCHEDULES[1:2]
+        assert ScheduleFilter(tsp='CNSHA').apply(SCHEDULES) == []
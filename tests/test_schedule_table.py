@@ -0,0 +1,35 @@
+import pickle
+import uuid
+
+from app.api.schemas.schedule_table import ScheduleTable
+from app.api.schemas.schema_serializer import serialize_product
+from app.api.schemas.schema_response import Transportation
+from tests.test_schema_serializer import make_leg, make_schedule
+
+PRODUCT_ID: str = str(uuid.uuid5(uuid.NAMESPACE_DNS, 'CNSHA-DEHAM'))
+
+SCHEDULES: list = [make_schedule(etd='2024-01-03 10:00:00', transitTime=17),
+                   make_schedule(scac='ONEY', etd='2024-01-01T10:00:00.000+08:00', transitTime=19),
+                   make_schedule(scac='ONEY', etd='2024-01-01T10:00:00', transitTime=18, pointTo='NLRTM')]
+
+
+class TestScheduleTable:
+
+    def test_product_is_the_one_of_the_sorted_models(self):
+        table = ScheduleTable.from_schedules(iter(SCHEDULES))
+        assert table.sorted().product_json(PRODUCT_ID, 'CNSHA', 'DEHAM') == serialize_product(
+            PRODUCT_ID, 'CNSHA', 'DEHAM', [SCHEDULES[2], SCHEDULES[1], SCHEDULES[0]])
+
+    def test_codes_are_interned_and_the_table_pickles(self):
+        table = pickle.loads(pickle.dumps(ScheduleTable.from_schedules(SCHEDULES)))
+        assert table.codes[:5] == ['MSCU', 'CNSHA', 'DEHAM', '', 'ONEY'] and [table.code(scac) for scac in table.scac] == ['MSCU', 'ONEY', 'ONEY']
+        to_hamburg = table.compress(table.code(point_to) == 'DEHAM' for point_to in table.point_to)
+        assert len(to_hamburg) == 2 and to_hamburg.rows == table.rows[:2]
+
+    def test_sailings_offered_by_several_carriers_are_merged(self):
+        vessel_leg = make_leg(transportations=Transportation.model_construct(
+            transportType='Vessel', transportName='CMA CGM A', referenceType='IMO', reference='9123456'))
+        sailings: list = [make_schedule(scac=scac, legs=[vessel_leg]) for scac in ('CMDU', 'APLU', 'CMDU', 'ANNU')]
+        table = ScheduleTable.from_schedules(sailings + SCHEDULES[:1]).deduplicated()
+        assert len(table) == 2 and table.rows[1] == ScheduleTable.from_schedules(SCHEDULES[:1]).rows[0]
+        assert table.rows[0].endswith(b',"offeringScac":["CMDU","APLU","ANNU"]}')
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+from pydantic import ValidationError
+
+from app.api.schemas.schema_response import (PRODUCT_ADAPTER, Cutoff, Leg, PointBase, Schedule, Service,
+                                             Transportation, Voyage)
+from app.api.schemas.schema_serializer import serialize_product
+
+PRODUCT_ID: str = str(uuid.uuid5(uuid.NAMESPACE_DNS, 'CNSHA-DEHAM'))
+
+
+def pydantic_product(schedules: list, origin: str = 'CNSHA', destination: str = 'DEHAM') -> bytes:
+    """What the product response model rendered before the fast path"""
+    final_set: dict = {'productid': PRODUCT_ID, 'origin': origin, 'destination': destination,
+                       'noofSchedule': len(schedules), 'schedules': schedules}
+    final_dump = PRODUCT_ADAPTER.dump_python(PRODUCT_ADAPTER.validate_python(final_set), mode='json', exclude_none=True)
+    return PRODUCT_ADAPTER.dump_json(PRODUCT_ADAPTER.validate_python(final_dump), exclude_defaults=True)
+
+
+def make_leg(**overrides) -> Leg:
+    leg: dict = dict(pointFrom=PointBase.model_construct(locationName='Shanghai', locationCode='CNSHA', terminalCode=1),
+                     pointTo=PointBase.model_construct(locationCode='DEHAM', terminalName='CTA'),
+                     etd='2024-01-01T10:00:00.000+08:00', eta='2024-01-20 08:00:00', transitTime=19,
+                     cutoffs=Cutoff.model_construct(cyCutoffDate='2023-12-30T10:00:00', docCutoffDate=None),
+                     transportations=Transportation.model_construct(transportType='Vessel', transportName='MSC ANNA'),
+                     voyages=Voyage.model_construct(externalVoyage='123W'),
+                     services=Service.model_construct(serviceCode='AE1'))
+    leg.update(overrides)
+    return Leg.model_construct(**leg)
+
+
+def make_schedule(**overrides) -> Schedule:
+    schedule: dict = dict(scac='MSCU', pointFrom='CNSHA', pointTo='DEHAM', etd='2024-01-01T10:00:00.000+08:00',
+                          eta='2024-01-20 08:00:00', transitTime=19, transshipment=False, legs=[make_leg()])
+    schedule.update(overrides)
+    return Schedule.model_construct(**schedule)
+
+
+class TestSerializeProduct:
+
+    @pytest.mark.parametrize('schedule', [
+        make_schedule(),
+        make_schedule(legs=[]),
+        make_schedule(legs=[make_leg(cutoffs=Cutoff.model_construct(cyCutoffDate='2024-01-02T10:00:00'))]),
+        make_schedule(legs=[make_leg(cutoffs=Cutoff.model_construct())]),
+        make_schedule(legs=[make_leg(transportations=Transportation.model_construct(transportType='Truck/Rail'),
+                                     voyages=Voyage.model_construct(internalVoyage=None), services=None)]),
+        make_schedule(legs=[make_leg(transportations=Transportation.model_construct(
+            transportType='Barge', referenceType='IMO', reference=9876543))]),
+        make_schedule(etd='2024-01-01', eta='2024-01-20'),
+    ])
+    def test_matches_pydantic(self, schedule):
+        assert serialize_product(PRODUCT_ID, 'CNSHA', 'DEHAM', [schedule]) == pydantic_product([schedule])
+
+    @pytest.mark.parametrize('schedule', [
+        make_schedule(transitTime=19.0),
+        make_schedule(transshipment='true'),
+        make_schedule(legs=[make_leg(transportations=Transportation.model_construct(
+            transportType='Vessel', referenceType='IMO', reference=True))]),
+    ])
+    def test_coerced_values_fall_back_to_pydantic(self, schedule):
+        assert serialize_product(PRODUCT_ID, 'CNSHA', 'DEHAM', [schedule]) == pydantic_product([schedule])
+
+    @pytest.mark.parametrize('schedule', [
+        make_schedule(eta='2023-12-01T00:00:00'),
+        make_schedule(pointFrom='cnsha'),
+        make_schedule(legs=[make_leg(transportations=Transportation.model_construct(
+            transportType='Vessel', referenceType='IMO'))]),
+    ])
+    def test_invalid_schedule_raises(self, schedule):
+        with pytest.raises(ValidationError):
+            pydantic_product([schedule])
+        with pytest.raises(ValidationError):
+            serialize_product(PRODUCT_ID, 'CNSHA', 'DEHAM', [schedule])
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app.internal.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_result(self):
+        single_flight = SingleFlight(name='test')
+        calls: list = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'result'
+
+        results = await asyncio.gather(*[single_flight.do(key='lane', coro=fetch) for _ in range(5)])
+        assert results == ['result'] * 5
+        assert len(calls) == 1
+        assert single_flight.stats()['coalescedWaiters'] == 4
+        assert 'lane' not in single_flight
+
+    @pytest.mark.asyncio
+    async def test_exception_is_shared_and_key_released(self):
+        single_flight = SingleFlight(name='test')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('carrier down')
+
+        results = await asyncio.gather(*[single_flight.do(key='lane', coro=fail) for _ in range(2)],
+                                       return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert await single_flight.do(key='lane', coro=lambda: asyncio.sleep(0, result='retry')) == 'retry'
+        assert single_flight.leaders == 2
@@ -0,0 +1,108 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.api.handler.p2p_schedule import aggregator
+from app.api.handler.p2p_schedule.aggregator import revalidation_tasks, schedule_revalidation
+from app.internal.http.http_client_manager import HTTPClientWrapper, start_revalidation
+from app.storage import db
+from app.storage.local_cache import LocalCache
+from tests.test_schema_serializer import make_schedule
+
+STALE_TTL: int = 600
+
+
+class FakePipeline:
+    """GET and PTTL of one key answered in one round trip like the redis pipeline"""
+
+    def __init__(self, value: bytes, pttl: int) -> None:
+        self.value: bytes = value
+        self.pttl_ms: int = pttl
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def get(self, name: str):
+        return self
+
+    def pttl(self, name: str):
+        return self
+
+    async def execute(self) -> list:
+        return [self.value, self.pttl_ms]
+
+
+def stored_product(monkeypatch, pttl: int) -> LocalCache:
+    """The product is in redis with pttl milliseconds left,the local tier starts empty"""
+    local_cache = LocalCache(max_bytes=1024, ttl=300)
+    monkeypatch.setattr(db, '_pool', MagicMock(pipeline=lambda transaction: FakePipeline(b'{"noofSchedule":1}', pttl)),
+                        raising=False)
+    monkeypatch.setattr(db, 'local_cache', local_cache)
+    return local_cache
+
+
+class TestStaleWhileRevalidate:
+
+    @pytest.mark.asyncio
+    async def test_entry_within_its_max_age_is_fresh(self, monkeypatch):
+        local_cache = stored_product(monkeypatch, pttl=(STALE_TTL + 10) * 1000)
+        assert await db.get_entry(key='lane', namespace='schedule product', stale_ttl=STALE_TTL) == (
+            b'{"noofSchedule":1}', False)
+        # Kept in the local tier no longer than it stays fresh
+        assert len(local_cache) == 1
+
+    @pytest.mark.asyncio
+    async def test_entry_past_its_max_age_is_stale_and_not_kept_locally(self, monkeypatch):
+        local_cache = stored_product(monkeypatch, pttl=(STALE_TTL - 5) * 1000)
+        assert await db.get_entry(key='lane', namespace='schedule product', stale_ttl=STALE_TTL) == (
+            b'{"noofSchedule":1}', True)
+        assert len(local_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_entry_without_expiry_is_never_stale(self, monkeypatch):
+        stored_product(monkeypatch, pttl=-1)
+        assert await db.get_entry(key='lane', namespace='schedule product', stale_ttl=STALE_TTL) == (
+            b'{"noofSchedule":1}', False)
+
+    @pytest.mark.asyncio
+    async def test_one_revalidation_per_lane(self, monkeypatch):
+        refreshed: asyncio.Event = asyncio.Event()
+        calls: list = []
+
+        async def revalidate(**kwargs):
+            calls.append(kwargs['cache_key'])
+            await refreshed.wait()
+
+        monkeypatch.setattr(aggregator, 'revalidate_schedules', revalidate)
+        for _ in range(3):
+            schedule_revalidation(client=MagicMock(), settings=MagicMock(), query_params=MagicMock(),
+                                  cache_key='lane', product_id='id')
+        assert list(revalidation_tasks) == ['lane']
+        refreshed.set()
+        await revalidation_tasks['lane']
+        await asyncio.sleep(0)
+        assert calls == ['lane']
+        assert 'lane' not in revalidation_tasks
+
+    @pytest.mark.asyncio
+    async def test_revalidated_product_overwrites_the_stale_one(self, monkeypatch):
+        set_later = AsyncMock()
+        monkeypatch.setattr('app.internal.http.http_client_manager.db.set_later', set_later)
+
+        async def cache_product(revalidating: bool):
+            # The revalidation flag is a context variable,each task has its own
+            if revalidating:
+                start_revalidation()
+            await HTTPClientWrapper().gen_all_valid_schedules(
+                cache_key='CNSHA-DEHAM', product_id=uuid.uuid4(), matrix=[[make_schedule()]], point_from='CNSHA',
+                point_to='DEHAM', background_tasks=None, task_exception=False)
+
+        await asyncio.create_task(cache_product(revalidating=False))
+        await asyncio.create_task(cache_product(revalidating=True))
+        products: list = [call.kwargs for call in set_later.await_args_list if call.kwargs['namespace'] == 'schedule product']
+        assert [product['overwrite'] for product in products] == [False, True]
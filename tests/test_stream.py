@@ -0,0 +1,72 @@
+import gzip
+import zlib
+from unittest.mock import AsyncMock, MagicMock
+
+import orjson
+import pytest
+
+from app.api.handler.p2p_schedule import aggregator
+from app.api.handler.p2p_schedule.aggregator import gzip_stream, stream_all_schedules, stream_cached_schedules
+from app.api.schemas.schema_serializer import serialize_schedule
+from app.storage.compression import Compressor
+from tests.test_schema_serializer import make_schedule
+
+QUERY_PARAMS = MagicMock(point_from='CNSHA', point_to='DEHAM', dedup=None)
+
+
+async def collect(chunks) -> list:
+    return [chunk async for chunk in chunks]
+
+
+class TestStream:
+
+    @pytest.mark.asyncio
+    async def test_cached_product_is_one_line_per_schedule_and_a_summary(self):
+        product: bytes = orjson.dumps({'productid': 'id', 'noofSchedule': 2,
+                                       'schedules': [{'scac': 'MSCU', 'transitTime': 19}, {'scac': 'ONEY'}]})
+        entry: bytes = Compressor(codec='gzip', level=6, min_bytes=10).compress(product)
+        lines: list = b''.join(await collect(stream_cached_schedules(
+            cache_result=entry, product_id='id', query_params=QUERY_PARAMS))).splitlines()
+        assert [orjson.loads(line) for line in lines] == [
+            {'scac': 'MSCU', 'transitTime': 19}, {'scac': 'ONEY'},
+            {'productid': 'id', 'origin': 'CNSHA', 'destination': 'DEHAM', 'noofSchedule': 2, 'failedScac': []}]
+
+    @pytest.mark.asyncio
+    async def test_schedules_are_streamed_per_carrier_and_the_failed_ones_summarized(self, monkeypatch):
+        schedules: list = [make_schedule(scac='MSCU'), make_schedule(scac='MSCU', transitTime=25)]
+
+        async def responding():
+            return schedules
+
+        async def unreadable():
+            raise KeyError('routes')
+
+        def create_carrier_tasks(task_group, **kwargs):
+            task_group.create_task(name='MSCU_task', coro=responding)
+            task_group.create_task(name='ONEY_task', coro=unreadable)
+            return ['MSCU', 'ONEY']
+
+        monkeypatch.setattr(aggregator, 'create_carrier_tasks', create_carrier_tasks)
+        client = MagicMock(gen_all_valid_schedules=AsyncMock())
+        chunks: list = await collect(stream_all_schedules(
+            client=client, background_tasks=MagicMock(), settings=MagicMock(), query_params=QUERY_PARAMS,
+            cache_key='lane', product_id='id'))
+        assert chunks[0] == b''.join(serialize_schedule(schedule) + b'\n' for schedule in schedules)
+        assert orjson.loads(chunks[-1]) == {'productid': 'id', 'origin': 'CNSHA', 'destination': 'DEHAM',
+                                            'noofSchedule': 2, 'failedScac': ['ONEY']}
+        # The product of an incomplete search is built but not cached
+        assert client.gen_all_valid_schedules.await_args.kwargs['task_exception']
+
+    @pytest.mark.asyncio
+    async def test_gzip_stream_flushes_every_chunk(self):
+        chunks: list = [b'{"scac":"MSCU"}\n', b'{"scac":"ONEY"}\n', b'{"noofSchedule":2}\n']
+
+        async def ndjson():
+            for chunk in chunks:
+                yield chunk
+
+        compressed: list = await collect(gzip_stream(ndjson()))
+        decompressor = zlib.decompressobj(wbits=31)
+        # Each line can be decompressed as soon as it is received
+        assert [decompressor.decompress(chunk) for chunk in compressed[:len(chunks)]] == chunks
+        assert gzip.decompress(b''.join(compressed)) == b''.join(chunks)
@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.internal.http.token_manager import TokenManager, TokenUnavailable
+
+SETTING: dict = {'refreshMargin': 0.1, 'retryInterval': 0.05, 'prewarm': True, 'ttl': {'default': 60}}
+
+
+def make_fetcher(*expires_in: float):
+    calls: list = []
+
+    async def fetch(client, settings):
+        calls.append(client)
+        await asyncio.sleep(0.01)
+        if len(calls) > len(expires_in):
+            return None
+        return {'access_token': f'token-{len(calls)}', 'expires_in': expires_in[len(calls) - 1]}
+    return fetch, calls
+
+
+class TestTokenManager:
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_share_one_refresh(self):
+        manager = TokenManager(SETTING)
+        fetch, calls = make_fetcher(60)
+        manager.register(scac='ZIMU', fetch=fetch)
+        tokens = await asyncio.gather(*(manager.get(scac='ZIMU', client=MagicMock()) for _ in range(5)))
+        assert tokens == ['token-1'] * 5 and len(calls) == 1
+        assert await manager.get(scac='ZIMU', client=MagicMock()) == 'token-1' and len(calls) == 1
+        manager.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_token_is_refreshed_ahead_of_expiry(self):
+        manager = TokenManager(SETTING)
+        fetch, calls = make_fetcher(0.2, 60)
+        manager.register(scac='ONEY', fetch=fetch)
+        manager.startup(client=MagicMock())
+        await asyncio.sleep(0.05)
+        assert await manager.get(scac='ONEY', client=MagicMock()) == 'token-1'
+        await asyncio.sleep(0.15)
+        assert await manager.get(scac='ONEY', client=MagicMock()) == 'token-2' and len(calls) == 2
+        manager.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_refused_token_raises(self):
+        manager = TokenManager(SETTING)
+        manager.register(scac='MSCU', fetch=AsyncMock(return_value=None))
+        with pytest.raises(TokenUnavailable):
+            await manager.get(scac='MSCU', client=MagicMock())
+        assert manager.stats()['MSCU']['failures'] == 1
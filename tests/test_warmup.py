@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from app.internal.http.warmup import HostLatency, carrier_origins, host_latency, prewarm
+
+
+class CarrierSettings(BaseModel):
+    cma_url: str = 'https://apis.cma-cgm.net/vesseloperation/route/v2/routings'
+    cma_token_url: str = 'https://auth.cma-cgm.com/as/token.oauth2'
+    cma_url_ext: str = 'https://apis.cma-cgm.net/operation/route/v2/routings'
+    iqax_url: str = 'https://api.iqax.com/{}/schedules'
+    one_url: str = 'https://{}.one-line.com/schedule'
+    cma_share_cloud: str = 'not a url'
+
+
+class TestWarmup:
+    def test_carrier_origins(self):
+        fields = ('cma_url', 'cma_token_url', 'cma_url_ext', 'iqax_url', 'one_url', 'cma_share_cloud', 'missing')
+        assert carrier_origins(CarrierSettings(), fields) == [
+            'https://apis.cma-cgm.net', 'https://auth.cma-cgm.com', 'https://api.iqax.com']
+
+    def test_cold_and_warm_latency(self):
+        latency = HostLatency(window=2)
+        latency.record(host='api.iqax.com', seconds=0.5, connect=0.3, transport='HTTP/1.1')
+        for seconds in (0.4, 0.1, 0.2):
+            latency.record(host='api.iqax.com', seconds=seconds, connect=None, transport='HTTP/1.1')
+        stats = latency.stats()['api.iqax.com']
+        assert stats['cold'] == {'requests': 1, 'avg': 0.5, 'p95': 0.5, 'max': 0.5}
+        assert stats['warm']['requests'] == 2 and stats['warm']['max'] == 0.2
+
+    @pytest.mark.asyncio
+    async def test_slow_host_does_not_hold_the_startup(self):
+        async def touch(origin: str, scac: str) -> None:
+            if 'slow' in origin:
+                await asyncio.sleep(10)
+
+        await prewarm(carriers={'CMDU': {'https://fast.example.com': 2}, 'ZIMU': {'https://slow.example.com': 2}},
+                      touch=touch, timeout=0.1)
+        assert host_latency.prewarmed['fast.example.com'] == 2
+        assert host_latency.prewarmed['slow.example.com'] == 0
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.storage.write_behind import PendingWrite, WriteBehind
+
+SETTING: dict = {'flushInterval': 0, 'maxBatch': 500, 'maxPending': 100, 'maxWait': 1, 'drainTimeout': 1}
+
+
+def write(key: str, value: str, overwrite: bool = False) -> PendingWrite:
+    return PendingWrite(key=key, value=value, expire=60, namespace='response', overwrite=overwrite)
+
+
+class TestWriteBehind:
+
+    @pytest.mark.asyncio
+    async def test_duplicate_keys_are_coalesced_like_redis_would_apply_them(self):
+        batches: list = []
+
+        async def write_many(writes: list) -> None:
+            batches.append([(pending.key, pending.value) for pending in writes])
+
+        write_behind = WriteBehind(SETTING, write=write_many)
+        write_behind.start()
+        for pending in (write('MSCU', 'first'), write('MSCU', 'second'), write('lane', 'stale', overwrite=True),
+                        write('lane', 'fresh', overwrite=True)):
+            await write_behind.put(pending)
+        assert len(write_behind) == 2
+        await write_behind.close()
+        assert batches == [[('MSCU', 'first'), ('lane', 'fresh')]]
+        assert write_behind.stats()['coalesced'] == 2
+
+    @pytest.mark.asyncio
+    async def test_full_queue_holds_the_requests_back_then_drops_their_write(self):
+        redis_slow = asyncio.Event()
+        batches: list = []
+
+        async def write_many(writes: list) -> None:
+            await redis_slow.wait()
+            batches.append([pending.key for pending in writes])
+
+        write_behind = WriteBehind(dict(SETTING, maxPending=1, maxWait=0.05), write=write_many)
+        write_behind.start()
+        await write_behind.put(write('a', '1'))
+        await asyncio.sleep(0.01)
+        await write_behind.put(write('b', '1'))
+        await write_behind.put(write('c', '1'))
+        assert write_behind.stats()['dropped'] == 1
+        assert not await write_behind.written(namespace='response', key='a', timeout=0.01)
+        redis_slow.set()
+        assert await write_behind.written(namespace='response', key='a', timeout=1)
+        await write_behind.close()
+        assert batches == [['a'], ['b']]